@@ -0,0 +1,189 @@
+"""
+Measure the cost of {% intercom_tag %}.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_intercom_tag --output results.json
+
+and compare two runs, e.g. between releases:
+
+    python -m benchmarks.bench_intercom_tag --compare old.json
+
+The results are a JSON document with renders per second and p50/p99 latency
+(in milliseconds) for every case.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+FAST = ['benchmarks.providers.FastCustomData%s' % i for i in range(20)]
+SLOW = ['benchmarks.providers.SlowCustomData%s' % i for i in range(5)]
+
+# name, module constants to patch, iterations
+CASES = [
+    ('anonymous', {}, 2000),
+    ('authenticated', {}, 2000),
+    ('secure', {'INTERCOM_SECURE_KEY': 'benchmark-secret'}, 2000),
+    ('custom_1', {'INTERCOM_CUSTOM_DATA_CLASSES': FAST[:1]}, 2000),
+    ('custom_5', {'INTERCOM_CUSTOM_DATA_CLASSES': FAST[:5]}, 2000),
+    ('custom_20', {'INTERCOM_CUSTOM_DATA_CLASSES': FAST[:20]}, 1000),
+    ('custom_5_slow', {'INTERCOM_CUSTOM_DATA_CLASSES': FAST[:4] + [
+        'benchmarks.providers.SlowCustomData']}, 200),
+    ('custom_5_slow_concurrent', {
+        'INTERCOM_CUSTOM_DATA_CLASSES': SLOW,
+        'INTERCOM_CUSTOM_DATA_CONCURRENT': True}, 200),
+    ('custom_queries', {'INTERCOM_CUSTOM_DATA_CLASSES': [
+        'benchmarks.providers.QueryCustomData']}, 1000),
+    ('company', {'INTERCOM_COMPANY_DATA_CLASS':
+                 'benchmarks.providers.CompanyData'}, 2000),
+    # the same as the cases above, rendered with the Jinja2 extension
+    ('authenticated_jinja', {}, 2000),
+    ('custom_5_jinja', {'INTERCOM_CUSTOM_DATA_CLASSES': FAST[:5]}, 2000),
+]
+
+
+def percentile(timings, percent):
+    index = min(len(timings) - 1, int(round(percent / 100.0 * len(timings))))
+    return timings[index]
+
+
+class JinjaTemplate(object):
+    """ {{ intercom_tag() }} with the interface of a Django Template. """
+
+    def __init__(self):
+        import jinja2
+        from django_intercom.jinja import IntercomExtension
+
+        environment = jinja2.Environment(extensions=[IntercomExtension],
+                                         autoescape=True)
+        self.template = environment.from_string('{{ intercom_tag() }}')
+
+    def render(self, context):
+        return self.template.render(request=context['request'])
+
+
+def run_case(name, patches, iterations, request, anonymous_request):
+    from django.template import Context, Template
+
+    if name.endswith('_jinja'):
+        template = JinjaTemplate()
+    else:
+        template = Template('{% load intercom %}{% intercom_tag %}')
+    if name == 'anonymous':
+        request = anonymous_request
+
+    with ExitStack() as stack:
+        stack.enter_context(patch(MODULE_PATCH.format('INTERCOM_APPID'),
+                                  'benchmark'))
+        for setting, value in patches.items():
+            stack.enter_context(patch(MODULE_PATCH.format(setting), value))
+        # warm up the registry and the template loader
+        template.render(Context({'request': request}))
+
+        timings = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            template.render(Context({'request': request}))
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'iterations': iterations,
+        'renders_per_second': round(iterations / total, 1),
+        'mean_ms': round(total / iterations * 1000, 4),
+        'p50_ms': round(percentile(timings, 50) * 1000, 4),
+        'p99_ms': round(percentile(timings, 99) * 1000, 4),
+    }
+
+
+def run(cases, scale=1.0):
+    import django
+    from django.contrib.auth.models import AnonymousUser, User
+    from django.contrib.sessions.middleware import SessionMiddleware
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        for i in range(100):
+            User.objects.create_user('user%s' % i, 'user%s@example.com' % i)
+
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.get(username='user0')
+        anonymous_request = RequestFactory().get('/')
+        SessionMiddleware().process_request(anonymous_request)
+        anonymous_request.user = AnonymousUser()
+
+        results = {}
+        for name, patches, iterations in cases:
+            iterations = max(1, int(iterations * scale))
+            results[name] = run_case(name, patches, iterations, request,
+                                     anonymous_request)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return {
+        'meta': {
+            'timestamp': int(time.time()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'results': results,
+    }
+
+
+def compare(old, new):
+    lines = []
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['p50_ms']
+        after = result['p50_ms']
+        lines.append('%-20s p50 %8.4fms -> %8.4fms (%+.1f%%)' % (
+            name, before, after, (after - before) / before * 100))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the JSON results to a file')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--case', action='append',
+                        help='only run this case, can be repeated')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply the iterations of every case')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+    import django
+    django.setup()
+
+    cases = [case for case in CASES if not args.case or case[0] in args.case]
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        cases = [case for case in cases if not case[0].endswith('_jinja')]
+    report = run(cases, args.scale)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure the serialization cost of large custom data payloads.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_serializers --output results.json
+"""
+import argparse
+import datetime
+import decimal
+import json
+import os
+import time
+import uuid
+
+from benchmarks.bench_intercom_tag import percentile
+
+SIZES = [10, 100, 1000]
+
+
+def payload(size):
+    data = {}
+    for i in range(size):
+        kind = i % 5
+        if kind == 0:
+            data['count_%s' % i] = i
+        elif kind == 1:
+            data['label_%s' % i] = 'value <%s> & more' % i
+        elif kind == 2:
+            data['date_%s' % i] = datetime.datetime(2019, 7, 9, 12, i % 60)
+        elif kind == 3:
+            data['price_%s' % i] = decimal.Decimal('%s.99' % i)
+        else:
+            data['uuid_%s' % i] = uuid.UUID(int=i)
+    return data
+
+
+def run_case(dumps, data, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        dumps(data)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    total = sum(timings)
+    return {
+        'iterations': iterations,
+        'bytes': len(dumps(data).encode('utf8')),
+        'calls_per_second': round(iterations / total, 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 4),
+        'p99_ms': round(percentile(timings, 99) * 1000, 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the JSON results to a file')
+    parser.add_argument('--iterations', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+    import django
+    django.setup()
+    from django_intercom import serializers
+
+    candidates = [('django', serializers.django_dumps)]
+    if serializers.orjson is not None:
+        candidates.append(('orjson', serializers.orjson_dumps))
+
+    results = {}
+    for size in SIZES:
+        data = payload(size)
+        for name, dumps in candidates:
+            results['%s_%s' % (name, size)] = run_case(
+                dumps, data, args.iterations)
+            results['%s_%s_escaped' % (name, size)] = run_case(
+                lambda value: serializers.escape_script(dumps(value)), data,
+                args.iterations)
+
+    output = json.dumps({'results': results}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure how many webhook deliveries the intercom_webhook view accepts.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_webhooks --deliveries 5000
+
+The view checks the signature and saves the notification before it
+answers, the results show its deliveries per second and p50/p99 latency.
+Deliveries that arrive while a save is running are saved together with one
+bulk_create, see django_intercom.webhooks.GroupCommit.
+"""
+import argparse
+import json
+import os
+import time
+from unittest.mock import patch
+
+from benchmarks.bench_intercom_tag import percentile
+
+
+def run(deliveries):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from django_intercom import webhooks
+    from django_intercom.models import WebhookEvent
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with patch('django_intercom.webhooks.INTERCOM_WEBHOOK_SECRET',
+                   'benchmark'):
+            client = Client()
+            url = reverse('intercom_webhook')
+            bodies = [json.dumps({
+                'type': 'notification_event', 'id': 'notif_%s' % i,
+                'topic': 'conversation.user.replied',
+                'data': {'item': {'id': str(i), 'body': 'x' * 200}},
+            }).encode('utf8') for i in range(deliveries)]
+
+            timings = []
+            for body in bodies:
+                signature = webhooks.signature(body)
+                start = time.perf_counter()
+                client.post(url, body, content_type='application/json',
+                            HTTP_X_HUB_SIGNATURE=signature)
+                timings.append(time.perf_counter() - start)
+            saved = WebhookEvent.objects.count()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'deliveries': deliveries,
+        'deliveries_per_second': round(deliveries / total, 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 4),
+        'p99_ms': round(percentile(timings, 99) * 1000, 4),
+        'saved': saved,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--deliveries', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.test_settings')
+    import django
+    django.setup()
+
+    print(json.dumps(run(args.deliveries), indent=2,
+                     sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import User
+
+
+class FastCustomData:
+    def __init__(self):
+        self.key = 'fast_%s' % id(self)
+
+    def custom_data(self, user):
+        return {self.key: user.pk}
+
+
+class SlowCustomData:
+    """ Stands in for a provider waiting on a remote service. """
+
+    def custom_data(self, user):
+        time.sleep(0.002)
+        return {'slow': True}
+
+
+class QueryCustomData:
+    """ Like the README example, two COUNT queries per call. """
+
+    def custom_data(self, user):
+        return {
+            'num_users': User.objects.count(),
+            'num_staff': User.objects.filter(is_staff=True).count(),
+        }
+
+
+class CompanyData:
+    def company_data(self, user):
+        return {'id': 1, 'name': 'benchmark', 'created_at': 1562630400}
+
+
+# one module attribute per provider so the paths are distinct in the registry
+for i in range(20):
+    globals()['FastCustomData%s' % i] = type(str('FastCustomData%s' % i),
+                                             (FastCustomData,), {})
+for i in range(5):
+    globals()['SlowCustomData%s' % i] = type(str('SlowCustomData%s' % i),
+                                             (SlowCustomData,), {})
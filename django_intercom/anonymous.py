@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import uuid
+
+from django_intercom.settings import (INTERCOM_ANONYMOUS_COOKIE_AGE,
+                                      INTERCOM_ANONYMOUS_COOKIE_NAME)
+
+SALT = 'django_intercom.anonymous'
+
+
+def get_anonymous_id(request):
+    """
+    Get the id of an anonymous visitor from its signed cookie, or make a new
+    one. A new id is only stored when the IntercomAnonymousIdMiddleware sets
+    the cookie on the response, nothing is written to the session.
+    Args:
+        request: the current request
+
+    Returns:
+        the visitor id
+    """
+    anonymous_id = getattr(request, '_intercom_anonymous_id', None)
+    if anonymous_id is not None:
+        return anonymous_id
+    anonymous_id = request.get_signed_cookie(
+        INTERCOM_ANONYMOUS_COOKIE_NAME, default=None, salt=SALT,
+        max_age=INTERCOM_ANONYMOUS_COOKIE_AGE)
+    if anonymous_id is None:
+        anonymous_id = uuid.uuid4().hex
+        request._intercom_anonymous_id_is_new = True
+    request._intercom_anonymous_id = anonymous_id
+    return anonymous_id
+
+
+def set_anonymous_id_cookie(request, response):
+    """ Set the cookie of a visitor id made during this request. """
+    if getattr(request, '_intercom_anonymous_id_is_new', False):
+        response.set_signed_cookie(
+            INTERCOM_ANONYMOUS_COOKIE_NAME, request._intercom_anonymous_id,
+            salt=SALT, max_age=INTERCOM_ANONYMOUS_COOKIE_AGE, httponly=True,
+            samesite='Lax')
+    return response
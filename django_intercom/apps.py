@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+from django.apps import AppConfig
+from django.core.signals import setting_changed
+
+
+class IntercomConfig(AppConfig):
+    name = 'django_intercom'
+    verbose_name = 'Intercom'
+
+    def ready(self):
+        from django_intercom.cache import connect_signals, reconnect_signals
+        from django_intercom.providers import registry, reload_providers
+        from django_intercom.rules import reload_rules
+
+        registry.load()
+        connect_signals()
+        setting_changed.connect(reload_providers,
+                                dispatch_uid='django_intercom.providers')
+        setting_changed.connect(reconnect_signals,
+                                dispatch_uid='django_intercom.cache')
+        setting_changed.connect(reload_rules,
+                                dispatch_uid='django_intercom.rules')
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from django_intercom.settings import (INTERCOM_BREAKER_RESET_TIMEOUT,
+                                      INTERCOM_BREAKER_THRESHOLD,
+                                      INTERCOM_CACHE_ALIAS,
+                                      INTERCOM_STALE_TIMEOUT)
+
+log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+STALE_KEY = 'intercom:stale:{method}:{path}:{user_id}'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+# digest and time of the last good values this process wrote, so an
+# unchanged value isn't written again on every render
+_written = OrderedDict()
+_written_lock = threading.Lock()
+WRITTEN_SIZE = 10000
+
+
+class CircuitBreaker(object):
+    """ Stops calling a provider after threshold consecutive failures or
+        timeouts. While it is open the provider is skipped, after
+        reset_timeout seconds a single call is let through to try it again,
+        which closes the breaker when it succeeds. If that call doesn't
+        succeed or fail within reset_timeout, another one is let through.
+
+        The state is kept per process.
+    """
+
+    def __init__(self, name, threshold=5, reset_timeout=30):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.counts = {'successes': 0, 'failures': 0, 'timeouts': 0,
+                       'skipped': 0, 'stale': 0, 'opened': 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ Whether the provider can be called now. """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # the next call tries the provider, the others are skipped
+                # until it's done. A trial that never reports back, because
+                # its request was cancelled, is replaced after reset_timeout
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            self.counts['skipped'] += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.counts['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                log.info("%s works again, closing its breaker.", self.name)
+            self.state = CLOSED
+
+    def failure(self, timeout=False):
+        with self._lock:
+            self.counts['timeouts' if timeout else 'failures'] += 1
+            self.consecutive_failures += 1
+            if (self.state == HALF_OPEN or
+                    self.consecutive_failures >= self.threshold):
+                if self.state != OPEN:
+                    self.counts['opened'] += 1
+                    log.warning("%s failed %s times in a row, skipping it "
+                                "for %ss.", self.name,
+                                self.consecutive_failures,
+                                self.reset_timeout)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def skipped(self):
+        """ Count a call that was skipped without being tried. """
+        with self._lock:
+            self.counts['skipped'] += 1
+
+    def served_stale(self):
+        with self._lock:
+            self.counts['stale'] += 1
+
+    def status(self):
+        """ The state and counts, for monitoring. """
+        with self._lock:
+            status = dict(self.counts, state=self.state,
+                          consecutive_failures=self.consecutive_failures)
+        return status
+
+
+def get_breaker(path, method):
+    """ The circuit breaker of a provider method. """
+    key = '%s.%s' % (path, method)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(
+                key, INTERCOM_BREAKER_THRESHOLD,
+                INTERCOM_BREAKER_RESET_TIMEOUT))
+    return breaker
+
+
+def breaker_status():
+    """
+    The state of every circuit breaker of this process, for monitoring.
+
+    Returns:
+        dictionary of 'path.method' to the state ('closed', 'open' or
+        'half-open'), the consecutive failures and the counts of
+        successes, failures, timeouts, skipped calls, stale values served
+        and times the breaker opened
+    """
+    return {key: breaker.status() for key, breaker in list(_breakers.items())}
+
+
+def reset_breakers():
+    """ Forget the state of every breaker and the last good values
+        written. """
+    with _breakers_lock:
+        _breakers.clear()
+    with _written_lock:
+        _written.clear()
+
+
+def stale_enabled():
+    return INTERCOM_STALE_TIMEOUT is not None
+
+
+def _digest(value):
+    return hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode(
+        'utf8')).hexdigest()
+
+
+def set_last_good(method, user, values):
+    """ Keep the values of the providers that succeeded, dictionary of path
+        to value, to serve them while the providers fail.
+
+        A value is only written when it changed since this process last
+        wrote it, or halfway through INTERCOM_STALE_TIMEOUT so it doesn't
+        expire while the provider keeps returning it.
+    """
+    if not stale_enabled() or not values:
+        return
+    now = time.monotonic()
+    changed = {}
+    with _written_lock:
+        for path, value in values.items():
+            key = STALE_KEY.format(method=method, path=path, user_id=user.pk)
+            digest = _digest(value)
+            written = _written.get(key)
+            if (written is not None and written[0] == digest and
+                    now - written[1] < INTERCOM_STALE_TIMEOUT / 2):
+                continue
+            changed[key] = value
+            _written[key] = (digest, now)
+            _written.move_to_end(key)
+        while len(_written) > WRITTEN_SIZE:
+            _written.popitem(last=False)
+    if changed:
+        caches[INTERCOM_CACHE_ALIAS].set_many(changed,
+                                              INTERCOM_STALE_TIMEOUT)
+
+
+def get_last_good(method, user, paths):
+    """ The last good values of providers, dictionary of path to value. """
+    if not stale_enabled() or not paths:
+        return {}
+    keys = {STALE_KEY.format(method=method, path=path, user_id=user.pk): path
+            for path in paths}
+    found = caches[INTERCOM_CACHE_ALIAS].get_many(list(keys))
+    return {keys[key]: value for key, value in found.items()}
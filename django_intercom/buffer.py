@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class BatchBuffer(object):
+    """ In-process buffer that hands its items to send_batch in batches from
+        a background thread. A batch is sent when batch_size items are
+        waiting or every interval seconds. Failed batches are retried with
+        exponential backoff, and what is left is sent when the process exits.
+
+        The buffer holds at most max_items, the oldest items are dropped
+        when it is full.
+    """
+
+    def __init__(self, send_batch, batch_size=100, interval=5.0,
+                 max_retries=3, backoff=0.5, max_items=10000, name='buffer'):
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.name = name
+        self._items = deque(maxlen=max_items)
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        """ Queue an item, it never blocks on the network. """
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                log.warning("%s is full, dropping the oldest item.",
+                            self.name)
+            self._items.append(item)
+            if len(self._items) >= self.batch_size:
+                self._condition.notify()
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        # started lazily and again after a fork, threads don't survive it
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._condition:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run,
+                                            name='intercom-%s' % self.name)
+            self._thread.daemon = True
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._items) < self.batch_size:
+                    self._condition.wait(self.interval)
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                return
+
+    def _take(self):
+        with self._condition:
+            count = min(self.batch_size, len(self._items))
+            return [self._items.popleft() for i in range(count)]
+
+    def flush(self):
+        """ Send everything that is buffered, in the calling thread.
+            Returns the number of items sent. """
+        sent = 0
+        with self._send_lock:
+            batch = self._take()
+            while batch:
+                if self._send(batch):
+                    sent += len(batch)
+                batch = self._take()
+        return sent
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.send_batch(batch)
+                return True
+            except Exception:
+                if attempt == self.max_retries:
+                    log.exception("%s couldn't send %s items, dropping them.",
+                                  self.name, len(batch))
+                    return False
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def stop(self, timeout=None):
+        """ Stop the background thread after it sent the buffered items. """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        else:
+            self.flush()
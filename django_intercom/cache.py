@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from django_intercom import instrumentation
+from django_intercom.providers import configured_providers, registry
+from django_intercom.settings import (INTERCOM_CACHE_ALIAS,
+                                      INTERCOM_COMPANY_CACHE_TIMEOUT,
+                                      INTERCOM_DATA_CACHE_TIMEOUT,
+                                      INTERCOM_SNIPPET_CACHE_TIMEOUT)
+
+log = logging.getLogger(__name__)
+
+CACHE_KEY = 'intercom:{method}:{user_id}'
+CACHED_METHODS = ('custom_data', 'company_data')
+SNIPPET_KEY = 'intercom:snippet:{user_id}'
+# company data shared by the members of a company, see get_or_build_company
+COMPANY_KEY = 'intercom:company:{key}'
+# changed by invalidate_company, it is part of the snippets of its members
+COMPANY_GENERATION_KEY = 'intercom:company:generation:{key}'
+# changed by invalidate_snippets, it is part of every snippet version
+GENERATION_KEY = 'intercom:snippet:generation'
+
+# model class -> list of providers that declared it in cache_invalidated_by
+_dependencies = {}
+_settings_hash = None
+# whether a payload built in this thread was incomplete, those snippets
+# aren't cached
+_local = threading.local()
+
+
+def get_cache():
+    return caches[INTERCOM_CACHE_ALIAS]
+
+
+def is_enabled():
+    return INTERCOM_DATA_CACHE_TIMEOUT is not None
+
+
+def snippets_enabled():
+    return INTERCOM_SNIPPET_CACHE_TIMEOUT is not None
+
+
+def payload_version(method, paths):
+    """
+    Build the version string of a cached payload. It changes when the
+    configured provider classes change or when one of them bumps its
+    cache_version attribute.
+    """
+    versions = []
+    for path in paths:
+        provider = registry.get(path, method)
+        versions.append('%s=%s' % (path,
+                                   getattr(provider, 'cache_version', '')))
+    return ';'.join(versions)
+
+
+def get_or_build(method, user, paths, build):
+    """
+    Get the JSON payload of a provider method from the cache, or build it
+    and store it if it isn't cached yet.
+    Args:
+        method: the provider method (custom_data or company_data)
+        user: The Django user
+        paths: the configured provider class paths
+        build: callable that builds the JSON payload for the user, it
+            returns (payload, complete). Incomplete payloads aren't cached.
+
+    Returns:
+        the JSON payload
+    """
+    if not is_enabled():
+        return build(user)[0]
+    start = time.perf_counter()
+    payload = get_cached(method, user, paths)
+    if payload is not None and instrumentation.is_enabled():
+        instrumentation.cache_hit(','.join(paths), method,
+                                  time.perf_counter() - start, payload)
+    if payload is None:
+        payload, complete = build(user)
+        if complete:
+            set_cached(method, user, paths, payload)
+        else:
+            _local.incomplete = True
+    return payload
+
+
+def get_cached(method, user, paths):
+    """ Get the cached JSON payload of a user, or None on a miss. """
+    if not is_enabled():
+        return None
+    cached = get_cache().get(CACHE_KEY.format(method=method,
+                                              user_id=user.pk))
+    if cached is not None and cached[0] == payload_version(method, paths):
+        return cached[1]
+    return None
+
+
+def set_cached(method, user, paths, payload):
+    """ Store the JSON payload of a user. """
+    if not is_enabled():
+        return
+    get_cache().set(CACHE_KEY.format(method=method, user_id=user.pk),
+                    (payload_version(method, paths), payload),
+                    INTERCOM_DATA_CACHE_TIMEOUT)
+
+
+def get_or_build_company(provider, path, user, build):
+    """
+    Get the JSON company data of a user from the cache shared by every
+    member of the company, or build it once for the company and store it.
+    Args:
+        provider: the company data class, with a company_key(user) method
+            returning the key of the company of a user, or None
+        path: the configured company data class path
+        user: The Django user
+        build: callable that builds the JSON payload for the user, it
+            returns (payload, complete). Incomplete payloads aren't cached.
+
+    Returns:
+        the JSON payload, '{}' if the user doesn't have a company
+    """
+    try:
+        company_key = provider.company_key(user)
+    except Exception:
+        log.exception("%s.company_key raised an error, skipping.", path)
+        _local.incomplete = True
+        return '{}'
+    if company_key is None:
+        return '{}'
+    start = time.perf_counter()
+    payload = get_company_cached(company_key, path)
+    if payload is not None:
+        if instrumentation.is_enabled():
+            instrumentation.cache_hit(path, 'company_data',
+                                      time.perf_counter() - start, payload)
+        return payload
+    payload, complete = build(user)
+    if complete:
+        set_company_cached(company_key, path, payload)
+    else:
+        _local.incomplete = True
+    return payload
+
+
+def get_company_cached(company_key, path):
+    """ Get the cached JSON payload of a company, or None on a miss. """
+    cached = get_cache().get(COMPANY_KEY.format(key=company_key))
+    if (cached is not None and
+            cached[0] == payload_version('company_data', [path])):
+        return cached[1]
+    return None
+
+
+def set_company_cached(company_key, path, payload):
+    """ Store the JSON payload of a company. """
+    get_cache().set(COMPANY_KEY.format(key=company_key),
+                    (payload_version('company_data', [path]), payload),
+                    INTERCOM_COMPANY_CACHE_TIMEOUT)
+
+
+def invalidate_company(*company_keys):
+    """ Remove the cached payloads of companies. The cached snippets of their
+        members embed them, the generation of each company changes so they
+        aren't used anymore either. """
+    get_cache().delete_many([COMPANY_KEY.format(key=company_key)
+                             for company_key in company_keys])
+    get_cache().set_many({COMPANY_GENERATION_KEY.format(key=company_key):
+                          uuid.uuid4().hex for company_key in company_keys},
+                         None)
+
+
+def _company_generation_key(user, providers):
+    """ The COMPANY_GENERATION_KEY of the company of a user, or None if the
+        company data isn't shared by the members of a company. """
+    for provider in providers:
+        if hasattr(provider, 'company_key'):
+            try:
+                company_key = provider.company_key(user)
+            except Exception:
+                # get_or_build_company logs it and doesn't cache the snippet
+                return None
+            if company_key is not None:
+                return COMPANY_GENERATION_KEY.format(key=company_key)
+    return None
+
+
+def settings_hash():
+    """ A digest of the INTERCOM_* settings, the snippets rendered with
+        other settings (or another secure key) aren't used. """
+    global _settings_hash
+    if _settings_hash is None:
+        values = sorted((name, repr(getattr(settings, name)))
+                        for name in dir(settings)
+                        if name.startswith('INTERCOM_'))
+        _settings_hash = hashlib.md5(
+            repr(values).encode('utf8')).hexdigest()
+    return _settings_hash
+
+
+def snippet_version(user, providers, generation, variant=''):
+    """
+    Build the version string of a cached snippet.
+    Args:
+        user: The Django user
+        providers: the instances of the configured data classes
+        generation: the values of GENERATION_KEY and of the
+            COMPANY_GENERATION_KEY of the company of the user
+        variant: anything else that changes the snippet, like the widget
+            loader of the tag
+
+    Returns:
+        a digest of the user id and date_joined, the settings, the
+        generation and the cache_version and cache_token(user) of the
+        providers
+    """
+    parts = [str(user.pk), str(getattr(user, 'date_joined', '')),
+             settings_hash(), str(generation), variant]
+    for provider in providers:
+        parts.append('%s.%s=%s' % (type(provider).__module__,
+                                   type(provider).__qualname__,
+                                   getattr(provider, 'cache_version', '')))
+        if hasattr(provider, 'cache_token'):
+            parts.append(str(provider.cache_token(user)))
+    return hashlib.md5('|'.join(parts).encode('utf8')).hexdigest()
+
+
+def get_or_render_snippet(user, providers, timeout, render, variant=''):
+    """
+    Get the rendered snippet of a user from the cache, or render it and store
+    it. A hit is a single get_many, with the generation of the company of the
+    user when the company data class has a company_key method.
+    Args:
+        user: The Django user
+        providers: the instances of the configured data classes
+        timeout: cache timeout in seconds
+        render: callable that renders the snippet. Snippets with incomplete
+            custom or company data aren't cached.
+        variant: anything else that changes the snippet
+
+    Returns:
+        the snippet
+    """
+    key = SNIPPET_KEY.format(user_id=user.pk)
+    keys = [key, GENERATION_KEY]
+    company_generation_key = _company_generation_key(user, providers)
+    if company_generation_key is not None:
+        keys.append(company_generation_key)
+    found = get_cache().get_many(keys)
+    generation = '%s:%s' % (found.get(GENERATION_KEY, ''),
+                            found.get(company_generation_key, ''))
+    version = snippet_version(user, providers, generation, variant)
+    cached = found.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    _local.incomplete = False
+    snippet = render()
+    if not _local.incomplete:
+        get_cache().set(key, (version, str(snippet)), timeout)
+    return snippet
+
+
+def invalidate_snippets():
+    """ Stop using all of the cached snippets. """
+    get_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def _user_keys(user_id):
+    keys = [CACHE_KEY.format(method=method, user_id=user_id)
+            for method in CACHED_METHODS]
+    keys.append(SNIPPET_KEY.format(user_id=user_id))
+    return keys
+
+
+def invalidate_user(user_id):
+    """ Remove the cached payloads and snippet of a user. """
+    get_cache().delete_many(_user_keys(user_id))
+
+
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """ post_save receiver for the user model. """
+    if not (is_enabled() or snippets_enabled()):
+        return
+    # logging in only touches last_login, which isn't part of any payload
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidate_user(instance.pk)
+
+
+def dependency_changed(sender, instance, **kwargs):
+    """ post_save/post_delete receiver for the models declared by the
+        providers in their cache_invalidated_by attribute. """
+    user_ids, company_keys = set(), set()
+    for provider in _dependencies.get(sender, ()):
+        if hasattr(provider, 'cache_company_keys'):
+            # the company cache is always on for classes with a company_key
+            company_keys.update(provider.cache_company_keys(instance))
+        elif hasattr(provider, 'cache_user_ids'):
+            user_ids.update(provider.cache_user_ids(instance))
+        elif getattr(instance, 'user_id', None) is not None:
+            user_ids.add(instance.user_id)
+    if company_keys:
+        invalidate_company(*company_keys)
+    if user_ids and (is_enabled() or snippets_enabled()):
+        get_cache().delete_many([key for user_id in user_ids
+                                 for key in _user_keys(user_id)])
+
+
+def connect_signals():
+    """ Connect the invalidation receivers to the user model and to the
+        models declared by the configured providers. """
+    post_save.connect(user_saved, sender=get_user_model(),
+                      dispatch_uid='django_intercom.cache.user_saved')
+    for model in _dependencies:
+        post_save.disconnect(sender=model,
+                             dispatch_uid='django_intercom.cache.dependency')
+        post_delete.disconnect(sender=model,
+                               dispatch_uid='django_intercom.cache.dependency')
+    _dependencies.clear()
+
+    for path, method in configured_providers():
+        if method not in CACHED_METHODS:
+            continue
+        provider = registry.get(path, method)
+        for label in getattr(provider, 'cache_invalidated_by', ()):
+            model = apps.get_model(label)
+            _dependencies.setdefault(model, []).append(provider)
+    for model in _dependencies:
+        post_save.connect(dependency_changed, sender=model,
+                          dispatch_uid='django_intercom.cache.dependency')
+        post_delete.connect(dependency_changed, sender=model,
+                            dispatch_uid='django_intercom.cache.dependency')
+
+
+def reconnect_signals(setting, **kwargs):
+    """ setting_changed receiver, reconnects the invalidation receivers and
+        forgets the settings hash when the settings are overridden. """
+    global _settings_hash
+    if setting.startswith('INTERCOM_'):
+        _settings_hash = None
+        connect_signals()
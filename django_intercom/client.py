@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import http.client
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django_intercom.ratelimit import get_rate_limiter
+from django_intercom.settings import (INTERCOM_ACCESS_TOKEN,
+                                      INTERCOM_API_BASE_URL,
+                                      INTERCOM_API_TIMEOUT)
+
+log = logging.getLogger(__name__)
+
+# times a request is sent again after a 429, when there is a rate limiter
+THROTTLED_RETRIES = 2
+
+
+class IntercomAPIError(Exception):
+    """ Raised when the intercom API answers with an error status. """
+
+    def __init__(self, status, body, headers=None):
+        super(IntercomAPIError, self).__init__(
+            'intercom API error %s: %s' % (status, body))
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+def _seconds(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class IntercomClient(object):
+    """ Small client for the intercom REST API. Every thread keeps its own
+        keep-alive connection, so a client can be shared by a thread pool.
+
+        With a rate limiter (INTERCOM_API_RATE_LIMIT) every request waits for
+        the budget shared by all of the processes, and a 429 pauses all of
+        them for its Retry-After before the request is sent again.
+    """
+
+    def __init__(self, base_url=None, access_token=None, timeout=None,
+                 rate_limiter=None):
+        base_url = base_url or INTERCOM_API_BASE_URL
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.access_token = access_token or INTERCOM_ACCESS_TOKEN
+        self.timeout = timeout or INTERCOM_API_TIMEOUT
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.scheme == 'https':
+                connection = http.client.HTTPSConnection(
+                    self.netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(
+                    self.netloc, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """ Close the connection of the current thread. """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(self, method, path, payload=None):
+        """
+        Call the intercom API.
+        Args:
+            method: the HTTP method
+            path: the API path, e.g. /users
+            payload: data to send as JSON
+
+        Returns:
+            the decoded JSON response, or None if it is empty
+
+        Raises:
+            IntercomAPIError: on a 4xx or 5xx response
+        """
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Accept': 'application/json',
+                   'Content-Type': 'application/json'}
+        if self.access_token:
+            headers['Authorization'] = 'Bearer %s' % self.access_token
+
+        for attempt in range(THROTTLED_RETRIES + 1):
+            if (self.rate_limiter is not None and
+                    not self.rate_limiter.acquire(path)):
+                raise IntercomAPIError(429, 'rate limit budget exhausted')
+            response, content = self._send(method, path, body, headers)
+            if self.rate_limiter is None:
+                break
+            self._check_budget(path, response)
+            if response.status != 429:
+                break
+
+        if response.status >= 400:
+            raise IntercomAPIError(response.status,
+                                   content.decode('utf8', 'replace'),
+                                   dict(response.getheaders()))
+        if not content:
+            return None
+        return json.loads(content.decode('utf8'))
+
+    def _send(self, method, path, body, headers):
+        # a kept-alive connection may have been closed by the server, so
+        # retry once on a fresh one
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection.request(method, self.base_path + path, body,
+                                   headers)
+                response = connection.getresponse()
+                return response, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def _check_budget(self, path, response):
+        """ Pause the rate limiter on a 429, or when intercom reports the
+            budget is used up. """
+        reset = _seconds(response.getheader('X-RateLimit-Reset'))
+        wait = None
+        if response.status == 429:
+            retry_after = _seconds(response.getheader('Retry-After'))
+            if retry_after is not None:
+                wait = retry_after
+            elif reset is not None:
+                wait = reset - time.time()
+            else:
+                wait = self.rate_limiter.period
+            log.warning("Intercom rate limit reached on %s, waiting %.1fs.",
+                        path, wait)
+        elif (response.getheader('X-RateLimit-Remaining') == '0' and
+              reset is not None):
+            wait = reset - time.time()
+        if wait is not None and wait > 0:
+            self.rate_limiter.block(path, wait)
+
+    def post(self, path, payload):
+        return self.request('POST', path, payload)
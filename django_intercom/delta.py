@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import json
+import time
+
+from django_intercom import serializers
+from django_intercom.cache import get_cache
+from django_intercom.settings import INTERCOM_DELTA_RESEND_INTERVAL
+
+SENT_KEY = 'intercom:sent:{user_id}'
+# the payloads that are reduced to their changed keys, with the keys that
+# are always sent. A company is identified by its id.
+DELTA_PAYLOADS = (('custom_data', ()), ('company_data', ('id',)))
+
+
+def fingerprint(data):
+    """ A short digest of every top level value of a payload. """
+    return {key: hashlib.md5(json.dumps(value, sort_keys=True).encode(
+        'utf8')).hexdigest()[:16] for key, value in data.items()}
+
+
+def _changed(data, digests, previous, required):
+    if any(digests.get(key) != previous.get(key) for key in required):
+        # a different company, send all of it
+        return data
+    return {key: value for key, value in data.items()
+            if key in required or digests[key] != previous.get(key)}
+
+
+def apply_delta(context, user_id):
+    """
+    Reduce the custom and company data of a context to the keys that changed
+    since they were last sent for the user. The fingerprint of the last sent
+    payloads is kept in the cache, everything is sent again when it's missing
+    or older than INTERCOM_DELTA_RESEND_INTERVAL. The cache is only written
+    when the payloads changed or were sent in full.
+    Args:
+        context: the dictionary returned by intercom_tag
+        user_id: the primary key of the user
+
+    Returns:
+        the context with the reduced payloads
+    """
+    key = SENT_KEY.format(user_id=user_id)
+    now = time.time()
+    payloads = {method: json.loads(context[method])
+                for method, required in DELTA_PAYLOADS}
+    digests = {method: fingerprint(payloads[method])
+               for method, required in DELTA_PAYLOADS}
+
+    sent = get_cache().get(key)
+    if sent is None or now - sent[0] >= INTERCOM_DELTA_RESEND_INTERVAL:
+        get_cache().set(key, (now, digests), INTERCOM_DELTA_RESEND_INTERVAL)
+        return context
+
+    sent_at, previous = sent
+    context = dict(context)
+    for method, required in DELTA_PAYLOADS:
+        context[method] = serializers.dumps(_changed(
+            payloads[method], digests[method], previous.get(method, {}),
+            required))
+    if digests != previous:
+        # keeps the time of the full payload, so it expires on schedule
+        get_cache().set(
+            key, (sent_at, digests),
+            max(1, int(sent_at + INTERCOM_DELTA_RESEND_INTERVAL - now)))
+    return context
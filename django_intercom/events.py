@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import threading
+import time
+
+from django_intercom.buffer import BatchBuffer
+from django_intercom.client import IntercomClient
+from django_intercom.settings import (INTERCOM_EVENTS_BATCH_SIZE,
+                                      INTERCOM_EVENTS_FLUSH_INTERVAL,
+                                      INTERCOM_EVENTS_MAX_BUFFER,
+                                      INTERCOM_EVENTS_MAX_RETRIES,
+                                      INTERCOM_INCLUDE_USERID)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def send_events(events, client=None):
+    """ Post a batch of events with the intercom bulk API. """
+    client = client or IntercomClient()
+    client.post('/bulk/events', {'items': [
+        {'method': 'post', 'data_type': 'event', 'data': event}
+        for event in events]})
+
+
+def get_buffer():
+    """ The event buffer of this process, created on first use. """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                client = IntercomClient()
+                _buffer = BatchBuffer(
+                    lambda events: send_events(events, client),
+                    batch_size=INTERCOM_EVENTS_BATCH_SIZE,
+                    interval=INTERCOM_EVENTS_FLUSH_INTERVAL,
+                    max_retries=INTERCOM_EVENTS_MAX_RETRIES,
+                    max_items=INTERCOM_EVENTS_MAX_BUFFER,
+                    name='events')
+    return _buffer
+
+
+def track_event(user, event_name, metadata=None, created_at=None):
+    """
+    Record an intercom event, e.g. track_event(request.user, 'exported_report').
+    The event is buffered and sent in a batch by a background thread, so it
+    doesn't wait on the intercom API.
+    Args:
+        user: The Django user
+        event_name: name of the event
+        metadata: optional dictionary of event metadata
+        created_at: unix timestamp of the event, defaults to now
+    """
+    event = {'event_name': event_name,
+             'created_at': int(created_at or time.time())}
+    if INTERCOM_INCLUDE_USERID:
+        event['user_id'] = str(user.pk)
+    else:
+        event['email'] = user.email
+    if metadata:
+        event['metadata'] = metadata
+    get_buffer().add(event)
+
+
+def flush():
+    """ Send the buffered events now, in the calling thread. Returns the
+        number of events sent. """
+    return get_buffer().flush()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+
+from django_intercom.settings import (INTERCOM_SECURE_KEY,
+                                      INTERCOM_SECURE_KEY_FALLBACKS,
+                                      INTERCOM_INCLUDE_USERID,
+                                      INTERCOM_USER_HASH_CACHE_SIZE)
+
+# secure key -> UserHasher, so a rotated key keeps its cached hashes
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UserHasher(object):
+    """ Computes the identity verification hash (user_hash) for one secure
+        key. The key is encoded and the HMAC is keyed once, every hash copies
+        it, and the last maxsize hashes are kept in an LRU.
+    """
+
+    def __init__(self, key, maxsize=INTERCOM_USER_HASH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._hmac = hmac.new(key.encode('utf8'), digestmod=hashlib.sha256)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compute(self, value):
+        digest = self._hmac.copy()
+        digest.update(value.encode('utf8'))
+        return digest.hexdigest()
+
+    def user_hash(self, value):
+        """
+        Get the user_hash of a value.
+        Args:
+            value: the user_id, or the email if there is no user_id
+
+        Returns:
+            the hex sha256 HMAC of the value
+        """
+        with self._lock:
+            try:
+                self._cache.move_to_end(value)
+                return self._cache[value]
+            except KeyError:
+                pass
+        user_hash = self._compute(value)
+        with self._lock:
+            self._cache[value] = user_hash
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return user_hash
+
+    def hash_many(self, values):
+        """ Compute the user_hash of many values, for server side jobs. The
+            LRU is left alone so a bulk run doesn't evict the active users.
+        """
+        return [self._compute(value) for value in values]
+
+    def verify(self, value, user_hash):
+        return hmac.compare_digest(self._compute(value), user_hash)
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def get_hasher(key=None):
+    """ Get the UserHasher of a secure key, INTERCOM_SECURE_KEY by default.
+    """
+    if key is None:
+        key = INTERCOM_SECURE_KEY
+    try:
+        return _hashers[key]
+    except KeyError:
+        with _hashers_lock:
+            if key not in _hashers:
+                _hashers[key] = UserHasher(key)
+            return _hashers[key]
+
+
+def user_hash(value, key=None):
+    """ Get the user_hash of a user_id or email. """
+    return get_hasher(key).user_hash(value)
+
+
+def hash_value(user, user_data=None, include_userid=None):
+    """
+    The value intercom expects the user_hash of, the same one the tag sends.
+    Args:
+        user: The Django user
+        user_data: what INTERCOM_USER_DATA_CLASS returned for the user, its
+            user_id and email override the ones of the user
+        include_userid: defaults to INTERCOM_INCLUDE_USERID
+
+    Returns:
+        the user_id, or the email when the user_id isn't sent
+    """
+    user_data = user_data or {}
+    if include_userid is None:
+        include_userid = INTERCOM_INCLUDE_USERID
+    if include_userid:
+        user_id = user_data.get('user_id', user.pk)
+        if user_id:
+            return str(user_id)
+    return user_data.get('email', user.email)
+
+
+def user_hashes(users, key=None):
+    """
+    Compute the user_hash of many users at once, with the user_id and email
+    returned by INTERCOM_USER_DATA_CLASS like the tag.
+    Args:
+        users: iterable of Django users
+        key: the secure key, INTERCOM_SECURE_KEY by default
+
+    Returns:
+        dict of user pk -> user_hash
+    """
+    from django_intercom.templatetags import intercom
+
+    users = list(users)
+    values = [hash_value(user, intercom.get_user_data(user),
+                         intercom.INTERCOM_INCLUDE_USERID)
+              for user in users]
+    hashes = get_hasher(key).hash_many(values)
+    return dict(zip([user.pk for user in users], hashes))
+
+
+def verify_user_hash(value, user_hash):
+    """ Check a user_hash against INTERCOM_SECURE_KEY and every key in
+        INTERCOM_SECURE_KEY_FALLBACKS, for rotating the secure key. """
+    keys = [INTERCOM_SECURE_KEY] + list(INTERCOM_SECURE_KEY_FALLBACKS)
+    return any(get_hasher(key).verify(value, user_hash)
+               for key in keys if key)
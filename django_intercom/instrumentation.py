@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import json
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from django_intercom.signals import provider_timed
+
+# provider: dotted path of the provider class, or 'intercom_tag'
+# method: the provider method, or 'render' for the intercom_tag
+# duration: wall time in seconds
+# queries: number of database queries
+# size: size of the payload in bytes
+# cached: whether the payload came from the cache
+ProviderTiming = namedtuple('ProviderTiming', ['provider', 'method',
+                                               'duration', 'queries', 'size',
+                                               'cached'])
+
+_local = threading.local()
+
+
+class QueryCounter(object):
+    """ Database execute wrapper that counts the queries. """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """ Count the queries run on every database connection of the current
+        thread. """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def is_enabled():
+    """ Timing events are only built when someone is listening, either a
+        provider_timed receiver or a collect() block in this thread. """
+    return (getattr(_local, 'events', None) is not None or
+            provider_timed.has_listeners())
+
+
+@contextmanager
+def collect():
+    """ Collect the events recorded by the current thread, used by the
+        ServerTimingMiddleware. """
+    previous = getattr(_local, 'events', None)
+    _local.events = events = []
+    try:
+        yield events
+    finally:
+        _local.events = previous
+
+
+def record(event):
+    """ Send a ProviderTiming event. """
+    if event is None:
+        return
+    events = getattr(_local, 'events', None)
+    if events is not None:
+        events.append(event)
+    provider_timed.send(sender=ProviderTiming, event=event)
+
+
+def payload_size(payload):
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, default=str)
+    return len(payload.encode('utf8'))
+
+
+def timed(provider, method, func, *args):
+    """
+    Call func(*args) and time it.
+    Args:
+        provider: dotted path of the provider class
+        method: the provider method being called
+        func: the callable
+
+    Returns:
+        (result, ProviderTiming)
+    """
+    with count_queries() as counter:
+        start = time.perf_counter()
+        result = func(*args)
+        duration = time.perf_counter() - start
+    return result, ProviderTiming(provider, method, duration, counter.count,
+                                  payload_size(result), False)
+
+
+def cache_hit(provider, method, duration, payload):
+    """ Record a payload served from the cache. """
+    record(ProviderTiming(provider, method, duration, 0,
+                          payload_size(payload), True))
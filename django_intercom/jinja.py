@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import os
+
+from django.template.defaultfilters import date
+from jinja2 import Environment, FileSystemLoader
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from django_intercom import renderer
+from django_intercom.templatetags.intercom import render_tag
+
+try:
+    from jinja2 import pass_context
+except ImportError:
+    # Jinja2 < 3.0
+    from jinja2 import contextfunction as pass_context
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'jinja2')
+
+_template = None
+
+
+def _finalize(value):
+    # escapes {{ variables }} like the Django template does, |safe values
+    # are left alone
+    if hasattr(value, '__html__'):
+        return value.__html__()
+    return renderer._escape(value)
+
+
+def get_template():
+    """ The compiled jinja2/intercom/intercom_tag.html template. It has its
+        own environment, so the output doesn't depend on the options of the
+        environment it is used from. """
+    global _template
+    if _template is None:
+        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR),
+                                  finalize=_finalize,
+                                  keep_trailing_newline=True)
+        environment.filters['date'] = date
+        _template = environment.get_template('intercom/intercom_tag.html')
+    return _template
+
+
+def render_snippet(context):
+    """ Render the intercom snippet with the Jinja2 template, the output is
+        the same as the Django template. """
+    return get_template().render(context)
+
+
+@pass_context
+def intercom_tag(context, mode=None, cache_timeout=None, loading=None,
+                 delay=None):
+    """ {{ intercom_tag() }}, takes the same arguments as
+        {% intercom_tag %}. """
+    tag_context = {}
+    if context.get('request') is not None:
+        tag_context['request'] = context['request']
+    return Markup(render_tag(tag_context, mode, cache_timeout,
+                             render_snippet, loading, delay))
+
+
+class IntercomExtension(Extension):
+    """ Adds the intercom_tag global to a Jinja2 environment. """
+
+    def __init__(self, environment):
+        super(IntercomExtension, self).__init__(environment)
+        environment.globals['intercom_tag'] = intercom_tag
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import json
+
+from django_intercom.serializers import escape_script
+from django_intercom.settings import (INTERCOM_INBOX_CSS_SELECTOR,
+                                      INTERCOM_LOADING,
+                                      INTERCOM_LOADING_DELAY)
+
+# The javascript that decides when the widget script is loaded. It runs in
+# the loaders of intercom_tag.html and intercom_bootstrap.html, where w is
+# window, d is document and l loads the widget.
+STRATEGIES = ('onload', 'idle', 'delay', 'interaction', 'click')
+
+# the onload strategies are the original loaders of the templates
+ONLOAD = ("if(w.attachEvent){w.attachEvent('onload',l);}"
+          "else{w.addEventListener('load',l,false);}")
+# the settings of the bootstrap loader can arrive after the load event
+BOOTSTRAP_ONLOAD = ("if(d.readyState==='complete'){l();}"
+                    "else{w.addEventListener('load',l,false);}")
+# calls r once the page is loaded
+AFTER_LOAD = ("if(d.readyState==='complete'){r();}"
+              "else{w.addEventListener('load',r,false);}")
+IDLE = ("var r=function(){if(w.requestIdleCallback){"
+        "w.requestIdleCallback(l,{timeout:%(delay)d});}"
+        "else{w.setTimeout(l,1);}};" + AFTER_LOAD)
+DELAY = "var r=function(){w.setTimeout(l,%(delay)d);};" + AFTER_LOAD
+INTERACTION = (
+    "var e=['scroll','mousemove','touchstart','keydown','click'];"
+    "var r=function(){e.forEach(function(n){"
+    "w.removeEventListener(n,r,true);});l();};"
+    "e.forEach(function(n){"
+    "w.addEventListener(n,r,{capture:true,passive:true});});")
+CLICK = ("var r=function(e){var t=e.target;"
+         "if(t.closest&&t.closest(%(selector)s)){"
+         "d.removeEventListener('click',r,true);l();w.Intercom('show');}};"
+         "d.addEventListener('click',r,true);")
+
+
+def loader(strategy=None, delay=None, bootstrap=False):
+    """
+    Build the javascript of a loading strategy.
+    Args:
+        strategy: one of STRATEGIES, defaults to INTERCOM_LOADING
+            onload: when the page is loaded, like intercom's snippet
+            idle: when the browser is idle after the page is loaded, at
+                most delay milliseconds later
+            delay: delay milliseconds after the page is loaded
+            interaction: on the first scroll, mouse move, touch, key press
+                or click
+            click: on a click on the INTERCOM_INBOX_CSS_SELECTOR element,
+                the messenger is opened once it is loaded
+        delay: milliseconds, defaults to INTERCOM_LOADING_DELAY
+        bootstrap: the loader is for intercom_bootstrap.html
+
+    Returns:
+        the javascript
+    """
+    strategy = strategy or INTERCOM_LOADING
+    if strategy not in STRATEGIES:
+        raise ValueError("loading must be one of %s, not %r"
+                         % (', '.join(STRATEGIES), strategy))
+    delay = INTERCOM_LOADING_DELAY if delay is None else int(delay)
+    if strategy == 'onload':
+        return BOOTSTRAP_ONLOAD if bootstrap else ONLOAD
+    if strategy == 'idle':
+        return IDLE % {'delay': delay}
+    if strategy == 'delay':
+        return DELAY % {'delay': delay}
+    if strategy == 'interaction':
+        return INTERACTION
+    return CLICK % {'selector': escape_script(
+        json.dumps(INTERCOM_INBOX_CSS_SELECTOR))}
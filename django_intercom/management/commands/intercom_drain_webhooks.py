@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from django_intercom import webhooks
+from django_intercom.models import WebhookEvent
+from django_intercom.settings import INTERCOM_WEBHOOK_MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = ("Process the saved intercom webhook notifications, every "
+            "notification is sent with the webhook_received signal.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='number of notifications processed at a '
+                                 'time')
+        parser.add_argument('--loop', action='store_true',
+                            help='keep waiting for new notifications')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='seconds to wait for new notifications '
+                                 'with --loop')
+        parser.add_argument('--delete', action='store_true',
+                            help='delete the notifications once processed')
+        parser.add_argument('--max-attempts', type=int,
+                            default=INTERCOM_WEBHOOK_MAX_ATTEMPTS,
+                            help='notifications whose receivers raised this '
+                                 'many times are left alone')
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        start = time.time()
+        # the notifications that failed during this pass aren't retried
+        # until the next one
+        self.failed_pks = set()
+        while True:
+            count, errors = self.drain(options['batch_size'],
+                                       options['delete'],
+                                       options['max_attempts'])
+            processed += count - errors
+            failed += errors
+            if count:
+                continue
+            if not options['loop']:
+                break
+            self.failed_pks.clear()
+            time.sleep(options['interval'])
+
+        elapsed = time.time() - start
+        self.stdout.write('Processed %s notifications in %.1fs (%s failed)'
+                          % (processed, elapsed, failed))
+
+    def drain(self, batch_size, delete, max_attempts):
+        """ Process one batch of notifications, returns its size and the
+            number of notifications that failed. A receiver that raises only
+            rolls back its notification, it is retried by a later pass until
+            it failed max_attempts times. """
+        with transaction.atomic():
+            # other drains skip the locked rows, so they can run in parallel
+            events = list(WebhookEvent.objects.select_for_update(
+                skip_locked=True).filter(
+                processed_at__isnull=True,
+                attempts__lt=max_attempts).exclude(
+                pk__in=self.failed_pks).order_by('pk')[:batch_size])
+            if not events:
+                return 0, 0
+            done, failed = webhooks.process(events)
+            processed = WebhookEvent.objects.filter(
+                pk__in=[event.pk for event in done])
+            if delete:
+                processed.delete()
+            else:
+                processed.update(processed_at=timezone.now())
+            for event in failed:
+                event.save(update_fields=['attempts', 'error'])
+                self.failed_pks.add(event.pk)
+        return len(events), len(failed)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q, prefetch_related_objects
+
+from django_intercom.client import IntercomClient
+from django_intercom.payloads import user_payload
+from django_intercom.providers import related_lookups
+from django_intercom.templatetags import intercom
+
+
+class Command(BaseCommand):
+    help = ("Push every user, with their custom and company data, to the "
+            "intercom API.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='number of users loaded at a time')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='number of concurrent API requests')
+        parser.add_argument('--base-url',
+                            help='intercom API url, defaults to '
+                                 'INTERCOM_API_BASE_URL')
+        parser.add_argument('--checkpoint',
+                            help='file recording the last synced user and '
+                                 'the users that failed, a run with the '
+                                 'same file retries them and resumes after '
+                                 'the last one')
+
+    def handle(self, *args, **options):
+        client = IntercomClient(base_url=options['base_url'])
+        checkpoint = options['checkpoint']
+        chunk_size = options['chunk_size']
+        last_pk, self.failed_pks = self.read_checkpoint(checkpoint)
+
+        # the relations the data classes declared, instead of one query per
+        # relation and user
+        select, self.prefetch = related_lookups(intercom._data_providers())
+        users = get_user_model().objects.order_by('pk')
+        if select:
+            users = users.select_related(*select)
+        if last_pk is not None:
+            # the users that failed are tried again
+            users = users.filter(Q(pk__gt=last_pk) |
+                                 Q(pk__in=self.failed_pks))
+            self.stdout.write('Resuming after user %s, retrying %s failed '
+                              'users' % (last_pk, len(self.failed_pks)))
+
+        synced = failed = 0
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            chunk = []
+            for user in users.iterator(chunk_size=chunk_size):
+                chunk.append(user)
+                if len(chunk) >= chunk_size:
+                    ok, errors = self.sync_chunk(executor, client, chunk,
+                                                 options['workers'])
+                    synced, failed = synced + ok, failed + errors
+                    last_pk = max(last_pk or chunk[-1].pk, chunk[-1].pk)
+                    self.write_checkpoint(checkpoint, last_pk)
+                    chunk = []
+            if chunk:
+                ok, errors = self.sync_chunk(executor, client, chunk,
+                                             options['workers'])
+                synced, failed = synced + ok, failed + errors
+                last_pk = max(last_pk or chunk[-1].pk, chunk[-1].pk)
+                self.write_checkpoint(checkpoint, last_pk)
+
+        elapsed = time.time() - start
+        self.stdout.write('Synced %s users (%s failed) in %.1fs, %.1f users/s'
+                          % (synced, failed, elapsed,
+                             synced / elapsed if elapsed else 0))
+
+    def sync_chunk(self, executor, client, users, workers):
+        """ Post the users of a chunk, with at most 2 * workers requests
+            queued at a time. Returns (synced, failed). """
+        synced = failed = 0
+        pending = {}
+        if self.prefetch:
+            # prefetch_related doesn't work with iterator() on django 2.2
+            prefetch_related_objects(users, *self.prefetch)
+        for user in users:
+            # the payloads are built here, the ORM stays on this thread
+            payload = user_payload(user)
+            pending[executor.submit(client.post, '/users', payload)] = user.pk
+            if len(pending) >= workers * 2:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                ok, errors = self.count(done, pending)
+                synced, failed = synced + ok, failed + errors
+        done, not_done = wait(pending)
+        ok, errors = self.count(done, pending)
+        return synced + ok, failed + errors
+
+    def count(self, futures, pending):
+        """ Count the finished requests and remember the users that failed,
+            they are removed from pending. """
+        synced = failed = 0
+        for future in futures:
+            pk = pending.pop(future)
+            if future.exception() is None:
+                synced += 1
+                self.failed_pks.discard(pk)
+            else:
+                failed += 1
+                self.failed_pks.add(pk)
+                self.stderr.write('Failed to sync user %s: %s'
+                                  % (pk, future.exception()))
+        return synced, failed
+
+    def read_checkpoint(self, checkpoint):
+        """ The last synced pk, or None, and the pks of the users that
+            failed. """
+        if not checkpoint or not os.path.exists(checkpoint):
+            return None, set()
+        with open(checkpoint) as f:
+            data = json.load(f)
+        return data['last_pk'], set(data.get('failed_pks', ()))
+
+    def write_checkpoint(self, checkpoint, last_pk):
+        if not checkpoint:
+            return
+        # written to a temporary file first so a crash can't corrupt it
+        with open(checkpoint + '.tmp', 'w') as f:
+            json.dump({'last_pk': last_pk,
+                       'failed_pks': sorted(self.failed_pks)}, f)
+        os.replace(checkpoint + '.tmp', checkpoint)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import datetime
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from django_intercom import cache
+from django_intercom.providers import registry, related_lookups
+
+# the smallest chunk the memory ceiling can shrink the chunks to
+MIN_CHUNK_SIZE = 10
+
+
+def memory_usage():
+    """ The resident memory of this process in bytes. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        # the peak, in kilobytes on linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def init_worker():
+    """ Pool initializer. The workers are started after the command closed
+        its database connections, so every worker opens its own. """
+    import django
+    # the spawn start method doesn't inherit the app registry
+    django.setup()
+
+
+def _user_payload(method, paths, build):
+    """ (get_cached, build, set_cached) of a payload cached per user. """
+    return (lambda user: cache.get_cached(method, user, paths), build,
+            lambda user, payload: cache.set_cached(method, user, paths,
+                                                   payload))
+
+
+def _company_payload(provider, path, build):
+    """ (get_cached, build, set_cached) of the company data shared by the
+        members of a company, every company is built once per chunk. """
+    built = set()
+
+    def get_cached(user):
+        company_key = provider.company_key(user)
+        if company_key is None or company_key in built:
+            return '{}'
+        return cache.get_company_cached(company_key, path)
+
+    def set_cached(user, payload):
+        company_key = provider.company_key(user)
+        built.add(company_key)
+        cache.set_company_cached(company_key, path, payload)
+
+    return get_cached, build, set_cached
+
+
+def warm_chunk(args):
+    """
+    Build and cache the custom and company data of a chunk of users.
+    Args:
+        args: (user primary keys, force)
+
+    Returns:
+        (warmed, skipped, failed, resident memory in bytes)
+    """
+    from django_intercom.templatetags import intercom
+
+    pks, force = args
+    providers = intercom._data_providers()
+    select, prefetch = related_lookups(providers)
+    users = get_user_model()._default_manager.filter(pk__in=pks)
+    if select:
+        users = users.select_related(*select)
+    if prefetch:
+        users = users.prefetch_related(*prefetch)
+
+    methods = []
+    if intercom.INTERCOM_CUSTOM_DATA_CLASSES is not None:
+        methods.append(_user_payload('custom_data',
+                                     intercom.INTERCOM_CUSTOM_DATA_CLASSES,
+                                     intercom._build_custom_data))
+    if intercom.INTERCOM_COMPANY_DATA_CLASS is not None:
+        path = intercom.INTERCOM_COMPANY_DATA_CLASS
+        cd_class = registry.get(path, 'company_data')
+        if hasattr(cd_class, 'company_key'):
+            methods.append(_company_payload(cd_class, path,
+                                            intercom._build_company_data))
+        else:
+            methods.append(_user_payload('company_data', [path],
+                                         intercom._build_company_data))
+
+    warmed = skipped = failed = 0
+    for user in users:
+        built = False
+        for get_cached, build, set_cached in methods:
+            if not force and get_cached(user) is not None:
+                continue
+            payload, complete = build(user)
+            if not complete:
+                failed += 1
+                break
+            set_cached(user, payload)
+            built = True
+        else:
+            if built:
+                warmed += 1
+            else:
+                skipped += 1
+    return warmed, skipped, failed, memory_usage()
+
+
+class Command(BaseCommand):
+    help = ("Fill the cache with the custom and company data of the users "
+            "that logged in recently, so their next page view doesn't build "
+            "them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='warm the users that logged in within this '
+                                 'many days')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='number of users warmed at a time')
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1,
+                            help='number of worker processes, 0 warms in '
+                                 'this process')
+        parser.add_argument('--max-memory', type=int, default=1024,
+                            help='memory ceiling of the command and its '
+                                 'workers in MB')
+        parser.add_argument('--force', action='store_true',
+                            help='build the payloads that are already '
+                                 'cached as well')
+
+    def handle(self, *args, **options):
+        if not cache.is_enabled():
+            raise CommandError('Set INTERCOM_DATA_CACHE_TIMEOUT to warm the '
+                               'cache.')
+        processes = options['processes']
+        if processes and isinstance(cache.get_cache(), LocMemCache):
+            self.stderr.write('The cache is local to each process, warming '
+                              'in this process.')
+            processes = 0
+
+        since = timezone.now() - datetime.timedelta(days=options['days'])
+        pks = get_user_model()._default_manager.filter(
+            last_login__gte=since).order_by('pk').values_list(
+            'pk', flat=True)
+
+        # the ceiling is shared by the command and its workers
+        self.worker_memory = (options['max_memory'] * 1024 * 1024 //
+                              (processes + 1))
+        self.chunk_size = options['chunk_size']
+        self.totals = [0, 0, 0]
+        start = time.time()
+        if processes:
+            self.warm_in_pool(pks, processes, options['force'])
+        else:
+            self.warm_in_process(pks, options['force'])
+
+        warmed, skipped, failed = self.totals
+        elapsed = time.time() - start
+        users = warmed + skipped + failed
+        self.stdout.write('Warmed %s users (%s already cached, %s failed) in '
+                          '%.1fs, %.1f users/s'
+                          % (warmed, skipped, failed, elapsed,
+                             users / elapsed if elapsed else 0))
+
+    def chunks(self, pks):
+        """ The primary keys in chunks of self.chunk_size, which shrinks
+            when a worker goes over its share of the memory ceiling. """
+        chunk = []
+        for pk in pks.iterator(chunk_size=self.chunk_size):
+            chunk.append(pk)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def record(self, result):
+        warmed, skipped, failed, memory = result
+        self.totals[0] += warmed
+        self.totals[1] += skipped
+        self.totals[2] += failed
+        if (max(memory, memory_usage()) > self.worker_memory and
+                self.chunk_size > MIN_CHUNK_SIZE):
+            self.chunk_size = max(MIN_CHUNK_SIZE, self.chunk_size // 2)
+            self.stderr.write('Over the memory ceiling, warming %s users at '
+                              'a time.' % self.chunk_size)
+
+    def warm_in_process(self, pks, force):
+        for chunk in self.chunks(pks):
+            self.record(warm_chunk((chunk, force)))
+
+    def warm_in_pool(self, pks, processes, force):
+        # the workers are all started here, without the connections of this
+        # process. Workers aren't recycled: forking while the primary keys
+        # are streamed would share the open connection.
+        connections.close_all()
+        pool = multiprocessing.Pool(processes, initializer=init_worker)
+        try:
+            pending = []
+            for chunk in self.chunks(pks):
+                pending.append(pool.apply_async(warm_chunk, ((chunk, force),)))
+                # at most two chunks per worker are waiting
+                while len(pending) >= processes * 2:
+                    self.record(pending.pop(0).get())
+            for result in pending:
+                self.record(result.get())
+        finally:
+            pool.close()
+            pool.join()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import re
+
+from django_intercom import instrumentation
+from django_intercom.anonymous import set_anonymous_id_cookie
+from django_intercom.settings import INTERCOM_SNIPPET_SCAN_BYTES
+
+
+class ServerTimingMiddleware(object):
+    """ Adds the timing of the intercom_tag and of the data providers of the
+        request to the Server-Timing response header, so they show up in the
+        browser developer tools.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with instrumentation.collect() as events:
+            response = self.get_response(request)
+        if events:
+            timings = [self.format_event(event) for event in events]
+            if response.has_header('Server-Timing'):
+                timings.insert(0, response['Server-Timing'])
+            response['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def format_event(self, event):
+        description = '%s q=%s b=%s%s' % (event.provider, event.queries,
+                                          event.size,
+                                          ' cached' if event.cached else '')
+        return 'intercom-%s;dur=%.2f;desc="%s"' % (
+            event.method, event.duration * 1000, description)
+
+
+class IntercomSnippetMiddleware(object):
+    """ Inserts the intercom snippet before the </body> tag of HTML responses,
+        so the templates don't need {% intercom_tag %} and the rest of the page
+        doesn't depend on the user.
+
+        Only the last INTERCOM_SNIPPET_SCAN_BYTES of the content are searched.
+        Streaming, non HTML, encoded responses and pages that already rendered
+        {% intercom_tag %} are left alone. It has to come after the session and
+        authentication middleware, and before GZipMiddleware.
+
+        A tag rendered earlier and cached with the page, or with a fragment
+        of it, doesn't flag the request. It is found by the intercomSettings
+        of its script, or the comment of a skipped tag, in the same tail.
+    """
+    body_re = re.compile(br'</body\s*>', re.IGNORECASE)
+    snippet_re = re.compile(br'intercomSettings|<!-- Skipping intercom ')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or
+                getattr(request, '_intercom_rendered', False) or
+                response.has_header('Content-Encoding') or
+                'html' not in response.get('Content-Type', '')):
+            return response
+
+        content = response.content
+        offset = max(0, len(content) - INTERCOM_SNIPPET_SCAN_BYTES)
+        matches = list(self.body_re.finditer(content, offset))
+        if not matches or self.snippet_re.search(content, offset):
+            return response
+        index = matches[-1].start()
+
+        # imported here, the templatetags module needs the app registry
+        from django_intercom.templatetags.intercom import render_intercom_tag
+        snippet = render_intercom_tag({'request': request})
+        response.content = b''.join([content[:index],
+                                     snippet.encode(response.charset),
+                                     content[index:]])
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
+
+
+class IntercomAnonymousIdMiddleware(object):
+    """ Sets the signed cookie of the visitor ids made by the intercom_tag
+        when INTERCOM_ANONYMOUS_ID is 'cookie'. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return set_anonymous_id_cookie(request, self.get_response(request))
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.27 on 2026-10-18 01:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.CharField(max_length=64, unique=True)),
+                ('topic', models.CharField(max_length=100)),
+                ('payload', models.TextField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ('pk',),
+            },
+        ),
+    ]
@@ -1 +1,26 @@
-# no models needed
\ No newline at end of file
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+from django.db import models
+from django.utils import timezone
+
+
+class WebhookEvent(models.Model):
+    """ A webhook notification received from intercom. They are saved by
+        the webhook view before it answers, and processed by the
+        intercom_drain_webhooks command. A notification whose receivers
+        raised keeps the number of attempts and the last error. """
+    notification_id = models.CharField(max_length=64, unique=True)
+    topic = models.CharField(max_length=100)
+    payload = models.TextField()
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('pk',)
+
+    def __str__(self):
+        return '%s %s' % (self.topic, self.notification_id)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+from django_intercom import renderer
+from django_intercom.templatetags.intercom import (_user_context,
+                                                   get_company_data,
+                                                   get_custom_data,
+                                                   get_user_data)
+
+COMPANY_KEYS = ('id', 'name', 'created_at')
+
+
+def company_payload(company):
+    """ Convert the dictionary of the company data class to an intercom API
+        company. """
+    payload = {'company_id': str(company['id']),
+               'name': company['name'],
+               'remote_created_at': company['created_at']}
+    custom_attributes = dict((key, value) for key, value in company.items()
+                             if key not in COMPANY_KEYS)
+    if custom_attributes:
+        payload['custom_attributes'] = custom_attributes
+    return payload
+
+
+def user_payload(user):
+    """
+    Build the intercom API user of a django user, with the same user, custom
+    and company data classes as the intercom_tag.
+    Args:
+        user: The Django user
+
+    Returns:
+        the user as a dictionary for the intercom users API
+    """
+    context = _user_context(user, get_user_data(user), get_custom_data(user),
+                            get_company_data(user))
+    data = renderer.intercom_settings(context)
+
+    payload = {'email': data['email'], 'name': data['name']}
+    if data.get('user_id'):
+        payload['user_id'] = data['user_id']
+    if data['created_at'] is not None:
+        payload['signed_up_at'] = data['created_at']
+    if data['custom_data']:
+        payload['custom_attributes'] = data['custom_data']
+    if data['company']:
+        payload['companies'] = [company_payload(data['company'])]
+    return payload
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from django.utils.functional import SimpleLazyObject
+
+from django_intercom import instrumentation
+from django_intercom.breaker import (get_breaker, get_last_good,
+                                     reset_breakers, set_last_good,
+                                     stale_enabled)
+from django_intercom.settings import (INTERCOM_PROVIDER_THREADS,
+                                      INTERCOM_PROVIDER_TIMEOUT)
+
+log = logging.getLogger(__name__)
+
+
+def my_import(name):
+    """ dynamic importing """
+    module, attr = name.rsplit('.', 1)
+    mod = __import__(module, fromlist=[attr])
+    klass = getattr(mod, attr)
+    return klass()
+
+
+def configured_providers():
+    """
+    Get the data provider classes configured in the django settings.
+
+    Returns:
+        list of (path, method) tuples, one per configured class
+    """
+    providers = []
+    user_data_class = getattr(settings, 'INTERCOM_USER_DATA_CLASS', None)
+    if user_data_class:
+        providers.append((user_data_class, 'user_data'))
+    for custom_data_class in getattr(settings,
+                                     'INTERCOM_CUSTOM_DATA_CLASSES',
+                                     None) or []:
+        providers.append((custom_data_class, 'custom_data'))
+    company_data_class = getattr(settings, 'INTERCOM_COMPANY_DATA_CLASS', None)
+    if company_data_class:
+        providers.append((company_data_class, 'company_data'))
+    return providers
+
+
+def call_provider(provider, method, user):
+    """ Call a provider method from sync code. Providers can define async
+        methods, they are run to completion through asgiref. """
+    func = getattr(provider, method)
+    if asyncio.iscoroutinefunction(func):
+        from asgiref.sync import async_to_sync
+        return async_to_sync(func)(user)
+    return func(user)
+
+
+def timed_call_provider(path, provider, method, user, instrument=None):
+    """ call_provider that also returns a ProviderTiming event when the
+        instrumentation is on, or None. """
+    if instrument is None:
+        instrument = instrumentation.is_enabled()
+    if not instrument:
+        return call_provider(provider, method, user), None
+    return instrumentation.timed(path, method, call_provider, provider,
+                                 method, user)
+
+
+def record_call_provider(path, provider, method, user):
+    """ call_provider that records a ProviderTiming event when the
+        instrumentation is on. """
+    result, event = timed_call_provider(path, provider, method, user)
+    instrumentation.record(event)
+    return result
+
+
+async def acall_provider(provider, method, user):
+    """ Await a provider method. Sync methods are offloaded to a thread so
+        they can't block the event loop. """
+    func = getattr(provider, method)
+    if asyncio.iscoroutinefunction(func):
+        return await func(user)
+    from asgiref.sync import sync_to_async
+    return await sync_to_async(func)(user)
+
+
+def declares_related(provider):
+    return bool(getattr(provider, 'select_related', None) or
+                getattr(provider, 'prefetch_related', None))
+
+
+def related_lookups(providers):
+    """
+    Merge the select_related and prefetch_related attributes of providers.
+
+    Returns:
+        (select_related, prefetch_related) lists without duplicates
+    """
+    select, prefetch = [], []
+    for provider in providers:
+        for lookup in getattr(provider, 'select_related', None) or ():
+            if lookup not in select:
+                select.append(lookup)
+        for lookup in getattr(provider, 'prefetch_related', None) or ():
+            if lookup not in prefetch:
+                prefetch.append(lookup)
+    return select, prefetch
+
+
+def load_related(user, select, prefetch):
+    """ Reload a user with the given relations, in a single query plus one
+        per prefetch_related lookup. """
+    users = get_user_model()._default_manager.all()
+    if select:
+        users = users.select_related(*select)
+    if prefetch:
+        users = users.prefetch_related(*prefetch)
+    return users.get(pk=user.pk)
+
+
+class RelatedUser(SimpleLazyObject):
+    """ A user that is only reloaded with its relations when a provider
+        uses it. The pk is known up front, so the cache lookups don't load
+        it. """
+
+    def __init__(self, user, select, prefetch):
+        self.__dict__['_pk'] = user.pk
+        super(RelatedUser, self).__init__(
+            lambda: load_related(user, select, prefetch))
+
+    @property
+    def pk(self):
+        return self.__dict__['_pk']
+
+
+def with_related(user, providers):
+    """
+    Get the user to pass to the providers.
+    Args:
+        user: The Django user
+        providers: the provider instances that will be called
+
+    Returns:
+        a RelatedUser loading every relation the providers declared in
+        their select_related and prefetch_related attributes, or the user
+        itself if they didn't declare any
+    """
+    select, prefetch = related_lookups(providers)
+    if not select and not prefetch:
+        return user
+    return RelatedUser(user, select, prefetch)
+
+
+class PoolBusy(Exception):
+    """ A call didn't get a thread: the provider already holds its share
+        of the threads with calls the pages stopped waiting for, or every
+        thread was busy until the deadline. """
+
+
+class ProviderPool(object):
+    """ The threads shared by every provider call that runs out of the
+        request thread. A call waits in the queue for a free thread until
+        its deadline.
+
+        A call that misses its deadline keeps its thread until the provider
+        returns. A provider can hold at most max_abandoned threads like
+        this, then its calls are skipped until they come back, so a provider
+        that hangs can't take the threads of the others.
+    """
+
+    def __init__(self, size, max_abandoned=None):
+        self.size = size
+        if max_abandoned is None:
+            max_abandoned = max(1, size // 2)
+        self.max_abandoned = max_abandoned
+        self.abandoned = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix='intercom-provider')
+
+    def submit(self, path, fn, *args):
+        """ Queue fn(*args), PoolBusy is raised if the provider at path
+            already holds max_abandoned threads. """
+        with self._lock:
+            if self.abandoned.get(path, 0) >= self.max_abandoned:
+                raise PoolBusy()
+        return self._executor.submit(fn, *args)
+
+    def abandon(self, path, future):
+        """ Stop waiting for a call, if it is running its thread counts
+            against the provider until it returns. Returns True if the call
+            was still waiting for a thread. """
+        if future.cancel():
+            return True
+        with self._lock:
+            self.abandoned[path] = self.abandoned.get(path, 0) + 1
+
+        def returned(future):
+            with self._lock:
+                self.abandoned[path] -= 1
+
+        future.add_done_callback(returned)
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ The provider threads, shared by every request and created on first
+        use. """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProviderPool(INTERCOM_PROVIDER_THREADS)
+    return _pool
+
+
+def _call_in_thread(path, provider, method, user, instrument):
+    try:
+        return timed_call_provider(path, provider, method, user, instrument)
+    finally:
+        # the pool threads aren't part of a request, so clean up their
+        # database connections the way django does at the end of a request.
+        close_old_connections()
+
+
+def _submit(path, provider, method, user, instrument):
+    return get_pool().submit(path, _call_in_thread, path, provider, method,
+                             user, instrument)
+
+
+def provider_timeout(provider):
+    """ Seconds to wait for a provider, its own timeout attribute or
+        INTERCOM_PROVIDER_TIMEOUT. None waits as long as it takes. """
+    return getattr(provider, 'timeout', INTERCOM_PROVIDER_TIMEOUT)
+
+
+def _deadline(start, *timeouts):
+    timeouts = [t for t in timeouts if t is not None]
+    return start + min(timeouts) if timeouts else None
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(0, deadline - time.time())
+
+
+def _result(path, future, deadline):
+    """ The (result, event) of a _call_in_thread future, waiting until the
+        deadline at most. """
+    try:
+        return future.result(timeout=_remaining(deadline))
+    except FutureTimeoutError:
+        if get_pool().abandon(path, future):
+            raise PoolBusy()
+        raise
+
+
+def _failed(breaker, path, method, error):
+    """ Record a failed call, error is the exception it raised. """
+    if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+        breaker.failure(timeout=True)
+        log.warning("%s.%s didn't finish in time, skipping.", path, method)
+    elif isinstance(error, PoolBusy):
+        # not the provider's fault, or its earlier calls were already
+        # counted as timeouts
+        breaker.skipped()
+        log.warning("%s.%s didn't get a thread in time, skipping.",
+                    path, method)
+    else:
+        breaker.failure()
+        log.error("%s.%s raised an error, skipping.", path, method,
+                  exc_info=error)
+
+
+def _allowed(providers, method):
+    """ The (index, path, provider, breaker) of the providers whose breaker
+        lets them be called. """
+    calls = []
+    for index, (path, provider) in enumerate(providers):
+        breaker = get_breaker(path, method)
+        if breaker.allow():
+            calls.append((index, path, provider, breaker))
+        else:
+            log.info("%s.%s breaker is open, skipping.", path, method)
+    return calls
+
+
+def _with_last_good(providers, method, user, results):
+    """
+    Keep the values of the providers that succeeded and fill in the last
+    good values of the others.
+    Args:
+        providers: list of (path, provider) tuples
+        method: the provider method
+        user: The Django user
+        results: dictionary of the index in providers to the value of the
+            providers that succeeded
+
+    Returns:
+        (results, complete) like call_providers
+    """
+    complete = len(results) == len(providers)
+    set_last_good(method, user, {providers[index][0]: value
+                                 for index, value in results.items()})
+    if not complete:
+        missing = [path for index, (path, provider) in enumerate(providers)
+                   if index not in results]
+        last_good = get_last_good(method, user, missing)
+        for index, (path, provider) in enumerate(providers):
+            if index not in results and path in last_good:
+                log.info("%s.%s is unavailable, using its last good value.",
+                         path, method)
+                get_breaker(path, method).served_stale()
+                results[index] = last_good[path]
+    return [results[index] for index in sorted(results)], complete
+
+
+def call_providers(providers, method, user, concurrent=False, timeout=None):
+    """
+    Call the same method on several providers.
+
+    Every provider goes through its circuit breaker, a provider that keeps
+    failing or timing out is skipped until the breaker lets a trial call
+    through. The last good value of a provider that failed or was skipped
+    is used instead when INTERCOM_STALE_TIMEOUT is set.
+    Args:
+        providers: list of (path, provider) tuples
+        method: the provider method to call
+        user: The Django user
+        concurrent: run the providers in the shared thread pool
+        timeout: total seconds to wait for the providers when concurrent,
+            providers that miss it are dropped
+
+    Returns:
+        (results, complete) where results holds the values of the providers
+        that succeeded, or their last good values, in the same order, and
+        complete is False if any provider failed, was dropped or skipped
+    """
+    start = time.time()
+    instrument = instrumentation.is_enabled()
+    calls = _allowed(providers, method)
+    if concurrent:
+        futures = {}
+        for index, path, provider, breaker in calls:
+            try:
+                futures[index] = _submit(path, provider, method, user,
+                                         instrument)
+            except PoolBusy as e:
+                futures[index] = e
+
+    results = {}
+    for index, path, provider, breaker in calls:
+        try:
+            if concurrent:
+                if isinstance(futures[index], PoolBusy):
+                    raise futures[index]
+                result, event = _result(path, futures[index], _deadline(
+                    start, timeout, provider_timeout(provider)))
+            elif provider_timeout(provider) is None:
+                result, event = timed_call_provider(path, provider, method,
+                                                    user, instrument)
+            else:
+                # run in the pool so the page can stop waiting for it
+                result, event = _result(
+                    path, _submit(path, provider, method, user, instrument),
+                    time.time() + provider_timeout(provider))
+        except Exception as e:
+            _failed(breaker, path, method, e)
+            continue
+        # recorded here, the collect() block is local to this thread
+        instrumentation.record(event)
+        breaker.success()
+        results[index] = result
+
+    results = _with_last_good(providers, method, user, results)
+    log.debug("%s providers ran in %.4fs", method, time.time() - start)
+    return results
+
+
+async def _acall_provider(path, provider, method, user, deadline):
+    """ acall_provider that gives up at the deadline. """
+    func = getattr(provider, method)
+    if deadline is None:
+        return await acall_provider(provider, method, user)
+    if asyncio.iscoroutinefunction(func):
+        return await asyncio.wait_for(func(user), _remaining(deadline))
+    # not through sync_to_async, a sync provider that hangs would hold on to
+    # the thread it shares with the database calls of the request
+    future = _submit(path, provider, method, user, False)
+    try:
+        result, event = await asyncio.wait_for(
+            asyncio.wrap_future(future), _remaining(deadline))
+    except asyncio.TimeoutError:
+        if get_pool().abandon(path, future):
+            raise PoolBusy()
+        raise
+    except asyncio.CancelledError:
+        get_pool().abandon(path, future)
+        raise
+    return result
+
+
+async def acall_providers(providers, method, user, timeout=None):
+    """
+    Async version of call_providers, the providers are awaited concurrently
+    and go through the same circuit breakers, timeouts and last good values.
+    Args:
+        providers: list of (path, provider) tuples
+        method: the provider method to call
+        user: The Django user
+        timeout: total seconds to wait for the providers
+
+    Returns:
+        (results, complete) like call_providers
+    """
+    from asgiref.sync import sync_to_async
+
+    start = time.time()
+    calls = _allowed(providers, method)
+    outcomes = await asyncio.gather(
+        *[_acall_provider(path, provider, method, user, _deadline(
+            start, timeout, provider_timeout(provider)))
+          for index, path, provider, breaker in calls],
+        return_exceptions=True)
+    results = {}
+    for (index, path, provider, breaker), outcome in zip(calls, outcomes):
+        if not isinstance(outcome, BaseException):
+            breaker.success()
+            results[index] = outcome
+        elif isinstance(outcome, Exception):
+            _failed(breaker, path, method, outcome)
+        else:
+            # cancelled, the request is going away
+            raise outcome
+    if not stale_enabled():
+        return _with_last_good(providers, method, user, results)
+    # the last good values are in the cache
+    return await sync_to_async(_with_last_good)(providers, method, user,
+                                                results)
+
+
+class ProviderRegistry(object):
+    """ Keeps a single instance of every data provider class, so the
+        import and instantiation only happen once per process instead of on
+        every render of the intercom_tag.
+
+        Providers that can't be imported, or that don't have the expected
+        method, are logged once and then remembered as missing.
+    """
+
+    def __init__(self):
+        self._providers = {}
+
+    def load(self, strict=None):
+        """ (Re)build the registry from the current django settings.
+
+            If strict is True (defaults to INTERCOM_STRICT_PROVIDERS) a bad
+            provider path raises ImproperlyConfigured instead of logging a
+            warning.
+        """
+        if strict is None:
+            strict = getattr(settings, 'INTERCOM_STRICT_PROVIDERS', False)
+        self._providers = {}
+        for path, method in configured_providers():
+            self._providers[(path, method)] = self._resolve(path, method,
+                                                            strict)
+
+    def clear(self):
+        self._providers = {}
+
+    def get(self, path, method):
+        """
+        Get the provider instance for a class path.
+        Args:
+            path: dotted path to the provider class
+            method: name of the method the provider has to implement
+
+        Returns:
+            the provider instance, or None if it isn't usable
+        """
+        try:
+            return self._providers[(path, method)]
+        except KeyError:
+            provider = self._resolve(path, method)
+            self._providers[(path, method)] = provider
+            return provider
+
+    def _resolve(self, path, method, strict=False):
+        try:
+            provider = my_import(path)
+        except (ImportError, AttributeError, ValueError) as e:
+            if strict:
+                raise ImproperlyConfigured(
+                    "%s couldn't be imported: %s" % (path, e))
+            log.warning(
+                "%s couldn't be imported, there was an error during import. "
+                "skipping. %s", path, e)
+            return None
+        if not callable(getattr(provider, method, None)):
+            if strict:
+                raise ImproperlyConfigured(
+                    "%s doesn't have a %s method" % (path, method))
+            log.warning("%s doesn't have a %s method, skipping.",
+                        path, method)
+            return None
+        return provider
+
+
+registry = ProviderRegistry()
+
+
+def reload_providers(setting, **kwargs):
+    """ setting_changed receiver, rebuilds the registry when one of the
+        intercom settings is overridden. """
+    if setting.startswith('INTERCOM_'):
+        registry.load(strict=False)
+        reset_breakers()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import logging
+import random
+import threading
+import time
+
+from django_intercom.cache import get_cache
+from django_intercom.settings import (INTERCOM_API_ENDPOINT_LIMITS,
+                                      INTERCOM_API_RATE_LIMIT,
+                                      INTERCOM_API_RATE_MAX_WAIT,
+                                      INTERCOM_API_RATE_PERIOD)
+
+log = logging.getLogger(__name__)
+
+COUNT_KEY = 'intercom:ratelimit:{bucket}:{window}'
+BLOCKED_KEY = 'intercom:ratelimit:blocked'
+# the budget of the whole app, every request takes from it
+APP_BUCKET = 'app'
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def endpoint(path):
+    """ The budget a path takes from, its first segment: /users/1 is
+        users. """
+    return path.strip('/').split('/', 1)[0].split('?', 1)[0]
+
+
+class RateLimiter(object):
+    """ Rate limit shared by every process that uses the same cache. The
+        requests of each period are counted with an atomic cache incr, and
+        the requests of the last period seconds are estimated from the
+        current counter plus the previous one, weighted by how much of the
+        previous period is still inside them. This sliding window doesn't
+        let a burst through at the start of a period: a request that
+        doesn't fit waits until the previous period has slid out enough for
+        it, so the requests go out at a steady rate.
+
+        The counters need a cache with an atomic incr, like redis, memcached
+        or locmem (which is only shared by the threads of one process).
+    """
+
+    def __init__(self, limit, period=10, endpoint_limits=None, max_wait=30,
+                 cache=None):
+        self.limit = limit
+        self.period = period
+        self.endpoint_limits = endpoint_limits or {}
+        self.max_wait = max_wait
+        self._cache = cache
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return self._cache or get_cache()
+
+    def _take(self, bucket, limit, now):
+        """ Count a request in a bucket if it fits in the sliding window.
+            Returns (wait, key): the seconds until it should fit and None if
+            it doesn't, or 0 and the counter to release it from. """
+        window, offset = divmod(now, self.period)
+        window = int(window)
+        key = COUNT_KEY.format(bucket=bucket, window=window)
+        previous = self.cache.get(
+            COUNT_KEY.format(bucket=bucket, window=window - 1)) or 0
+        # the counter is read as the previous one during the next period,
+        # and clocks drift
+        self.cache.add(key, 0, self.period * 3)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # expired between add and incr
+            self.cache.add(key, 1, self.period * 3)
+            count = 1
+        if previous * (1 - offset / self.period) + count <= limit:
+            return 0, key
+        self._release([key])
+        return self._until_fits(previous, count - 1, limit, offset), None
+
+    def _until_fits(self, previous, current, limit, offset):
+        """ Seconds until one more request fits, if nobody else takes from
+            the bucket meanwhile. """
+        if current < limit:
+            # enough of the previous period has to slide out
+            slid = 1 - (limit - current - 1) / previous
+            return slid * self.period - offset
+        # the current period becomes the previous one
+        slid = 1 - (limit - 1) / max(current, 1)
+        return (1 + slid) * self.period - offset
+
+    def _release(self, keys):
+        """ Give back the requests counted by _take, for a request that
+            didn't fit in another bucket. """
+        for key in keys:
+            try:
+                self.cache.decr(key)
+            except ValueError:
+                # its period is over
+                pass
+
+    def _blocked_for(self, now):
+        until = self.cache.get(BLOCKED_KEY)
+        return max(0, until - now) if until else 0
+
+    def acquire(self, path):
+        """
+        Wait until the request to a path fits in the app budget and the
+        budget of its endpoint.
+        Args:
+            path: the API path
+
+        Returns:
+            True, or False if it didn't fit within max_wait seconds
+        """
+        buckets = [APP_BUCKET]
+        name = endpoint(path)
+        if name in self.endpoint_limits:
+            buckets.insert(0, name)
+        start = time.time()
+        waited = 0
+        taken = []
+        for bucket in buckets:
+            limit = (self.limit if bucket == APP_BUCKET
+                     else self.endpoint_limits[bucket])
+            while True:
+                now = time.time()
+                wait = (self._blocked_for(now) if bucket == APP_BUCKET
+                        else 0)
+                if not wait:
+                    wait, key = self._take(bucket, limit, now)
+                if not wait:
+                    taken.append(key)
+                    break
+                if now + wait - start > self.max_wait:
+                    # the request isn't made, the endpoint budget it took
+                    # is available to the others again
+                    self._release(taken)
+                    self._record(name, now - start, acquired=False)
+                    return False
+                # the workers waiting for the same budget wake up spread
+                # over the time one request takes from it
+                time.sleep(wait + random.uniform(0, self.period / limit))
+                waited = time.time() - start
+        self._record(name, waited)
+        return True
+
+    def block(self, path, seconds):
+        """ Stop every process from calling the API for a while, after a 429
+            or when the remaining budget reported by intercom is 0. """
+        until = time.time() + seconds
+        self.cache.set(BLOCKED_KEY, until,
+                       int(seconds) + 1)
+        with self._stats_lock:
+            self._bucket_stats(endpoint(path))['throttled'] += 1
+
+    def _bucket_stats(self, name):
+        return self._stats.setdefault(name, {
+            'requests': 0, 'waited': 0, 'wait_time': 0.0, 'max_wait': 0.0,
+            'rejected': 0, 'throttled': 0})
+
+    def _record(self, name, wait, acquired=True):
+        with self._stats_lock:
+            stats = self._bucket_stats(name)
+            if not acquired:
+                stats['rejected'] += 1
+                return
+            stats['requests'] += 1
+            if wait:
+                stats['waited'] += 1
+                stats['wait_time'] += wait
+                stats['max_wait'] = max(stats['max_wait'], wait)
+
+    def stats(self):
+        """ Queueing statistics of this process per endpoint: the number of
+            requests, how many of them waited for the budget and how long,
+            the requests rejected after max_wait and the 429 responses. """
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def get_rate_limiter():
+    """ The rate limiter of the process, or None if INTERCOM_API_RATE_LIMIT
+        isn't set. """
+    global _limiter
+    if INTERCOM_API_RATE_LIMIT is None:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    INTERCOM_API_RATE_LIMIT, INTERCOM_API_RATE_PERIOD,
+                    INTERCOM_API_ENDPOINT_LIMITS, INTERCOM_API_RATE_MAX_WAIT)
+    return _limiter
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import json
+
+from django.template.defaultfilters import date
+from django.utils.formats import localize
+from django.utils.html import conditional_escape
+from django.utils.timezone import template_localtime
+
+# The intercom/intercom_tag.html template split into the constant parts
+# around its variables, so it can be built without the template engine.
+# Any change to the template has to be made here and in the Jinja2 version
+# (jinja2/intercom/intercom_tag.html) as well, the tests compare the output
+# of all of them.
+SKIP = '\n    <!-- Skipping intercom for this request -->\n\n'
+HEAD = "\n    <script>\n    var APP_ID = '"
+SETTINGS = "';\n    var intercomSettings = {\n        'app_id': APP_ID,\n\n        "
+EMAIL = "\n        'email': '"
+EMAIL_END = "',\n        "
+USER_ID = "'user_id': '"
+NAME = "\n        'name': '"
+NAME_END = "',\n        "
+USER_HASH = "'user_hash': '"
+VALUE_END = "',"
+CUSTOM_DATA = "\n        'custom_data': "
+COMPANY = ",\n        'company': "
+CREATED_AT = ",\n        'created_at': "
+USER_END = "\n        "
+ANONYMOUS_ID = "\n        'anonymous_id': '"
+ANONYMOUS_ID_END = "'\n        "
+LOADER = (
+    '(function(){var w=window;var ic=w.Intercom;if(typeof ic==="functio'
+    'n"){ic(\'reattach_activator\');ic(\'update\',intercomSettings);}else{v'
+    'ar d=document;var i=function(){i.c(arguments)};i.q=[];i.c=function'
+    '(args){i.q.push(args)};w.Intercom=i;function l(){var s=d.createEle'
+    "ment('script');s.type='text/javascript';s.async=true;s.src='https:"
+    "//widget.intercom.io/widget/' + APP_ID;var x=d.getElementsByTagNam"
+    "e('script')[0];x.parentNode.insertBefore(s,x);}"
+)
+TAIL = "\n    };\n    " + LOADER
+# the widget_loader, see django_intercom.loading
+SCRIPT_END = "}})();\n    </script>\n\n"
+
+
+def _escape(value):
+    """ Same as a {{ value }} variable in the template. """
+    return conditional_escape(str(localize(template_localtime(value))))
+
+
+def render(context):
+    """
+    Render the intercom snippet without the template engine.
+    Args:
+        context: the dictionary returned by intercom_tag
+
+    Returns:
+        the same string as rendering intercom/intercom_tag.html
+    """
+    if not context.get('INTERCOM_IS_VALID'):
+        return SKIP
+    parts = [HEAD, _escape(context.get('intercom_appid')), SETTINGS]
+    if not context.get('anonymous'):
+        parts.append(EMAIL)
+        parts.append(_escape(context.get('email_address')))
+        parts.append(EMAIL_END)
+        if context.get('user_id'):
+            parts.append(USER_ID)
+            parts.append(_escape(context['user_id']))
+            parts.append(VALUE_END)
+        parts.append(NAME)
+        parts.append(_escape(context.get('name')))
+        parts.append(NAME_END)
+        if context.get('user_hash'):
+            parts.append(USER_HASH)
+            parts.append(_escape(context['user_hash']))
+            parts.append(VALUE_END)
+        parts.append(CUSTOM_DATA)
+        parts.append(str(context.get('custom_data')))
+        parts.append(COMPANY)
+        parts.append(str(context.get('company_data')))
+        parts.append(CREATED_AT)
+        parts.append(_escape(date(context.get('user_created'), 'U')))
+        parts.append(USER_END)
+    elif context.get('anonymous_id'):
+        parts.append(ANONYMOUS_ID)
+        parts.append(_escape(context['anonymous_id']))
+        parts.append(ANONYMOUS_ID_END)
+    parts.append(TAIL)
+    parts.append(str(context.get('widget_loader', '')))
+    parts.append(SCRIPT_END)
+    return ''.join(parts)
+
+
+def intercom_settings(context):
+    """
+    Build the intercomSettings object of the snippet as a dictionary.
+    Args:
+        context: the dictionary returned by intercom_tag
+
+    Returns:
+        the intercomSettings, or an empty dictionary if the snippet would be
+        skipped
+    """
+    if not context.get('INTERCOM_IS_VALID'):
+        return {}
+    data = {'app_id': context.get('intercom_appid')}
+    if not context.get('anonymous'):
+        data['email'] = context.get('email_address')
+        if context.get('user_id'):
+            data['user_id'] = str(context['user_id'])
+        data['name'] = context.get('name')
+        if context.get('user_hash'):
+            data['user_hash'] = context['user_hash']
+        data['custom_data'] = json.loads(context.get('custom_data'))
+        data['company'] = json.loads(context.get('company_data'))
+        created_at = date(context.get('user_created'), 'U')
+        data['created_at'] = int(created_at) if created_at else None
+    elif context.get('anonymous_id'):
+        data['anonymous_id'] = context['anonymous_id']
+    return data
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import random
+import re
+import zlib
+
+from django.conf import settings
+
+from django_intercom.settings import INTERCOM_ANONYMOUS_COOKIE_NAME
+
+# user agents of the common crawlers, for INTERCOM_EXCLUDE_USER_AGENTS
+BOT_USER_AGENTS = ('bot', 'crawl', 'spider', 'slurp', 'facebookexternalhit',
+                   'headlesschrome', 'lighthouse', 'pingdom', 'uptime')
+
+_matcher = None
+
+
+def _path_regex(rules):
+    """ Combine path prefixes (strings) and regexes (compiled patterns) into
+        one regex, or None if there are no rules. """
+    patterns = []
+    for rule in rules:
+        if hasattr(rule, 'pattern'):
+            flags = '(?i:%s)' if rule.flags & re.IGNORECASE else '(?:%s)'
+            patterns.append(flags % rule.pattern)
+        else:
+            patterns.append('(?:^%s)' % re.escape(rule))
+    if not patterns:
+        return None
+    return re.compile('|'.join(patterns))
+
+
+class RequestMatcher(object):
+    """ Decides whether a request gets the intercom snippet. It only looks at
+        the path, the resolved url name, the user agent and the cookies, not
+        at the user, so excluded requests don't load it.
+    """
+
+    def __init__(self, include_paths=(), exclude_paths=(), exclude_url_names=(),
+                 exclude_user_agents=(), sample_rate=100):
+        self.include_paths = _path_regex(include_paths)
+        self.exclude_paths = _path_regex(exclude_paths)
+        self.exclude_url_names = frozenset(exclude_url_names)
+        self.exclude_user_agents = (
+            re.compile('|'.join(re.escape(agent)
+                                for agent in exclude_user_agents),
+                       re.IGNORECASE)
+            if exclude_user_agents else None)
+        self.sample_rate = sample_rate
+
+    def included(self, request):
+        """ True if the snippet should be rendered for the request. """
+        return self.page_included(request) and self.visitor_included(request)
+
+    def page_included(self, request):
+        """ True if the path and url name rules let the page have the
+            snippet. """
+        path = request.path_info
+        if (self.include_paths is not None and
+                not self.include_paths.match(path)):
+            return False
+        if self.exclude_paths is not None and self.exclude_paths.match(path):
+            return False
+        if self.exclude_url_names:
+            match = getattr(request, 'resolver_match', None)
+            if match is not None and (
+                    match.view_name in self.exclude_url_names or
+                    match.url_name in self.exclude_url_names):
+                return False
+        return True
+
+    def visitor_included(self, request):
+        """ True if the user agent and sample rate rules let the visitor
+            have the snippet. """
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        if (self.exclude_user_agents is not None and
+                self.exclude_user_agents.search(user_agent)):
+            return False
+        if self.sample_rate < 100:
+            return self._sample(request) < self.sample_rate
+        return True
+
+    def _sample(self, request):
+        # the same visitor is always in or out of the sample
+        cookie = (request.COOKIES.get(settings.SESSION_COOKIE_NAME) or
+                  request.COOKIES.get(INTERCOM_ANONYMOUS_COOKIE_NAME))
+        if cookie:
+            return zlib.crc32(cookie.encode('utf8')) % 100
+        return random.random() * 100
+
+
+def get_matcher():
+    """ The RequestMatcher of the INTERCOM_*_PATHS, INTERCOM_EXCLUDE_*
+        and INTERCOM_SAMPLE_RATE settings, compiled once. """
+    global _matcher
+    if _matcher is None:
+        _matcher = RequestMatcher(
+            getattr(settings, 'INTERCOM_INCLUDE_PATHS', ()),
+            getattr(settings, 'INTERCOM_EXCLUDE_PATHS', ()),
+            getattr(settings, 'INTERCOM_EXCLUDE_URL_NAMES', ()),
+            getattr(settings, 'INTERCOM_EXCLUDE_USER_AGENTS', ()),
+            getattr(settings, 'INTERCOM_SAMPLE_RATE', 100))
+    return _matcher
+
+
+def is_excluded(request):
+    """ True if the rules leave the snippet out of the request, the answer is
+        kept on the request. """
+    excluded = getattr(request, '_intercom_excluded', None)
+    if excluded is None:
+        excluded = not get_matcher().included(request)
+        request._intercom_excluded = excluded
+    return excluded
+
+
+def is_page_excluded(request):
+    """ True if the path and url name rules leave the snippet out of the
+        page. The bootstrap script is the same for every visitor, so it only
+        checks these. """
+    return not get_matcher().page_included(request)
+
+
+def is_visitor_excluded(request):
+    """ True if the user agent and sample rate rules leave the snippet out
+        for the visitor, for the intercom_settings view. The page rules were
+        checked when the page rendered the bootstrap script, the view's own
+        url doesn't match them. The answer is kept on the request. """
+    excluded = not get_matcher().visitor_included(request)
+    request._intercom_excluded = excluded
+    return excluded
+
+
+def reload_rules(setting, **kwargs):
+    """ setting_changed receiver, compiles the rules again when one of the
+        intercom settings is overridden. """
+    global _matcher
+    if setting.startswith('INTERCOM_'):
+        _matcher = None
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from django_intercom.settings import INTERCOM_JSON_SERIALIZER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the payloads are written into a <script> with |safe, so anything that
+# could close the tag or start a comment is escaped, like json_script does.
+# U+2028 and U+2029 are line terminators in older javascript engines.
+SCRIPT_ESCAPES = {
+    ord('<'): '\\u003C',
+    ord('>'): '\\u003E',
+    ord('&'): '\\u0026',
+    0x2028: '\\u2028',
+    0x2029: '\\u2029',
+}
+
+_serializer = None
+
+
+def django_dumps(data):
+    """ Serialize with the DjangoJSONEncoder, which handles datetimes,
+        Decimals, UUIDs and lazy translation strings. """
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'),
+                      ensure_ascii=False)
+
+
+def _orjson_default(value):
+    return DjangoJSONEncoder().default(value)
+
+
+def orjson_dumps(data):
+    """ Serialize with orjson, the types it doesn't know (and datetimes, so
+        they are formatted like django_dumps does) go to the
+        DjangoJSONEncoder. """
+    return orjson.dumps(data, default=_orjson_default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME |
+                        orjson.OPT_NON_STR_KEYS).decode('utf8')
+
+
+def get_serializer():
+    """ The serializer set in INTERCOM_JSON_SERIALIZER, or orjson_dumps if
+        orjson is installed, or django_dumps. """
+    global _serializer
+    if _serializer is None:
+        if INTERCOM_JSON_SERIALIZER:
+            _serializer = import_string(INTERCOM_JSON_SERIALIZER)
+        elif orjson is not None:
+            _serializer = orjson_dumps
+        else:
+            _serializer = django_dumps
+    return _serializer
+
+
+def escape_script(value):
+    """ Escape a JSON string so it can be written inside a <script>. """
+    return value.translate(SCRIPT_ESCAPES)
+
+
+def dumps(data):
+    """
+    Serialize custom or company data for the intercom snippet.
+    Args:
+        data: the dictionary to serialize
+
+    Returns:
+        JSON that is safe to write inside a <script> tag
+    """
+    return escape_script(get_serializer()(data))
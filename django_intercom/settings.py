@@ -11,3 +11,44 @@ INTERCOM_COMPANY_DATA_CLASS = getattr(settings, 'INTERCOM_COMPANY_DATA_CLASS', N
 INTERCOM_DISABLED = getattr(settings, 'INTERCOM_DISABLED', False)
 INTERCOM_INCLUDE_USERID = getattr(settings, 'INTERCOM_INCLUDE_USERID', True)
 INTERCOM_UNAUTHENTICATED_USER_EMAIL = getattr(settings, 'INTERCOM_UNAUTHENTICATED_USER_EMAIL', 'lead@example.com')
+INTERCOM_CACHE_ALIAS = getattr(settings, 'INTERCOM_CACHE_ALIAS', 'default')
+INTERCOM_DATA_CACHE_TIMEOUT = getattr(settings, 'INTERCOM_DATA_CACHE_TIMEOUT', None)
+INTERCOM_CUSTOM_DATA_CONCURRENT = getattr(settings, 'INTERCOM_CUSTOM_DATA_CONCURRENT', False)
+INTERCOM_CUSTOM_DATA_TIMEOUT = getattr(settings, 'INTERCOM_CUSTOM_DATA_TIMEOUT', None)
+INTERCOM_PROVIDER_THREADS = getattr(settings, 'INTERCOM_PROVIDER_THREADS', 4)
+INTERCOM_FAST_RENDERER = getattr(settings, 'INTERCOM_FAST_RENDERER', False)
+INTERCOM_SECURE_KEY_FALLBACKS = getattr(settings, 'INTERCOM_SECURE_KEY_FALLBACKS', [])
+INTERCOM_USER_HASH_CACHE_SIZE = getattr(settings, 'INTERCOM_USER_HASH_CACHE_SIZE', 1024)
+INTERCOM_SNIPPET_SCAN_BYTES = getattr(settings, 'INTERCOM_SNIPPET_SCAN_BYTES', 2048)
+INTERCOM_TAG_MODE = getattr(settings, 'INTERCOM_TAG_MODE', 'inline')
+INTERCOM_SETTINGS_MAX_AGE = getattr(settings, 'INTERCOM_SETTINGS_MAX_AGE', 0)
+INTERCOM_ACCESS_TOKEN = getattr(settings, 'INTERCOM_ACCESS_TOKEN', None)
+INTERCOM_API_BASE_URL = getattr(settings, 'INTERCOM_API_BASE_URL', 'https://api.intercom.io')
+INTERCOM_API_TIMEOUT = getattr(settings, 'INTERCOM_API_TIMEOUT', 10)
+INTERCOM_EVENTS_BATCH_SIZE = getattr(settings, 'INTERCOM_EVENTS_BATCH_SIZE', 100)
+INTERCOM_EVENTS_FLUSH_INTERVAL = getattr(settings, 'INTERCOM_EVENTS_FLUSH_INTERVAL', 5)
+INTERCOM_EVENTS_MAX_RETRIES = getattr(settings, 'INTERCOM_EVENTS_MAX_RETRIES', 3)
+INTERCOM_EVENTS_MAX_BUFFER = getattr(settings, 'INTERCOM_EVENTS_MAX_BUFFER', 10000)
+INTERCOM_ANONYMOUS_ID = getattr(settings, 'INTERCOM_ANONYMOUS_ID', 'session')
+INTERCOM_ANONYMOUS_COOKIE_NAME = getattr(settings, 'INTERCOM_ANONYMOUS_COOKIE_NAME', 'intercom_visitor')
+INTERCOM_ANONYMOUS_COOKIE_AGE = getattr(settings, 'INTERCOM_ANONYMOUS_COOKIE_AGE', 60 * 60 * 24 * 365)
+INTERCOM_JSON_SERIALIZER = getattr(settings, 'INTERCOM_JSON_SERIALIZER', None)
+INTERCOM_DELTA_PAYLOADS = getattr(settings, 'INTERCOM_DELTA_PAYLOADS', False)
+INTERCOM_DELTA_RESEND_INTERVAL = getattr(settings, 'INTERCOM_DELTA_RESEND_INTERVAL', 60 * 60 * 24)
+INTERCOM_SNIPPET_CACHE_TIMEOUT = getattr(settings, 'INTERCOM_SNIPPET_CACHE_TIMEOUT', None)
+INTERCOM_WEBHOOK_SECRET = getattr(settings, 'INTERCOM_WEBHOOK_SECRET', None)
+INTERCOM_WEBHOOK_BATCH_SIZE = getattr(settings, 'INTERCOM_WEBHOOK_BATCH_SIZE', 500)
+INTERCOM_WEBHOOK_MAX_PENDING = getattr(settings, 'INTERCOM_WEBHOOK_MAX_PENDING', 5000)
+INTERCOM_WEBHOOK_SAVE_TIMEOUT = getattr(settings, 'INTERCOM_WEBHOOK_SAVE_TIMEOUT', 10)
+INTERCOM_WEBHOOK_MAX_ATTEMPTS = getattr(settings, 'INTERCOM_WEBHOOK_MAX_ATTEMPTS', 5)
+INTERCOM_API_RATE_LIMIT = getattr(settings, 'INTERCOM_API_RATE_LIMIT', None)
+INTERCOM_API_RATE_PERIOD = getattr(settings, 'INTERCOM_API_RATE_PERIOD', 10)
+INTERCOM_API_ENDPOINT_LIMITS = getattr(settings, 'INTERCOM_API_ENDPOINT_LIMITS', {})
+INTERCOM_API_RATE_MAX_WAIT = getattr(settings, 'INTERCOM_API_RATE_MAX_WAIT', 30)
+INTERCOM_LOADING = getattr(settings, 'INTERCOM_LOADING', 'onload')
+INTERCOM_LOADING_DELAY = getattr(settings, 'INTERCOM_LOADING_DELAY', 3000)
+INTERCOM_PROVIDER_TIMEOUT = getattr(settings, 'INTERCOM_PROVIDER_TIMEOUT', None)
+INTERCOM_BREAKER_THRESHOLD = getattr(settings, 'INTERCOM_BREAKER_THRESHOLD', 5)
+INTERCOM_BREAKER_RESET_TIMEOUT = getattr(settings, 'INTERCOM_BREAKER_RESET_TIMEOUT', 30)
+INTERCOM_STALE_TIMEOUT = getattr(settings, 'INTERCOM_STALE_TIMEOUT', None)
+INTERCOM_COMPANY_CACHE_TIMEOUT = getattr(settings, 'INTERCOM_COMPANY_CACHE_TIMEOUT', 60 * 60)
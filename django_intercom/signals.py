@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+from django.dispatch import Signal
+
+# sent with event=ProviderTiming for every timed provider call, cache hit and
+# intercom_tag render, see django_intercom.instrumentation
+provider_timed = Signal()
+# sent with topic, data (the "data" of the notification) and event (the
+# WebhookEvent) by the intercom_drain_webhooks command, see
+# django_intercom.webhooks
+webhook_received = Signal()
@@ -2,13 +2,27 @@
 from __future__ import (print_function, division, absolute_import,
                         unicode_literals)
 
+import asyncio
 import datetime
 import logging
-import hashlib
-import hmac
-import json
-from django.template import Library
+from django.template import Library, TemplateSyntaxError
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
 
+from django_intercom import cache, instrumentation, renderer, serializers
+from django_intercom.delta import apply_delta
+from django_intercom.loading import STRATEGIES, loader
+from django_intercom.rules import is_excluded, is_page_excluded
+from django_intercom.anonymous import get_anonymous_id
+from django_intercom.hashing import hash_value
+from django_intercom.hashing import user_hash as get_user_hash
+from django_intercom.providers import (my_import, registry,  # noqa: F401
+                                       acall_provider, acall_providers,
+                                       call_providers, declares_related,
+                                       load_related,
+                                       record_call_provider, related_lookups,
+                                       with_related)
 from django_intercom.settings import (INTERCOM_APPID, INTERCOM_ENABLE_INBOX,
                                       INTERCOM_INBOX_CSS_SELECTOR,
                                       INTERCOM_DISABLED,
@@ -18,21 +32,135 @@ from django_intercom.settings import (INTERCOM_APPID, INTERCOM_ENABLE_INBOX,
                                       INTERCOM_CUSTOM_DATA_CLASSES,
                                       INTERCOM_COMPANY_DATA_CLASS,
                                       INTERCOM_SECURE_KEY,
-                                      INTERCOM_UNAUTHENTICATED_USER_EMAIL)
+                                      INTERCOM_UNAUTHENTICATED_USER_EMAIL,
+                                      INTERCOM_CUSTOM_DATA_CONCURRENT,
+                                      INTERCOM_CUSTOM_DATA_TIMEOUT,
+                                      INTERCOM_FAST_RENDERER,
+                                      INTERCOM_TAG_MODE,
+                                      INTERCOM_ANONYMOUS_ID,
+                                      INTERCOM_DELTA_PAYLOADS,
+                                      INTERCOM_SNIPPET_CACHE_TIMEOUT)
 
 register = Library()
 log = logging.getLogger(__name__)
 
 
-def my_import(name):
-    """ dynamic importing """
-    module, attr = name.rsplit('.', 1)
-    mod = __import__(module, fromlist=[attr])
-    klass = getattr(mod, attr)
-    return klass()
+@register.simple_tag(takes_context=True, name='intercom_tag')
+def render_intercom_tag(context, mode=None, cache_timeout=None, loading=None,
+                        delay=None):
+    """ {% intercom_tag %}, renders the snippet with the context built by
+        intercom_tag.
+
+        With {% intercom_tag mode="bootstrap" %} (or INTERCOM_TAG_MODE) it
+        renders a script that is the same for every user and loads the user
+        data from the intercom_settings view instead.
+
+        With {% intercom_tag cache_timeout=300 %} (or
+        INTERCOM_SNIPPET_CACHE_TIMEOUT) the snippet of authenticated users is
+        cached, cache_timeout=0 turns it off.
+
+        With {% intercom_tag loading="idle" %} (or INTERCOM_LOADING) the
+        widget is loaded with another strategy of django_intercom.loading,
+        delay is in milliseconds for the idle and delay strategies.
+    """
+    return render_tag(context, mode, cache_timeout, render_snippet, loading,
+                      delay)
+
+
+def render_tag(context, mode, cache_timeout, render, loading=None,
+               delay=None):
+    """
+    Render the intercom snippet for a template engine.
+    Args:
+        context: the template context, it needs the request
+        mode: 'inline', 'bootstrap' or None for INTERCOM_TAG_MODE
+        cache_timeout: seconds to cache the snippet, 0 to turn it off or
+            None for INTERCOM_SNIPPET_CACHE_TIMEOUT
+        render: callable that renders the snippet from the dictionary
+            returned by intercom_tag
+        loading: one of django_intercom.loading.STRATEGIES, or None for
+            INTERCOM_LOADING
+        delay: milliseconds for the idle and delay strategies, or None for
+            INTERCOM_LOADING_DELAY
+
+    Returns:
+        the snippet
+    """
+    mode = mode or INTERCOM_TAG_MODE
+    if mode not in ('inline', 'bootstrap'):
+        raise TemplateSyntaxError(
+            "intercom_tag mode must be 'inline' or 'bootstrap', not %r" % mode)
+    if loading is not None and loading not in STRATEGIES:
+        raise TemplateSyntaxError(
+            "intercom_tag loading must be one of %s, not %r"
+            % (', '.join(STRATEGIES), loading))
+    if delay is not None:
+        try:
+            delay = int(delay)
+        except (TypeError, ValueError):
+            raise TemplateSyntaxError(
+                "intercom_tag delay must be a number of milliseconds, not %r"
+                % delay)
+    if 'request' in context:
+        # tells the IntercomSnippetMiddleware the page already has it
+        context['request']._intercom_rendered = True
+        # the bootstrap script can be cached for every visitor of the page,
+        # the intercom_settings view checks the visitor rules
+        excluded = is_page_excluded if mode == 'bootstrap' else is_excluded
+        if excluded(context['request']):
+            return mark_safe(renderer.SKIP)
+    if mode == 'bootstrap':
+        return render_bootstrap(loading, delay)
+    widget_loader = (loader(loading, delay)
+                     if loading is not None or delay is not None else None)
+    if instrumentation.is_enabled():
+        snippet, event = instrumentation.timed(
+            'intercom_tag', 'render', _render_inline, context, cache_timeout,
+            render, widget_loader)
+        instrumentation.record(event)
+        return snippet
+    return _render_inline(context, cache_timeout, render, widget_loader)
+
+
+def _render_inline(context, cache_timeout, render, widget_loader):
+    def build():
+        tag_context = intercom_tag(context)
+        if widget_loader is not None and tag_context.get('INTERCOM_IS_VALID'):
+            tag_context['widget_loader'] = widget_loader
+        return tag_context
+
+    if cache_timeout is None:
+        cache_timeout = INTERCOM_SNIPPET_CACHE_TIMEOUT
+    request = context.get('request')
+    if (cache_timeout and INTERCOM_APPID and INTERCOM_DISABLED is not True and
+            request is not None and _is_authenticated(request)):
+        # the whole snippet is cached, so it isn't reduced to a delta
+        return mark_safe(cache.get_or_render_snippet(
+            request.user, _data_providers(), cache_timeout,
+            lambda: render(build()), variant=widget_loader or ''))
+    return render(_delta(context, build()))
+
+
+def render_snippet(context):
+    """ Render the intercom/intercom_tag.html template, or build the same
+        output without the template engine if INTERCOM_FAST_RENDERER is on.
+    """
+    if INTERCOM_FAST_RENDERER:
+        return mark_safe(renderer.render(context))
+    return mark_safe(render_to_string('intercom/intercom_tag.html', context))
+
+
+def render_bootstrap(loading=None, delay=None):
+    """ Render the intercom/intercom_bootstrap.html template, it doesn't
+        depend on the request. """
+    if INTERCOM_DISABLED is True or not INTERCOM_APPID:
+        return mark_safe(renderer.SKIP)
+    return mark_safe(render_to_string(
+        'intercom/intercom_bootstrap.html',
+        {'settings_url': reverse('intercom_settings'),
+         'widget_loader': loader(loading, delay, bootstrap=True)}))
 
 
-@register.inclusion_tag('intercom/intercom_tag.html', takes_context=True)
 def intercom_tag(context):
     """ This tag will check to see if they have the INTERCOM_APPID setup
         correctly in the django settings and also check if the user is logged
@@ -54,7 +182,114 @@ def intercom_tag(context):
     if 'request' not in context:
         return {"INTERCOM_IS_VALID": False}
 
-    default_user = {
+    # the INTERCOM_EXCLUDE_* rules don't need the user
+    if is_excluded(context['request']):
+        return {"INTERCOM_IS_VALID": False}
+
+    default_user = _default_context()
+    request = context['request']
+
+    # make sure INTERCOM_APPID is setup correct and user is authenticated
+    if INTERCOM_APPID and request.user and request.user.is_authenticated:
+        # one query for the relations every data class declared, instead of
+        # one per relation when the data classes use them
+        providers = _data_providers()
+        related_user = with_related(request.user, providers)
+        ud_class = (registry.get(INTERCOM_USER_DATA_CLASS, 'user_data')
+                    if INTERCOM_USER_DATA_CLASS else None)
+        ud_user = (related_user if declares_related(ud_class)
+                   else request.user)
+        default_user.update(_user_context(request.user,
+                                          get_user_data(ud_user),
+                                          get_custom_data(related_user),
+                                          get_company_data(related_user)))
+    else:
+        default_user.update(_anonymous_context(request))
+    # if it is here, it isn't a valid setup, return False to not show the tag.
+    return default_user
+
+
+async def aintercom_tag(context):
+    """ Async version of intercom_tag for ASGI deployments, it returns the
+        same dictionary but awaits the user, custom and company data providers
+        concurrently. Providers can define async methods, the sync ones are
+        run in a thread.
+    """
+    from asgiref.sync import sync_to_async
+
+    if INTERCOM_DISABLED is True:
+        return {"INTERCOM_IS_VALID": False}
+
+    if 'request' not in context or is_excluded(context['request']):
+        return {"INTERCOM_IS_VALID": False}
+
+    default_user = _default_context()
+    request = context['request']
+
+    # request.user is lazy and may hit the session store and the database
+    authenticated = INTERCOM_APPID and await sync_to_async(
+        _is_authenticated)(request)
+    if authenticated:
+        # loaded up front, a lazy query can't run in the event loop
+        user = request.user
+        select, prefetch = related_lookups(_data_providers())
+        if select or prefetch:
+            user = await sync_to_async(load_related)(user, select, prefetch)
+        user_data, custom_data, company_data = await asyncio.gather(
+            aget_user_data(user),
+            aget_custom_data(user),
+            aget_company_data(user))
+        default_user.update(_user_context(request.user, user_data,
+                                          custom_data, company_data))
+    else:
+        default_user.update(_anonymous_context(request))
+    return default_user
+
+
+async def arender_intercom_tag(context):
+    """ Render the intercom_tag template with the context built by
+        aintercom_tag. The result can be passed to a template as a variable.
+    """
+    from asgiref.sync import sync_to_async
+
+    tag_context = await aintercom_tag(context)
+    if INTERCOM_DELTA_PAYLOADS:
+        # the fingerprints are in the cache
+        tag_context = await sync_to_async(_delta)(context, tag_context)
+    return render_snippet(tag_context)
+
+
+def _delta(context, tag_context):
+    """ Only keep the changed custom and company data of an authenticated
+        user if INTERCOM_DELTA_PAYLOADS is on. """
+    if INTERCOM_DELTA_PAYLOADS and tag_context.get('anonymous') is False:
+        return apply_delta(tag_context, context['request'].user.pk)
+    return tag_context
+
+
+def _data_providers():
+    """ The instances of the configured user, custom and company data
+        classes. """
+    providers = []
+    if INTERCOM_USER_DATA_CLASS:
+        providers.append(registry.get(INTERCOM_USER_DATA_CLASS, 'user_data'))
+    for custom_data_class in INTERCOM_CUSTOM_DATA_CLASSES or ():
+        providers.append(registry.get(custom_data_class, 'custom_data'))
+    if INTERCOM_COMPANY_DATA_CLASS:
+        providers.append(registry.get(INTERCOM_COMPANY_DATA_CLASS,
+                                      'company_data'))
+    return [provider for provider in providers if provider is not None]
+
+
+def _is_authenticated(request):
+    return bool(request.user and request.user.is_authenticated)
+
+
+def _default_context():
+    if INTERCOM_APPID is None:
+        log.warning("INTERCOM_APPID isn't setup correctly in your settings")
+
+    return {
         "INTERCOM_IS_VALID": True,
         "anonymous": None,
         "intercom_appid": INTERCOM_APPID,
@@ -68,75 +303,89 @@ def intercom_tag(context):
         "custom_data": '{}',
         "company_data": '{}',
         "user_hash": None,
+        "widget_loader": loader(),
     }
 
-    request = context['request']
 
-    if INTERCOM_APPID is None:
-        log.warning("INTERCOM_APPID isn't setup correctly in your settings")
+def _user_context(user, user_data, custom_data, company_data):
+    if INTERCOM_INCLUDE_USERID:
+        user_id = user_data.get('user_id', user.id)
+    else:
+        user_id = None
+    email = user_data.get('email', user.email)
+    user_created = user_data.get('user_created', user.date_joined)
+    try:
+        name = user_data.get('name', user.username)
+    except:
+        name = user_data.get('name', user.get_username())
+    user_hash = None
+    use_counter = 'true' if INTERCOM_ENABLE_INBOX_COUNTER else 'false'
 
-    # make sure INTERCOM_APPID is setup correct and user is authenticated
-    if INTERCOM_APPID and request.user and request.user.is_authenticated:
-        user_data = {}
-        if INTERCOM_USER_DATA_CLASS:
-            try:
-                ud_class = my_import(INTERCOM_USER_DATA_CLASS)
-                # make sure the class has a user_data method
-                if ud_class and hasattr(ud_class, 'user_data'):
-                    user_data = ud_class.user_data(request.user)
-            except ImportError as e:
-                log.warning(
-                    "%s couldn't be imported, there was an error during"
-                    " import. skipping. %s", INTERCOM_USER_DATA_CLASS, e)
-
-        if INTERCOM_INCLUDE_USERID:
-            user_id = user_data.get('user_id', request.user.id)
-        else:
-            user_id = None
-        email = user_data.get('email', request.user.email)
-        user_created = user_data.get('user_created', request.user.date_joined)
-        try:
-            name = user_data.get('name', request.user.username)
-        except:
-            name = user_data.get('name', request.user.get_username())
-        user_hash = None
-        use_counter = 'true' if INTERCOM_ENABLE_INBOX_COUNTER else 'false'
-        custom_data = get_custom_data(request.user)
-        company_data = get_company_data(request.user)
-
-        # this is optional, if they don't have the setting set, it won't use.
-        if INTERCOM_SECURE_KEY is not None:
-            hmac_value = str(user_id) if user_id else email
-            user_hash = hmac.new(INTERCOM_SECURE_KEY.encode('utf8'),
-                                 hmac_value.encode('utf8'),
-                                 digestmod=hashlib.sha256).hexdigest()
-
-        default_user.update({"INTERCOM_IS_VALID": True,
-                             "anonymous": False,
-                             "intercom_appid": INTERCOM_APPID,
-                             "email_address": email,
-                             "user_id": user_id,
-                             "user_created": user_created,
-                             "name": name,
-                             "enable_inbox": INTERCOM_ENABLE_INBOX,
-                             "use_counter": use_counter,
-                             "css_selector": INTERCOM_INBOX_CSS_SELECTOR,
-                             "custom_data": custom_data,
-                             "company_data": company_data,
-                             "user_hash": user_hash})
+    # this is optional, if they don't have the setting set, it won't use.
+    if INTERCOM_SECURE_KEY is not None:
+        user_hash = get_user_hash(
+            hash_value(user, user_data, INTERCOM_INCLUDE_USERID),
+            INTERCOM_SECURE_KEY)
 
+    return {"INTERCOM_IS_VALID": True,
+            "anonymous": False,
+            "intercom_appid": INTERCOM_APPID,
+            "email_address": email,
+            "user_id": user_id,
+            "user_created": user_created,
+            "name": name,
+            "enable_inbox": INTERCOM_ENABLE_INBOX,
+            "use_counter": use_counter,
+            "css_selector": INTERCOM_INBOX_CSS_SELECTOR,
+            "custom_data": custom_data,
+            "company_data": company_data,
+            "user_hash": user_hash}
+
+
+def _anonymous_context(request):
+    # unauthenticated
+    if INTERCOM_ANONYMOUS_ID == 'cookie':
+        # doesn't create a session for visitors that don't have one
+        user_id = anonymous_id = get_anonymous_id(request)
     else:
-        # unauthenticated
-        default_user.update(
-            {"INTERCOM_IS_VALID": True,
-             "anonymous": True,
-             "intercom_appid": INTERCOM_APPID,
-             "user_id": request.session.session_key,
-             "email_address": INTERCOM_UNAUTHENTICATED_USER_EMAIL,
-             "name": 'Unknown'}
-        )
-    # if it is here, it isn't a valid setup, return False to not show the tag.
-    return default_user
+        # the session key must never reach the page, it isn't sent
+        user_id = request.session.session_key
+        anonymous_id = None
+    return {"INTERCOM_IS_VALID": True,
+            "anonymous": True,
+            "intercom_appid": INTERCOM_APPID,
+            "user_id": user_id,
+            "anonymous_id": anonymous_id,
+            "email_address": INTERCOM_UNAUTHENTICATED_USER_EMAIL,
+            "name": 'Unknown'}
+
+
+def get_user_data(user):
+    """
+    Get the user data overrides from the user data class
+    Args:
+        user: The Django user
+
+    Returns:
+        user_data(dict): the user data loaded from the class if exists,
+        otherwise it is empty
+    """
+    if INTERCOM_USER_DATA_CLASS:
+        # the registry only returns classes with a user_data method
+        ud_class = registry.get(INTERCOM_USER_DATA_CLASS, 'user_data')
+        if ud_class is not None:
+            return record_call_provider(INTERCOM_USER_DATA_CLASS, ud_class,
+                                        'user_data', user)
+    return {}
+
+
+async def aget_user_data(user):
+    """ Async version of get_user_data """
+    if INTERCOM_USER_DATA_CLASS:
+        ud_class = registry.get(INTERCOM_USER_DATA_CLASS, 'user_data')
+        if ud_class is not None:
+            return await acall_provider(ud_class, 'user_data', user)
+    return {}
 
 
 def get_custom_data(user):
@@ -149,25 +398,61 @@ def get_custom_data(user):
         custom_data(json): the custom data loaded from the class if exists,
         otherwise it is empty
     """
+    if INTERCOM_CUSTOM_DATA_CLASSES is None:
+        return '{}'
+    return cache.get_or_build('custom_data', user,
+                              INTERCOM_CUSTOM_DATA_CLASSES,
+                              _build_custom_data)
+
+
+def _build_custom_data(user):
+    # the registry only returns classes with a custom_data method
+    providers = [(custom_data_class,
+                  registry.get(custom_data_class, 'custom_data'))
+                 for custom_data_class in INTERCOM_CUSTOM_DATA_CLASSES]
+    providers = [(path, cd_class) for path, cd_class in providers
+                 if cd_class is not None]
+    results, complete = call_providers(
+        providers, 'custom_data', user,
+        concurrent=INTERCOM_CUSTOM_DATA_CONCURRENT,
+        timeout=INTERCOM_CUSTOM_DATA_TIMEOUT)
+
+    # merge in the configured order, the last class wins on the same key
     custom_data = {}
+    for data in results:
+        custom_data.update(data)
+    custom_data, serialized = _dumps(custom_data, 'custom_data')
+    return custom_data, complete and serialized
+
+
+async def aget_custom_data(user):
+    """ Async version of get_custom_data, all of the custom data classes are
+        awaited concurrently and merged in the order they are configured. """
+    from asgiref.sync import sync_to_async
+
     if INTERCOM_CUSTOM_DATA_CLASSES is None:
-        return json.dumps(custom_data)
-    for custom_data_class in INTERCOM_CUSTOM_DATA_CLASSES:
-        try:
-            cd_class = my_import(custom_data_class)
-            # check make sure the class has a custom_data method.
-            if cd_class and hasattr(cd_class, 'custom_data'):
-                # call custom_data method and update the custom_data dict
-                custom_data.update(cd_class.custom_data(user))
-            else:
-                log.warning("%s doesn't have a custom_data qmethod, skipping.",
-                            custom_data_class)
-        except ImportError as e:
-            log.warning(
-                "%s couldn't be imported, there was an error during import. "
-                "skipping. %s", custom_data_class, e)
-        finally:
-            return json.dumps(custom_data)
+        return '{}'
+    cached = await sync_to_async(cache.get_cached)(
+        'custom_data', user, INTERCOM_CUSTOM_DATA_CLASSES)
+    if cached is not None:
+        return cached
+
+    providers = [(custom_data_class,
+                  registry.get(custom_data_class, 'custom_data'))
+                 for custom_data_class in INTERCOM_CUSTOM_DATA_CLASSES]
+    results, complete = await acall_providers(
+        [(path, cd_class) for path, cd_class in providers
+         if cd_class is not None], 'custom_data', user,
+        timeout=INTERCOM_CUSTOM_DATA_TIMEOUT)
+    custom_data = {}
+    for data in results:
+        custom_data.update(data)
+    custom_data, serialized = _dumps(custom_data, 'custom_data')
+
+    if complete and serialized:
+        await sync_to_async(cache.set_cached)(
+            'custom_data', user, INTERCOM_CUSTOM_DATA_CLASSES, custom_data)
+    return custom_data
 
 
 def get_company_data(user):
@@ -180,28 +465,80 @@ def get_company_data(user):
         company_data(json): the company data loaded from the class if exists,
         otherwise it is empty
     """
+    if INTERCOM_COMPANY_DATA_CLASS is None:
+        return '{}'
+    cd_class = registry.get(INTERCOM_COMPANY_DATA_CLASS, 'company_data')
+    if hasattr(cd_class, 'company_key'):
+        # built once per company and shared by its members
+        return cache.get_or_build_company(cd_class,
+                                          INTERCOM_COMPANY_DATA_CLASS, user,
+                                          _build_company_data)
+    return cache.get_or_build('company_data', user,
+                              [INTERCOM_COMPANY_DATA_CLASS],
+                              _build_company_data)
+
+
+def _build_company_data(user):
     company_data = {}
+    # the registry only returns classes with a company_data method
+    cd_class = registry.get(INTERCOM_COMPANY_DATA_CLASS, 'company_data')
+    if cd_class is not None:
+        results, complete = call_providers(
+            [(INTERCOM_COMPANY_DATA_CLASS, cd_class)], 'company_data', user)
+        if not results:
+            return '{}', False
+        company_data = _validate_company_data(results[0])
+        company_data, serialized = _dumps(company_data, 'company_data')
+        return company_data, complete and serialized
+    return _dumps(company_data, 'company_data')
+
+
+async def aget_company_data(user):
+    """ Async version of get_company_data """
+    from asgiref.sync import sync_to_async
+
     if INTERCOM_COMPANY_DATA_CLASS is None:
-        return json.dumps(company_data)
+        return '{}'
+    cd_class = registry.get(INTERCOM_COMPANY_DATA_CLASS, 'company_data')
+    if hasattr(cd_class, 'company_key'):
+        return await sync_to_async(cache.get_or_build_company)(
+            cd_class, INTERCOM_COMPANY_DATA_CLASS, user, _build_company_data)
+    cached = await sync_to_async(cache.get_cached)(
+        'company_data', user, [INTERCOM_COMPANY_DATA_CLASS])
+    if cached is not None:
+        return cached
+
+    company_data = {}
+    if cd_class is not None:
+        results, complete = await acall_providers(
+            [(INTERCOM_COMPANY_DATA_CLASS, cd_class)], 'company_data', user)
+        if not results:
+            return '{}'
+        company_data = _validate_company_data(results[0])
+    company_data, serialized = _dumps(company_data, 'company_data')
+
+    if serialized:
+        await sync_to_async(cache.set_cached)(
+            'company_data', user, [INTERCOM_COMPANY_DATA_CLASS], company_data)
+    return company_data
+
+
+def _dumps(data, method):
+    """ Serialize the data of a provider method for the snippet, returns
+        (json, serialized). Data that can't be serialized is logged and
+        replaced by an empty object. """
     try:
-        cd_class = my_import(INTERCOM_COMPANY_DATA_CLASS)
-        # make sure the class has a company_data method
-        if cd_class and hasattr(cd_class, 'company_data'):
-            data = cd_class.company_data(user)
-            if all(k in data for k in ('id', 'name', 'created_at')):
-                company_data.update(data)
-            else:
-                log.warning(
-                    "company method of %s doesn't return all of the required "
-                    "dictionary keys (id, name, created_at), skipping.",
-                    INTERCOM_COMPANY_DATA_CLASS)
-        else:
-            log.warning("%s doesn't have a company_data method, skipping.",
-                        INTERCOM_COMPANY_DATA_CLASS)
-    except ImportError as e:
-        log.warning(
-            "%s couldn't be imported, there was an error during import. "
-            "skipping. %s", INTERCOM_COMPANY_DATA_CLASS, e)
-
-    finally:
-        return json.dumps(company_data)
+        return serializers.dumps(data), True
+    except (TypeError, ValueError):
+        log.exception("%s couldn't be serialized to JSON, skipping.", method)
+        return '{}', False
+
+
+def _validate_company_data(data):
+    if all(k in data for k in ('id', 'name', 'created_at')):
+        return data
+    log.warning(
+        "company method of %s doesn't return all of the required "
+        "dictionary keys (id, name, created_at), skipping.",
+        INTERCOM_COMPANY_DATA_CLASS)
+    return {}
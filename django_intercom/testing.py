@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+from django_intercom import instrumentation
+from django_intercom.providers import call_provider, my_import
+
+PROVIDER_METHODS = ('user_data', 'custom_data', 'company_data')
+
+
+class IntercomTestMixin(object):
+    """ TestCase mixin with assertions for the intercom data providers. """
+
+    def assertProviderMaxQueries(self, max_queries, path, user, method=None):
+        """
+        Fail if the provider runs more than max_queries database queries.
+        Args:
+            max_queries: the maximum number of queries allowed
+            path: dotted path to the provider class
+            user: The Django user passed to the provider
+            method: the provider method, by default the first one of
+                user_data, custom_data and company_data it has
+
+        Returns:
+            the ProviderTiming of the call
+        """
+        provider = my_import(path)
+        if method is None:
+            methods = [name for name in PROVIDER_METHODS
+                       if hasattr(provider, name)]
+            if not methods:
+                self.fail("%s isn't a data provider" % path)
+            method = methods[0]
+        result, event = instrumentation.timed(path, method, call_provider,
+                                              provider, method, user)
+        if event.queries > max_queries:
+            self.fail("%s.%s ran %s queries, expected at most %s" % (
+                path, method, event.queries, max_queries))
+        return event
@@ -1 +1,8 @@
-# no urls needed
\ No newline at end of file
+from django.urls import path
+
+from django_intercom import views
+
+urlpatterns = [
+    path('settings.json', views.intercom_settings, name='intercom_settings'),
+    path('webhook', views.intercom_webhook, name='intercom_webhook'),
+]
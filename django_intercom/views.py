@@ -1 +1,71 @@
-# no views needed
\ No newline at end of file
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseForbidden)
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from django_intercom import renderer, webhooks
+from django_intercom.rules import is_visitor_excluded
+from django_intercom.settings import INTERCOM_SETTINGS_MAX_AGE
+from django_intercom.templatetags.intercom import intercom_tag
+
+log = logging.getLogger(__name__)
+
+
+@require_GET
+def intercom_settings(request):
+    """ The intercomSettings of the current user as JSON, for pages that use
+        {% intercom_tag mode="bootstrap" %}. The response is private to the
+        user and can be revalidated with its ETag.
+    """
+    # only the visitor rules, the page rules don't apply to this url
+    is_visitor_excluded(request)
+    data = renderer.intercom_settings(intercom_tag({'request': request}))
+    content = json.dumps(data, sort_keys=True).encode('utf8')
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True,
+                        max_age=INTERCOM_SETTINGS_MAX_AGE)
+    patch_vary_headers(response, ['Cookie'])
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@csrf_exempt
+@require_POST
+@transaction.non_atomic_requests
+def intercom_webhook(request):
+    """ Receives the intercom webhook notifications. The signature is checked
+        and the notification is saved, with the ones of concurrent
+        deliveries, before the delivery is answered. They are processed by
+        the intercom_drain_webhooks command. A notification that can't be
+        saved gets a 503, intercom delivers it again later.
+    """
+    if not webhooks.verify_signature(request.body,
+                                     request.META.get('HTTP_X_HUB_SIGNATURE')):
+        log.warning("Intercom webhook with an invalid signature.")
+        return HttpResponseForbidden()
+    try:
+        notification = json.loads(request.body.decode('utf8'))
+        notification_id = notification['id']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest()
+    if not notification_id:
+        return HttpResponseBadRequest()
+    # intercom sends a ping when the webhook is set up
+    if notification.get('topic') != 'ping':
+        if not webhooks.receive(notification):
+            return HttpResponse(status=503)
+    return HttpResponse(status=200)
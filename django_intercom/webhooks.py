@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from __future__ import (print_function, division, absolute_import,
+                        unicode_literals)
+
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import traceback
+from collections import deque
+
+from django.db import transaction
+from django.utils import timezone
+
+from django_intercom.settings import (INTERCOM_WEBHOOK_BATCH_SIZE,
+                                      INTERCOM_WEBHOOK_MAX_PENDING,
+                                      INTERCOM_WEBHOOK_SAVE_TIMEOUT,
+                                      INTERCOM_WEBHOOK_SECRET)
+from django_intercom.signals import webhook_received
+
+log = logging.getLogger(__name__)
+
+_committer = None
+_committer_lock = threading.Lock()
+
+
+def signature(body, secret=None):
+    """ The X-Hub-Signature header intercom sends with a body. """
+    secret = secret or INTERCOM_WEBHOOK_SECRET
+    return 'sha1=' + hmac.new(secret.encode('utf8'), body,
+                              hashlib.sha1).hexdigest()
+
+
+def verify_signature(body, header, secret=None):
+    """
+    Check the X-Hub-Signature header of a webhook request in constant time.
+    Args:
+        body: the raw request body
+        header: the X-Hub-Signature header, or None
+        secret: defaults to INTERCOM_WEBHOOK_SECRET
+
+    Returns:
+        True if the body was signed with the secret
+    """
+    secret = secret or INTERCOM_WEBHOOK_SECRET
+    if not secret or not header:
+        return False
+    return hmac.compare_digest(signature(body, secret).encode('utf8'),
+                               header.encode('utf8'))
+
+
+def save_events(items):
+    """ Insert a batch of (received_at, notification) with one bulk_create,
+        the notifications that are already saved are skipped. """
+    from django_intercom.models import WebhookEvent
+
+    events = {}
+    for received_at, notification in items:
+        # intercom retries deliveries, the first copy saved is kept, in this
+        # batch like in the database
+        events.setdefault(notification['id'], WebhookEvent(
+            notification_id=notification['id'],
+            topic=notification.get('topic', ''),
+            payload=json.dumps(notification),
+            received_at=received_at))
+    WebhookEvent.objects.bulk_create(list(events.values()),
+                                     ignore_conflicts=True)
+
+
+class _Delivery(object):
+    __slots__ = ('item', 'done', 'saved', 'lead')
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        # None until its batch was saved or failed
+        self.saved = None
+        # handed the saving of what is waiting
+        self.lead = False
+
+
+class GroupCommit(object):
+    """ Saves the notifications of concurrent deliveries together, every
+        notification is committed before its delivery is answered.
+
+        The first delivery that finds nobody saving saves what is waiting,
+        batch_size at a time, until its own notification is saved. It then
+        hands the saving over to the first delivery still waiting, so no
+        delivery saves for longer than the batches ahead of it. A delivery
+        is refused when max_pending are already waiting, or when its batch
+        isn't saved within timeout seconds, so intercom delivers it again.
+    """
+
+    def __init__(self, save_batch, batch_size=500, max_pending=5000,
+                 timeout=10):
+        self.save_batch = save_batch
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._saving = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def save(self, item):
+        """ Returns True once the item is saved, False if it wasn't. """
+        delivery = _Delivery(item)
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                log.warning("%s webhook notifications are waiting to be "
+                            "saved, refusing the delivery.",
+                            len(self._pending))
+                return False
+            self._pending.append(delivery)
+            delivery.lead, self._saving = not self._saving, True
+        if not delivery.lead and not delivery.done.wait(self.timeout):
+            with self._lock:
+                if not delivery.lead:
+                    if delivery.saved is None:
+                        log.warning("The webhook notification wasn't saved "
+                                    "within %ss, refusing the delivery.",
+                                    self.timeout)
+                    try:
+                        self._pending.remove(delivery)
+                    except ValueError:
+                        # its batch is being saved
+                        pass
+                    return bool(delivery.saved)
+        if delivery.lead:
+            self._save_pending(delivery)
+        return delivery.saved
+
+    def _save_pending(self, own):
+        """ Save batches until the own delivery is saved, then hand over
+            to the next delivery. """
+        while own.saved is None:
+            with self._lock:
+                count = min(self.batch_size, len(self._pending))
+                batch = [self._pending.popleft() for i in range(count)]
+            try:
+                self.save_batch([delivery.item for delivery in batch])
+                saved = True
+            except Exception:
+                log.exception("Couldn't save %s webhook notifications.",
+                              len(batch))
+                saved = False
+            for delivery in batch:
+                delivery.saved = saved
+                delivery.done.set()
+        with self._lock:
+            if self._pending:
+                following = self._pending[0]
+                following.lead = True
+                following.done.set()
+            else:
+                self._saving = False
+
+
+def get_committer():
+    """ The webhook GroupCommit of this process, created on first use. """
+    global _committer
+    if _committer is None:
+        with _committer_lock:
+            if _committer is None:
+                _committer = GroupCommit(
+                    save_events,
+                    batch_size=INTERCOM_WEBHOOK_BATCH_SIZE,
+                    max_pending=INTERCOM_WEBHOOK_MAX_PENDING,
+                    timeout=INTERCOM_WEBHOOK_SAVE_TIMEOUT)
+    return _committer
+
+
+def receive(notification):
+    """ Save a notification, with the ones of concurrent deliveries.
+        Returns False if it couldn't be saved. """
+    return get_committer().save((timezone.now(), notification))
+
+
+def process(events):
+    """
+    Send webhook_received for saved WebhookEvents, in order. A receiver that
+    raises only rolls back the changes made for its notification, the
+    attempt and the error are recorded on the event.
+
+    Returns:
+        (processed, failed) lists of events
+    """
+    processed, failed = [], []
+    for event in events:
+        try:
+            with transaction.atomic():
+                payload = json.loads(event.payload)
+                webhook_received.send(sender=event.__class__,
+                                      topic=event.topic,
+                                      data=payload.get('data', {}),
+                                      event=event)
+        except Exception:
+            log.exception("Webhook notification %s couldn't be processed.",
+                          event.notification_id)
+            event.attempts += 1
+            event.error = traceback.format_exc()
+            failed.append(event)
+        else:
+            processed.append(event)
+    return processed, failed
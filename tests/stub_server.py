@@ -0,0 +1,53 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubIntercomServer(object):
+    """ Local stand in for the intercom API, it records every request and
+        answers with the queued responses, or 200 {}. """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length).decode('utf8'))
+                with stub.lock:
+                    stub.requests.append((self.command, self.path, body,
+                                          dict(self.headers)))
+                    status, headers, content = (stub.responses.pop(0)
+                                                if stub.responses else
+                                                (200, {}, {}))
+                content = json.dumps(content).encode('utf8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:%s' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
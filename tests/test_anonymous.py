@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from django_intercom.anonymous import get_anonymous_id
+from django_intercom.middleware import IntercomAnonymousIdMiddleware
+from django_intercom.templatetags.intercom import (intercom_tag,
+                                                   render_intercom_tag)
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+COOKIE_NAME = 'intercom_visitor'
+
+
+class TestAnonymousId(TestCase):
+    def get_response(self, request):
+        get_anonymous_id(request)
+        return HttpResponse()
+
+    def request(self, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        request.user = AnonymousUser()
+        return request
+
+    def test_new_visitor_gets_cookie(self):
+        """
+        Test a new id is set as a signed cookie
+        """
+        request = self.request()
+        response = IntercomAnonymousIdMiddleware(self.get_response)(request)
+        cookie = response.cookies[COOKIE_NAME]
+        self.assertTrue(cookie['httponly'])
+
+        request = self.request({COOKIE_NAME: cookie.value})
+        response = IntercomAnonymousIdMiddleware(self.get_response)(request)
+        self.assertEqual(get_anonymous_id(request),
+                         self.request_id(cookie.value))
+        self.assertNotIn(COOKIE_NAME, response.cookies)
+
+    def request_id(self, value):
+        return get_anonymous_id(self.request({COOKIE_NAME: value}))
+
+    def test_same_id_during_a_request(self):
+        request = self.request()
+        self.assertEqual(get_anonymous_id(request), get_anonymous_id(request))
+
+    def test_tampered_cookie_is_replaced(self):
+        request = self.request({COOKIE_NAME: 'abc:forged'})
+        self.assertNotEqual(get_anonymous_id(request), 'abc')
+
+    def test_intercom_tag_without_session(self):
+        """
+        Test the tag uses the cookie id and doesn't need a session
+        """
+        request = self.request()
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_ANONYMOUS_ID'), 'cookie'):
+            tag_dict = intercom_tag({'request': request})
+        self.assertTrue(tag_dict['anonymous'])
+        self.assertEqual(tag_dict['user_id'], get_anonymous_id(request))
+        self.assertEqual(len(tag_dict['user_id']), 32)
+
+    def test_rendered_snippet_has_cookie_id(self):
+        """
+        Test the cookie id is sent to intercom as a lead attribute
+        """
+        request = self.request()
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_ANONYMOUS_ID'), 'cookie'):
+            snippet = render_intercom_tag({'request': request})
+        self.assertIn("'anonymous_id': '%s'" % get_anonymous_id(request),
+                      snippet)
+        self.assertNotIn("'user_id'", snippet)
+
+    def test_session_key_isnt_rendered(self):
+        request = self.request()
+        request.session = SessionStore()
+        request.session.save()
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'):
+            snippet = render_intercom_tag({'request': request})
+        self.assertNotIn(request.session.session_key, snippet)
+        self.assertNotIn("'anonymous_id'", snippet)
@@ -0,0 +1,120 @@
+import asyncio
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase
+
+from django_intercom.cache import get_cached
+from django_intercom.templatetags.intercom import (aget_company_data,
+                                                   aget_custom_data,
+                                                   aintercom_tag,
+                                                   get_custom_data,
+                                                   intercom_tag)
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+CACHE_PATCH = 'django_intercom.cache.{}'
+
+
+class AsyncCustomDataDummy:
+    async def custom_data(self, user):
+        await asyncio.sleep(0)
+        return {'async': True, 'shared': 'async'}
+
+
+class SyncCustomDataDummy:
+    def custom_data(self, user):
+        return {'sync': True, 'shared': 'sync'}
+
+
+class AsyncErrorDummy:
+    async def custom_data(self, user):
+        raise ValueError('provider error')
+
+    async def company_data(self, user):
+        raise ValueError('provider error')
+
+
+class AsyncCompanyDataDummy:
+    async def company_data(self, user):
+        return {'id': 1, 'name': 'intercom_test', 'created_at': 0}
+
+
+class TestAsyncIntercomTag(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('test_user')
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.session.save()
+
+    def test_aget_custom_data_merges_in_order(self):
+        """
+        Test async and sync custom data classes are merged in order
+        """
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_async.AsyncCustomDataDummy',
+                    'tests.test_async.SyncCustomDataDummy']):
+            returned_json = asyncio.run(aget_custom_data(self.user))
+        self.assertJSONEqual(returned_json, {'async': True, 'sync': True,
+                                             'shared': 'sync'})
+
+    def test_aget_custom_data_skips_failed_class(self):
+        """
+        Test a failing class is logged and skipped, and the incomplete
+        payload isn't cached
+        """
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_async.AsyncErrorDummy',
+                    'tests.test_async.SyncCustomDataDummy']), \
+                patch(CACHE_PATCH.format('INTERCOM_DATA_CACHE_TIMEOUT'),
+                      300), \
+                self.assertLogs('django_intercom', 'ERROR'):
+            returned_json = asyncio.run(aget_custom_data(self.user))
+            self.assertIsNone(get_cached(
+                'custom_data', self.user,
+                ['tests.test_async.AsyncErrorDummy',
+                 'tests.test_async.SyncCustomDataDummy']))
+        self.assertJSONEqual(returned_json, {'sync': True, 'shared': 'sync'})
+
+    def test_aget_company_data_skips_failed_class(self):
+        with patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                   'tests.test_async.AsyncErrorDummy'), \
+                self.assertLogs('django_intercom', 'ERROR'):
+            self.assertEqual(asyncio.run(aget_company_data(self.user)), '{}')
+
+    def test_get_custom_data_with_async_class(self):
+        """
+        Test the sync tag can call an async custom data class
+        """
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_async.AsyncCustomDataDummy']):
+            returned_json = get_custom_data(self.user)
+        self.assertJSONEqual(returned_json, {'async': True,
+                                             'shared': 'async'})
+
+    def test_aintercom_tag_matches_intercom_tag(self):
+        """
+        Test the async context builder returns the same context as the tag
+        """
+        self.request.user = self.user
+        context = {'request': self.request}
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                      'tests.test_async.AsyncCompanyDataDummy'):
+            expected = intercom_tag(context)
+            tag_dict = asyncio.run(aintercom_tag(context))
+        del expected['user_created'], tag_dict['user_created']
+        self.assertDictEqual(tag_dict, expected)
+        self.assertJSONEqual(tag_dict['company_data'],
+                             {'id': 1, 'name': 'intercom_test',
+                              'created_at': 0})
+
+    def test_aintercom_tag_unauthenticated_user(self):
+        """
+        Test the async context builder with an anonymous user
+        """
+        self.request.user = AnonymousUser()
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'):
+            tag_dict = asyncio.run(aintercom_tag({'request': self.request}))
+        self.assertTrue(tag_dict['anonymous'])
+        self.assertEqual(tag_dict['user_id'], self.request.session.session_key)
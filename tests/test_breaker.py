@@ -0,0 +1,351 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from django_intercom.breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                                     breaker_status, get_breaker,
+                                     reset_breakers)
+from django_intercom.providers import (ProviderPool, acall_providers,
+                                       call_providers)
+
+BREAKER_PATCH = 'django_intercom.breaker.{}'
+PROVIDERS_PATCH = 'django_intercom.providers.{}'
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class FlakyDummy:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+        self.fail = False
+
+    def custom_data(self, user):
+        self.calls += 1
+        if self.fail:
+            raise ValueError('provider error')
+        return self.data
+
+
+class SlowDummy:
+    timeout = 0.05
+
+    def custom_data(self, user):
+        time.sleep(0.5)
+        return {'slow': True}
+
+
+class HungDummy:
+    timeout = 0.05
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def custom_data(self, user):
+        self.release.wait(5)
+        return {'hung': True}
+
+
+class SleepDummy:
+    def custom_data(self, user):
+        time.sleep(0.02)
+        return {'sleep': True}
+
+
+class FastDummy:
+    timeout = 0.5
+
+    def custom_data(self, user):
+        return {'fast': True}
+
+
+class AsyncSlowDummy:
+    timeout = 0.05
+
+    async def custom_data(self, user):
+        await asyncio.sleep(0.5)
+        return {'slow': True}
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch(BREAKER_PATCH.format('time'), self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_threshold(self):
+        """
+        Test the breaker opens after threshold consecutive failures only
+        """
+        breaker = CircuitBreaker('dummy', threshold=3, reset_timeout=30)
+        breaker.failure()
+        breaker.failure(timeout=True)
+        breaker.success()
+        breaker.failure()
+        breaker.failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.failure(timeout=True)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        status = breaker.status()
+        self.assertEqual(status['failures'], 3)
+        self.assertEqual(status['timeouts'], 2)
+        self.assertEqual(status['skipped'], 1)
+        self.assertEqual(status['opened'], 1)
+
+    def test_trial_call_after_reset_timeout(self):
+        """
+        Test a single trial call goes through once reset_timeout is over
+        """
+        breaker = CircuitBreaker('dummy', threshold=1, reset_timeout=30)
+        breaker.failure()
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_unfinished_trial(self):
+        """
+        Test a trial call that never reports back lets another one through
+        after reset_timeout
+        """
+        breaker = CircuitBreaker('dummy', threshold=1, reset_timeout=30)
+        breaker.failure()
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        self.clock.now += 29
+        self.assertFalse(breaker.allow())
+        self.clock.now += 1
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.success()
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class TestCallProvidersBreaker(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        patcher = patch(PROVIDERS_PATCH.format('_pool'), ProviderPool(4))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('test_user')
+        self.provider = FlakyDummy({'plan': 'pro'})
+        self.providers = [('tests.FlakyDummy', self.provider)]
+
+    def test_open_breaker_skips_provider(self):
+        """
+        Test a provider is no longer called once its breaker is open
+        """
+        self.provider.fail = True
+        with patch(BREAKER_PATCH.format('INTERCOM_BREAKER_THRESHOLD'), 2):
+            for i in range(4):
+                results, complete = call_providers(
+                    self.providers, 'custom_data', self.user)
+                self.assertEqual(results, [])
+                self.assertFalse(complete)
+        self.assertEqual(self.provider.calls, 2)
+        status = breaker_status()['tests.FlakyDummy.custom_data']
+        self.assertEqual(status['state'], OPEN)
+        self.assertEqual(status['failures'], 2)
+        self.assertEqual(status['skipped'], 2)
+
+    def test_serves_last_good_value(self):
+        """
+        Test the last good value is served, as incomplete, while the
+        provider fails or is skipped
+        """
+        with patch(BREAKER_PATCH.format('INTERCOM_STALE_TIMEOUT'), 3600), \
+                patch(BREAKER_PATCH.format('INTERCOM_BREAKER_THRESHOLD'), 1):
+            results, complete = call_providers(
+                self.providers, 'custom_data', self.user)
+            self.assertEqual(results, [{'plan': 'pro'}])
+            self.assertTrue(complete)
+
+            self.provider.fail = True
+            for i in range(2):
+                results, complete = call_providers(
+                    self.providers, 'custom_data', self.user)
+                self.assertEqual(results, [{'plan': 'pro'}])
+                self.assertFalse(complete)
+        self.assertEqual(self.provider.calls, 2)
+        status = get_breaker('tests.FlakyDummy', 'custom_data').status()
+        self.assertEqual(status['stale'], 2)
+
+    def test_last_good_value_written_when_changed(self):
+        """
+        Test an unchanged last good value isn't written again on every call
+        """
+        clock = FakeClock()
+        with patch(BREAKER_PATCH.format('INTERCOM_STALE_TIMEOUT'), 3600), \
+                patch(BREAKER_PATCH.format('time'), clock), \
+                patch.object(cache, 'set_many',
+                             wraps=cache.set_many) as set_many:
+            call_providers(self.providers, 'custom_data', self.user)
+            call_providers(self.providers, 'custom_data', self.user)
+            self.assertEqual(set_many.call_count, 1)
+            self.provider.data = {'plan': 'team'}
+            call_providers(self.providers, 'custom_data', self.user)
+            self.assertEqual(set_many.call_count, 2)
+            # refreshed before it expires
+            clock.now += 1800
+            call_providers(self.providers, 'custom_data', self.user)
+            self.assertEqual(set_many.call_count, 3)
+
+    def test_no_last_good_value_by_default(self):
+        call_providers(self.providers, 'custom_data', self.user)
+        self.provider.fail = True
+        results, complete = call_providers(
+            self.providers, 'custom_data', self.user)
+        self.assertEqual(results, [])
+
+    def test_provider_timeout(self):
+        """
+        Test the page stops waiting for a provider after its timeout, even
+        when the providers run one after another
+        """
+        providers = [('tests.SlowDummy', SlowDummy())] + self.providers
+        start = time.time()
+        results, complete = call_providers(providers, 'custom_data',
+                                           self.user)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(results, [{'plan': 'pro'}])
+        self.assertFalse(complete)
+        status = get_breaker('tests.SlowDummy', 'custom_data').status()
+        self.assertEqual(status['timeouts'], 1)
+
+    def test_provider_timeout_concurrent(self):
+        providers = [('tests.SlowDummy', SlowDummy())] + self.providers
+        start = time.time()
+        results, complete = call_providers(providers, 'custom_data',
+                                           self.user, concurrent=True,
+                                           timeout=5)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(results, [{'plan': 'pro'}])
+        self.assertFalse(complete)
+
+    def test_hung_provider_keeps_to_its_share(self):
+        """
+        Test a provider that hangs doesn't make the others time out, and is
+        skipped once it holds half of the threads
+        """
+        hung = HungDummy()
+        self.addCleanup(hung.release.set)
+        providers = [('tests.HungDummy', hung), ('tests.FastDummy',
+                                                 FastDummy())]
+        for i in range(6):
+            results, complete = call_providers(providers, 'custom_data',
+                                               self.user)
+            self.assertEqual(results, [{'fast': True}])
+        fast = get_breaker('tests.FastDummy', 'custom_data').status()
+        self.assertEqual(fast['timeouts'], 0)
+        self.assertEqual(fast['successes'], 6)
+        status = get_breaker('tests.HungDummy', 'custom_data').status()
+        # 2 calls timed out and kept their threads, the others are skipped
+        self.assertEqual(status['timeouts'], 2)
+        self.assertEqual(status['skipped'], 4)
+        self.assertEqual(status['state'], CLOSED)
+
+    def test_calls_wait_for_a_thread(self):
+        """
+        Test more concurrent calls than threads wait for one instead of
+        being dropped
+        """
+        providers = [('tests.SleepDummy%s' % i, SleepDummy())
+                     for i in range(3)]
+        outcomes = []
+
+        def render():
+            outcomes.append(call_providers(providers, 'custom_data',
+                                           self.user, concurrent=True,
+                                           timeout=1.0))
+
+        threads = [threading.Thread(target=render) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(outcomes, [([{'sleep': True}] * 3, True)] * 8)
+        for path, provider in providers:
+            status = get_breaker(path, 'custom_data').status()
+            self.assertEqual(status['successes'], 8)
+            self.assertEqual(status['timeouts'], 0)
+
+    def test_same_provider_twice(self):
+        providers = [('tests.SleepDummy', SleepDummy())] * 5
+        results, complete = call_providers(providers, 'custom_data',
+                                           self.user, concurrent=True,
+                                           timeout=1.0)
+        self.assertEqual(results, [{'sleep': True}] * 5)
+        self.assertTrue(complete)
+
+
+class TestAsyncCallProvidersBreaker(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        patcher = patch(PROVIDERS_PATCH.format('_pool'), ProviderPool(4))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('test_user')
+
+    def test_async_provider_timeout(self):
+        providers = [('tests.AsyncSlowDummy', AsyncSlowDummy()),
+                     ('tests.FastDummy', FastDummy())]
+        start = time.time()
+        results, complete = asyncio.run(
+            acall_providers(providers, 'custom_data', self.user))
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(results, [{'fast': True}])
+        self.assertFalse(complete)
+        status = get_breaker('tests.AsyncSlowDummy', 'custom_data').status()
+        self.assertEqual(status['timeouts'], 1)
+
+    def test_sync_provider_timeout(self):
+        hung = HungDummy()
+        self.addCleanup(hung.release.set)
+        start = time.time()
+        results, complete = asyncio.run(acall_providers(
+            [('tests.HungDummy', hung)], 'custom_data', self.user))
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(results, [])
+
+    def test_open_breaker_serves_last_good_value(self):
+        """
+        Test the async path skips an open breaker and uses the last good
+        value
+        """
+        provider = FlakyDummy({'plan': 'pro'})
+        providers = [('tests.FlakyDummy', provider)]
+        with patch(BREAKER_PATCH.format('INTERCOM_STALE_TIMEOUT'), 3600), \
+                patch(BREAKER_PATCH.format('INTERCOM_BREAKER_THRESHOLD'), 1):
+            asyncio.run(acall_providers(providers, 'custom_data', self.user))
+            provider.fail = True
+            for i in range(2):
+                results, complete = asyncio.run(
+                    acall_providers(providers, 'custom_data', self.user))
+                self.assertEqual(results, [{'plan': 'pro'}])
+                self.assertFalse(complete)
+        self.assertEqual(provider.calls, 2)
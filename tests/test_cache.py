@@ -0,0 +1,268 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from django_intercom.cache import invalidate_company, invalidate_snippets
+from django_intercom.templatetags.intercom import (get_company_data,
+                                                   get_custom_data,
+                                                   render_intercom_tag)
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+CACHE_PATCH = 'django_intercom.cache.{}'
+PROVIDER = 'tests.test_cache.CountingCustomData'
+COMPANY_PROVIDER = 'tests.test_cache.GroupCompanyData'
+
+
+class CountingCustomData:
+    calls = 0
+    cache_invalidated_by = ('auth.Group',)
+
+    def custom_data(self, user):
+        CountingCustomData.calls += 1
+        return {'calls': CountingCustomData.calls}
+
+    def cache_user_ids(self, group):
+        return group.user_set.values_list('pk', flat=True)
+
+
+class GroupCompanyData:
+    calls = 0
+    valid = True
+    cache_invalidated_by = ('auth.Group',)
+
+    def company_key(self, user):
+        return user.groups.values_list('pk', flat=True).first()
+
+    def company_data(self, user):
+        GroupCompanyData.calls += 1
+        group = user.groups.get()
+        data = {'id': group.pk, 'name': group.name,
+                'calls': GroupCompanyData.calls}
+        if GroupCompanyData.valid:
+            data['created_at'] = 0
+        return data
+
+    def cache_company_keys(self, group):
+        return [group.pk]
+
+
+@override_settings(INTERCOM_CUSTOM_DATA_CLASSES=[PROVIDER])
+class TestDataCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        CountingCustomData.calls = 0
+        self.user = User.objects.create_user('test_user')
+        patchers = [patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                          [PROVIDER]),
+                    patch(CACHE_PATCH.format('INTERCOM_DATA_CACHE_TIMEOUT'),
+                          300)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_custom_data_is_cached(self):
+        """
+        Test the providers only run once while the payload is cached
+        """
+        self.assertJSONEqual(get_custom_data(self.user), {'calls': 1})
+        self.assertJSONEqual(get_custom_data(self.user), {'calls': 1})
+
+    def test_user_save_invalidates_cache(self):
+        """
+        Test saving the user removes the cached payload
+        """
+        get_custom_data(self.user)
+        self.user.save()
+        self.assertJSONEqual(get_custom_data(self.user), {'calls': 2})
+
+    def test_last_login_update_keeps_cache(self):
+        """
+        Test updating only last_login doesn't remove the cached payload
+        """
+        get_custom_data(self.user)
+        self.user.save(update_fields=['last_login'])
+        self.assertJSONEqual(get_custom_data(self.user), {'calls': 1})
+
+    def test_declared_model_invalidates_cache(self):
+        """
+        Test saving a model from cache_invalidated_by removes the payload
+        """
+        group = Group.objects.create(name='group')
+        group.user_set.add(self.user)
+        get_custom_data(self.user)
+        group.save()
+        self.assertJSONEqual(get_custom_data(self.user), {'calls': 2})
+
+    def test_cache_version_change(self):
+        """
+        Test bumping the provider cache_version rebuilds the payload
+        """
+        get_custom_data(self.user)
+        with patch.object(CountingCustomData, 'cache_version', 2,
+                          create=True):
+            self.assertJSONEqual(get_custom_data(self.user), {'calls': 2})
+
+
+@override_settings(INTERCOM_CUSTOM_DATA_CLASSES=[PROVIDER])
+@override_settings(INTERCOM_COMPANY_DATA_CLASS=COMPANY_PROVIDER)
+class TestCompanyCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        GroupCompanyData.calls = 0
+        GroupCompanyData.valid = True
+        self.group = Group.objects.create(name='acme')
+        self.users = [User.objects.create_user('user_%s' % i)
+                      for i in range(3)]
+        for user in self.users:
+            user.groups.add(self.group)
+        patcher = patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                        COMPANY_PROVIDER)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_built_once_per_company(self):
+        """
+        Test the members of a company share a single build, even without
+        the per user cache
+        """
+        for user in self.users:
+            self.assertJSONEqual(get_company_data(user),
+                                 {'id': self.group.pk, 'name': 'acme',
+                                  'calls': 1, 'created_at': 0})
+        self.assertEqual(GroupCompanyData.calls, 1)
+
+    def test_user_without_company(self):
+        user = User.objects.create_user('loner')
+        self.assertEqual(get_company_data(user), '{}')
+        self.assertEqual(GroupCompanyData.calls, 0)
+
+    def test_validated_once_per_build(self):
+        """
+        Test the required keys are checked once per company build
+        """
+        GroupCompanyData.valid = False
+        with self.assertLogs('django_intercom', 'WARNING') as logs:
+            for user in self.users:
+                self.assertEqual(get_company_data(user), '{}')
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(GroupCompanyData.calls, 1)
+
+    def test_declared_model_invalidates_company(self):
+        """
+        Test cache_company_keys removes the payload of the company
+        """
+        get_company_data(self.users[0])
+        self.group.save()
+        self.assertJSONEqual(get_company_data(self.users[1]),
+                             {'id': self.group.pk, 'name': 'acme',
+                              'calls': 2, 'created_at': 0})
+
+    def test_invalidate_company(self):
+        get_company_data(self.users[0])
+        invalidate_company(self.group.pk)
+        get_company_data(self.users[1])
+        self.assertEqual(GroupCompanyData.calls, 2)
+
+
+class TestSnippetCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        CountingCustomData.calls = 0
+        self.user = User.objects.create_user('test_user')
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = self.user
+        patchers = [patch(MODULE_PATCH.format('INTERCOM_APPID'), 'abc123'),
+                    patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                          [PROVIDER]),
+                    patch(MODULE_PATCH.format(
+                        'INTERCOM_SNIPPET_CACHE_TIMEOUT'), 300),
+                    patch(CACHE_PATCH.format(
+                        'INTERCOM_SNIPPET_CACHE_TIMEOUT'), 300)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def render(self, **kwargs):
+        return render_intercom_tag({'request': self.request}, **kwargs)
+
+    def test_snippet_is_cached(self):
+        """
+        Test the snippet is only rendered once while it is cached
+        """
+        first = self.render()
+        self.assertEqual(self.render(), first)
+        self.assertEqual(CountingCustomData.calls, 1)
+        self.assertIn('"calls":1', first)
+
+    def test_tag_argument_turns_cache_off(self):
+        """
+        Test cache_timeout=0 renders the snippet every time
+        """
+        self.render(cache_timeout=0)
+        self.render(cache_timeout=0)
+        self.assertEqual(CountingCustomData.calls, 2)
+
+    def test_user_save_invalidates_snippet(self):
+        """
+        Test saving the user removes the cached snippet
+        """
+        self.render()
+        self.user.email = 'new@example.com'
+        self.user.save()
+        self.assertIn('new@example.com', self.render())
+
+    def test_invalidate_snippets(self):
+        """
+        Test invalidate_snippets stops using every cached snippet
+        """
+        self.render()
+        invalidate_snippets()
+        self.render()
+        self.assertEqual(CountingCustomData.calls, 2)
+
+    def test_invalidate_company_keeps_other_snippets(self):
+        """
+        Test invalidating a company only renders the snippets of its members
+        again
+        """
+        other = User.objects.create_user('other_user')
+        group = Group.objects.create(name='acme')
+        group.user_set.add(self.user)
+        other.groups.add(Group.objects.create(name='other'))
+        other_request = RequestFactory().get('/')
+        SessionMiddleware().process_request(other_request)
+        other_request.user = other
+        with patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                   COMPANY_PROVIDER), \
+                override_settings(
+                    INTERCOM_COMPANY_DATA_CLASS=COMPANY_PROVIDER):
+            self.render()
+            render_intercom_tag({'request': other_request})
+            invalidate_company(group.pk)
+            self.render()
+            render_intercom_tag({'request': other_request})
+        # the member of acme only
+        self.assertEqual(CountingCustomData.calls, 3)
+
+    def test_cache_token_changes_version(self):
+        """
+        Test a different cache_token of a provider renders the snippet again
+        """
+        self.render()
+        with patch.object(CountingCustomData, 'cache_token',
+                          lambda provider, user: 'changed', create=True):
+            self.render()
+        self.assertEqual(CountingCustomData.calls, 2)
+
+    def test_settings_change_invalidates_snippet(self):
+        """
+        Test changing an INTERCOM_* setting renders the snippet again
+        """
+        self.render()
+        with override_settings(INTERCOM_SECURE_KEY='rotated'):
+            self.render()
+        self.assertEqual(CountingCustomData.calls, 2)
@@ -0,0 +1,216 @@
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from django_intercom.cache import get_cached, get_company_cached
+from django_intercom.templatetags.intercom import get_custom_data
+
+from tests.stub_server import StubIntercomServer
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+CACHE_PATCH = 'django_intercom.cache.{}'
+WARM_PROVIDER = 'tests.test_commands.CountingCustomData'
+KEYED_COMPANY = 'tests.test_commands.KeyedCompanyData'
+
+
+class CompanyDataDummy:
+    def company_data(self, user):
+        return {'id': 7, 'name': 'company', 'created_at': 0, 'plan': 'pro'}
+
+
+class RelatedCustomData:
+    prefetch_related = ('groups',)
+    prefetched = []
+
+    def custom_data(self, user):
+        self.prefetched.append('groups' in getattr(
+            user, '_prefetched_objects_cache', {}))
+        return {'groups': user.groups.count()}
+
+
+class TestIntercomSync(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user('user%s' % i,
+                                               'user%s@example.com' % i)
+                      for i in range(5)]
+
+    def sync(self, url, **options):
+        out = StringIO()
+        call_command('intercom_sync', base_url=url, chunk_size=2, workers=2,
+                     stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_sync_posts_every_user(self):
+        """
+        Test every user is posted with the provider data
+        """
+        with StubIntercomServer() as server, \
+                patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                      'tests.test_commands.CompanyDataDummy'):
+            output = self.sync(server.url)
+        self.assertIn('Synced 5 users (0 failed)', output)
+        posted = sorted(body['user_id'] for method, path, body, headers
+                        in server.requests)
+        self.assertEqual(posted, sorted(str(u.pk) for u in self.users))
+        method, path, body, headers = server.requests[0]
+        self.assertEqual((method, path), ('POST', '/users'))
+        self.assertEqual(body['companies'], [{
+            'company_id': '7', 'name': 'company', 'remote_created_at': 0,
+            'custom_attributes': {'plan': 'pro'}}])
+
+    def test_sync_loads_declared_relations(self):
+        """
+        Test the relations the data classes declare are prefetched per chunk
+        """
+        RelatedCustomData.prefetched = []
+        with StubIntercomServer() as server, \
+                patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                      ['tests.test_commands.RelatedCustomData']):
+            self.sync(server.url)
+        self.assertEqual(RelatedCustomData.prefetched, [True] * 5)
+
+    def test_sync_resumes_from_checkpoint(self):
+        """
+        Test a second run with the same checkpoint only syncs new users
+        """
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'sync.json')
+        with StubIntercomServer() as server:
+            self.sync(server.url, checkpoint=checkpoint)
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)['last_pk'], self.users[-1].pk)
+            new_user = User.objects.create_user('new', 'new@example.com')
+            output = self.sync(server.url, checkpoint=checkpoint)
+        self.assertIn('Synced 1 users', output)
+        self.assertEqual(server.requests[-1][2]['user_id'], str(new_user.pk))
+
+    def test_sync_retries_failed_users(self):
+        """
+        Test the users that failed are kept in the checkpoint and synced by
+        the next run
+        """
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'sync.json')
+        with StubIntercomServer() as server:
+            server.responses.append((500, {}, {'error': 'boom'}))
+            self.assertIn('Synced 4 users (1 failed)',
+                          self.sync(server.url, checkpoint=checkpoint))
+            failed_id = server.requests[0][2]['user_id']
+            with open(checkpoint) as f:
+                data = json.load(f)
+            self.assertEqual(data['last_pk'], self.users[-1].pk)
+            self.assertEqual(data['failed_pks'], [int(failed_id)])
+
+            output = self.sync(server.url, checkpoint=checkpoint)
+            self.assertIn('Synced 1 users (0 failed)', output)
+            self.assertEqual(server.requests[-1][2]['user_id'], failed_id)
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)['failed_pks'], [])
+
+    def test_sync_counts_failures(self):
+        with StubIntercomServer() as server:
+            server.responses.append((500, {}, {'error': 'boom'}))
+            output = self.sync(server.url)
+        self.assertIn('Synced 4 users (1 failed)', output)
+
+
+class CountingCustomData:
+    calls = 0
+
+    def custom_data(self, user):
+        CountingCustomData.calls += 1
+        return {'username': user.username}
+
+
+class KeyedCompanyData:
+    calls = 0
+
+    def company_key(self, user):
+        return 7
+
+    def company_data(self, user):
+        KeyedCompanyData.calls += 1
+        return {'id': 7, 'name': 'company', 'created_at': 0}
+
+
+class TestIntercomWarm(TestCase):
+    def setUp(self):
+        cache.clear()
+        CountingCustomData.calls = 0
+        now = timezone.now()
+        self.recent = [User.objects.create_user('recent%s' % i,
+                                                last_login=now)
+                       for i in range(3)]
+        self.old = User.objects.create_user(
+            'old', last_login=now - datetime.timedelta(days=30))
+        patchers = [patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                          [WARM_PROVIDER]),
+                    patch(CACHE_PATCH.format('INTERCOM_DATA_CACHE_TIMEOUT'),
+                          300)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def warm(self, **options):
+        out = StringIO()
+        call_command('intercom_warm', chunk_size=2, stdout=out,
+                     stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_warms_recent_users(self):
+        """
+        Test the users that logged in recently get their payload cached
+        """
+        output = self.warm()
+        self.assertIn('Warmed 3 users (0 already cached, 0 failed)', output)
+        for user in self.recent:
+            self.assertJSONEqual(
+                get_cached('custom_data', user, [WARM_PROVIDER]),
+                {'username': user.username})
+        self.assertIsNone(get_cached('custom_data', self.old,
+                                     [WARM_PROVIDER]))
+        # the tag reads the warmed payload
+        self.assertJSONEqual(get_custom_data(self.recent[0]),
+                             {'username': 'recent0'})
+        self.assertEqual(CountingCustomData.calls, 3)
+
+    def test_skips_cached_users(self):
+        self.warm()
+        self.assertIn('Warmed 0 users (3 already cached', self.warm())
+        self.assertIn('Warmed 3 users', self.warm(force=True))
+
+    def test_warms_each_company_once(self):
+        """
+        Test the company data shared by the members is built once
+        """
+        KeyedCompanyData.calls = 0
+        with patch(MODULE_PATCH.format('INTERCOM_COMPANY_DATA_CLASS'),
+                   KEYED_COMPANY):
+            self.assertIn('Warmed 3 users', self.warm())
+        self.assertEqual(KeyedCompanyData.calls, 1)
+        self.assertJSONEqual(get_company_cached(7, KEYED_COMPANY),
+                             {'id': 7, 'name': 'company', 'created_at': 0})
+
+    def test_days_window(self):
+        self.assertIn('Warmed 4 users', self.warm(days=60))
+
+    def test_memory_ceiling_shrinks_chunks(self):
+        """
+        Test the chunks get smaller when the memory ceiling is reached
+        """
+        err = StringIO()
+        call_command('intercom_warm', chunk_size=40, max_memory=1,
+                     stdout=StringIO(), stderr=err)
+        self.assertIn('warming 20 users at a time', err.getvalue())
+
+    def test_requires_data_cache(self):
+        with patch(CACHE_PATCH.format('INTERCOM_DATA_CACHE_TIMEOUT'), None):
+            with self.assertRaises(CommandError):
+                self.warm()
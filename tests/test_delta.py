@@ -0,0 +1,125 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from django_intercom.delta import apply_delta
+from django_intercom.templatetags.intercom import render_intercom_tag
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+DELTA_PATCH = 'django_intercom.delta.{}'
+
+
+def tag_context(custom_data, company_data=None):
+    return {'anonymous': False,
+            'custom_data': json.dumps(custom_data),
+            'company_data': json.dumps(company_data or {})}
+
+
+class ChangingCustomData:
+    data = {}
+
+    def custom_data(self, user):
+        return ChangingCustomData.data
+
+
+class TestApplyDelta(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_first_payload_is_sent_in_full(self):
+        """
+        Test nothing is left out when there is no fingerprint yet
+        """
+        context = tag_context({'plan': 'free', 'seats': 1})
+        self.assertEqual(apply_delta(context, 1), context)
+
+    def test_unchanged_keys_are_left_out(self):
+        """
+        Test only the changed keys of the custom data are sent again
+        """
+        apply_delta(tag_context({'plan': 'free', 'seats': 1}), 1)
+        context = apply_delta(tag_context({'plan': 'pro', 'seats': 1}), 1)
+        self.assertJSONEqual(context['custom_data'], {'plan': 'pro'})
+
+    def test_unchanged_payload_isnt_written(self):
+        """
+        Test the fingerprint is only written again when the payload changes
+        """
+        apply_delta(tag_context({'plan': 'free'}), 1)
+        with patch.object(cache, 'set') as cache_set:
+            apply_delta(tag_context({'plan': 'free'}), 1)
+            self.assertFalse(cache_set.called)
+            apply_delta(tag_context({'plan': 'pro'}), 1)
+            self.assertTrue(cache_set.called)
+
+    def test_fingerprints_are_per_user(self):
+        """
+        Test another user gets the full payload
+        """
+        apply_delta(tag_context({'plan': 'free'}), 1)
+        context = apply_delta(tag_context({'plan': 'free'}), 2)
+        self.assertJSONEqual(context['custom_data'], {'plan': 'free'})
+
+    def test_company_keeps_its_id(self):
+        """
+        Test an unchanged company is reduced to its id
+        """
+        company = {'id': 1, 'name': 'intercom_test', 'created_at': 0}
+        apply_delta(tag_context({}, company), 1)
+        context = apply_delta(tag_context({}, company), 1)
+        self.assertJSONEqual(context['company_data'], {'id': 1})
+
+    def test_different_company_is_sent_in_full(self):
+        """
+        Test all of the keys are sent when the company id changes
+        """
+        apply_delta(tag_context({}, {'id': 1, 'name': 'a', 'created_at': 0}),
+                    1)
+        company = {'id': 2, 'name': 'a', 'created_at': 0}
+        context = apply_delta(tag_context({}, company), 1)
+        self.assertJSONEqual(context['company_data'], company)
+
+    def test_full_resend_after_interval(self):
+        """
+        Test everything is sent again once the interval has passed
+        """
+        with patch(DELTA_PATCH.format('time.time'), return_value=1000):
+            apply_delta(tag_context({'plan': 'free'}), 1)
+        with patch(DELTA_PATCH.format('time.time'), return_value=1100), \
+                patch(DELTA_PATCH.format('INTERCOM_DELTA_RESEND_INTERVAL'),
+                      60):
+            context = apply_delta(tag_context({'plan': 'free'}), 1)
+        self.assertJSONEqual(context['custom_data'], {'plan': 'free'})
+
+
+class TestDeltaTag(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('test_user')
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = self.user
+        patchers = [patch(MODULE_PATCH.format('INTERCOM_APPID'), 'abc123'),
+                    patch(MODULE_PATCH.format('INTERCOM_DELTA_PAYLOADS'),
+                          True),
+                    patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                          ['tests.test_delta.ChangingCustomData'])]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_tag_only_renders_changed_keys(self):
+        """
+        Test the second render of the tag leaves out the unchanged keys
+        """
+        ChangingCustomData.data = {'plan': 'free', 'seats': 1}
+        first = render_intercom_tag({'request': self.request})
+        ChangingCustomData.data = {'plan': 'free', 'seats': 2}
+        second = render_intercom_tag({'request': self.request})
+        self.assertIn('"plan":"free"', first)
+        self.assertNotIn('"plan":"free"', second)
+        self.assertIn("'custom_data': {\"seats\":2}", second)
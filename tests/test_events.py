@@ -0,0 +1,104 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from django_intercom import events
+from django_intercom.buffer import BatchBuffer
+
+from tests.stub_server import StubIntercomServer
+
+
+class TestBatchBuffer(TestCase):
+    def test_flush_sends_batches(self):
+        """
+        Test flush sends everything in batches of batch_size
+        """
+        batches = []
+        buffer = BatchBuffer(batches.append, batch_size=2)
+        for i in range(5):
+            buffer._items.append(i)
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_background_flush_on_batch_size(self):
+        """
+        Test the worker thread sends a batch once it is full
+        """
+        batches = []
+        buffer = BatchBuffer(batches.append, batch_size=2, interval=60)
+        self.addCleanup(buffer.stop)
+        buffer.add(1)
+        buffer.add(2)
+        for i in range(100):
+            if batches:
+                break
+            time.sleep(0.01)
+        self.assertEqual(batches, [[1, 2]])
+
+    def test_retry_with_backoff(self):
+        """
+        Test a failed batch is retried
+        """
+        calls = []
+
+        def send_batch(batch):
+            calls.append(batch)
+            if len(calls) < 3:
+                raise IOError('intercom is down')
+
+        buffer = BatchBuffer(send_batch, max_retries=3, backoff=0)
+        buffer._items.extend([1, 2])
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(calls), 3)
+
+    def test_drops_batch_after_retries(self):
+        def send_batch(batch):
+            raise IOError('intercom is down')
+
+        buffer = BatchBuffer(send_batch, max_retries=1, backoff=0)
+        buffer._items.append(1)
+        with patch('django_intercom.buffer.log'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer), 0)
+
+    def test_stop_drains_buffer(self):
+        batches = []
+        buffer = BatchBuffer(batches.append, batch_size=10, interval=60)
+        buffer.add(1)
+        buffer.stop()
+        self.assertEqual(batches, [[1]])
+
+
+class TestTrackEvent(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('test_user', 'a@example.com')
+        events._buffer = None
+        self.addCleanup(setattr, events, '_buffer', None)
+
+    def test_track_event_and_flush(self):
+        """
+        Test buffered events are posted to the bulk events API on flush
+        """
+        with StubIntercomServer() as server, \
+                patch('django_intercom.client.INTERCOM_API_BASE_URL',
+                      server.url):
+            events.track_event(self.user, 'exported_report',
+                               metadata={'rows': 10}, created_at=1562630400)
+            events.track_event(self.user, 'logged_out',
+                               created_at=1562630401)
+            self.assertEqual(events.flush(), 2)
+            events.get_buffer().stop()
+        self.assertEqual(len(server.requests), 1)
+        method, path, body, headers = server.requests[0]
+        self.assertEqual(path, '/bulk/events')
+        self.assertEqual(body['items'], [
+            {'method': 'post', 'data_type': 'event',
+             'data': {'event_name': 'exported_report',
+                      'created_at': 1562630400, 'user_id': str(self.user.pk),
+                      'metadata': {'rows': 10}}},
+            {'method': 'post', 'data_type': 'event',
+             'data': {'event_name': 'logged_out', 'created_at': 1562630401,
+                      'user_id': str(self.user.pk)}},
+        ])
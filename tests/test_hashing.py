@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase
+
+from django_intercom.hashing import (UserHasher, get_hasher, user_hashes,
+                                     verify_user_hash)
+from django_intercom.templatetags.intercom import intercom_tag
+
+HASHING_PATCH = 'django_intercom.hashing.{}'
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class UserIdDataDummy:
+    def user_data(self, user):
+        return {'user_id': 'crm-1', 'email': 'crm@example.com'}
+
+
+def expected_hash(key, value):
+    return hmac.new(key.encode('utf8'), value.encode('utf8'),
+                    digestmod=hashlib.sha256).hexdigest()
+
+
+class TestUserHasher(TestCase):
+    def test_user_hash(self):
+        """
+        Test the hash is the sha256 HMAC of the value
+        """
+        hasher = UserHasher('secret')
+        self.assertEqual(hasher.user_hash('1'), expected_hash('secret', '1'))
+        self.assertEqual(hasher.user_hash('1'), expected_hash('secret', '1'))
+
+    def test_cache_is_bounded(self):
+        """
+        Test the least recently used hashes are evicted
+        """
+        hasher = UserHasher('secret', maxsize=2)
+        hasher.user_hash('1')
+        hasher.user_hash('2')
+        hasher.user_hash('1')
+        hasher.user_hash('3')
+        self.assertEqual(list(hasher._cache), ['1', '3'])
+
+    def test_hash_many_skips_cache(self):
+        """
+        Test the bulk API doesn't fill the LRU
+        """
+        hasher = UserHasher('secret')
+        self.assertEqual(hasher.hash_many(['1', 'a@example.com']),
+                         [expected_hash('secret', '1'),
+                          expected_hash('secret', 'a@example.com')])
+        self.assertEqual(len(hasher._cache), 0)
+
+    def test_user_hashes(self):
+        """
+        Test computing the hashes of many users
+        """
+        users = [User.objects.create_user('user%s' % i) for i in range(3)]
+        hashes = user_hashes(users, key='secret')
+        self.assertEqual(hashes, {user.pk: expected_hash('secret',
+                                                         str(user.pk))
+                                  for user in users})
+
+    def test_user_hashes_match_tag(self):
+        """
+        Test the bulk hashes use the user_id and email of the user data
+        class, like the tag
+        """
+        user = User.objects.create_user('user', 'user@example.com')
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        request.user = user
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), 'abc123'), \
+                patch(MODULE_PATCH.format('INTERCOM_SECURE_KEY'), 'secret'), \
+                patch(MODULE_PATCH.format('INTERCOM_USER_DATA_CLASS'),
+                      'tests.test_hashing.UserIdDataDummy'):
+            tag_hash = intercom_tag({'request': request})['user_hash']
+            hashes = user_hashes([user], key='secret')
+            with patch(MODULE_PATCH.format('INTERCOM_INCLUDE_USERID'),
+                       False):
+                email_hash = intercom_tag({'request': request})['user_hash']
+                email_hashes = user_hashes([user], key='secret')
+        self.assertEqual(hashes[user.pk], tag_hash)
+        self.assertEqual(tag_hash, expected_hash('secret', 'crm-1'))
+        self.assertEqual(email_hashes[user.pk], email_hash)
+        self.assertEqual(email_hash,
+                         expected_hash('secret', 'crm@example.com'))
+
+    def test_rotated_key_keeps_its_hasher(self):
+        """
+        Test a hasher is kept per key so rotating keys keeps the cache
+        """
+        self.assertIs(get_hasher('old'), get_hasher('old'))
+        self.assertIsNot(get_hasher('old'), get_hasher('new'))
+
+    def test_verify_user_hash_with_fallback_keys(self):
+        """
+        Test hashes made with a fallback key are still valid
+        """
+        with patch(HASHING_PATCH.format('INTERCOM_SECURE_KEY'), 'new'), \
+                patch(HASHING_PATCH.format('INTERCOM_SECURE_KEY_FALLBACKS'),
+                      ['old']):
+            self.assertTrue(verify_user_hash('1', expected_hash('new', '1')))
+            self.assertTrue(verify_user_hash('1', expected_hash('old', '1')))
+            self.assertFalse(verify_user_hash('1',
+                                              expected_hash('other', '1')))
+
+    def test_intercom_tag_user_hash(self):
+        """
+        Test intercom templatetag with INTERCOM_SECURE_KEY
+        """
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('test_user')
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_SECURE_KEY'), 'secret'):
+            tag_dict = intercom_tag({'request': request})
+        self.assertEqual(tag_dict['user_hash'],
+                         expected_hash('secret', str(request.user.pk)))
@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from django_intercom.middleware import ServerTimingMiddleware
+from django_intercom.signals import provider_timed
+from django_intercom.testing import IntercomTestMixin
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+PROVIDER = 'tests.test_instrumentation.QueryCustomData'
+
+
+class QueryCustomData:
+    def custom_data(self, user):
+        return {'num_users': User.objects.count(),
+                'num_staff': User.objects.filter(is_staff=True).count()}
+
+
+class TestInstrumentation(IntercomTestMixin, TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = User.objects.create_user('test_user')
+        self.template = Template('{% load intercom %}{% intercom_tag %}')
+
+    def render(self, request):
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                      [PROVIDER]):
+            return HttpResponse(self.template.render(
+                Context({'request': request})))
+
+    def test_provider_timed_signal(self):
+        """
+        Test the provider calls and the tag render send timing events
+        """
+        events = []
+
+        def receiver(event, **kwargs):
+            events.append(event)
+
+        provider_timed.connect(receiver)
+        self.addCleanup(provider_timed.disconnect, receiver)
+        self.render(self.request)
+
+        provider_event, tag_event = events
+        self.assertEqual(provider_event.provider, PROVIDER)
+        self.assertEqual(provider_event.method, 'custom_data')
+        self.assertEqual(provider_event.queries, 2)
+        self.assertEqual(provider_event.size,
+                         len('{"num_users": 1, "num_staff": 0}'))
+        self.assertFalse(provider_event.cached)
+        self.assertEqual(tag_event.provider, 'intercom_tag')
+        self.assertEqual(tag_event.queries, 2)
+
+    def test_cache_hit_event(self):
+        """
+        Test a payload served from the cache sends a cached event
+        """
+        events = []
+
+        def receiver(event, **kwargs):
+            events.append(event)
+
+        with patch('django_intercom.cache.INTERCOM_DATA_CACHE_TIMEOUT', 60):
+            self.render(self.request)
+            provider_timed.connect(receiver)
+            self.addCleanup(provider_timed.disconnect, receiver)
+            self.render(self.request)
+        self.assertTrue(events[0].cached)
+        self.assertEqual(events[0].queries, 0)
+
+    def test_server_timing_middleware(self):
+        """
+        Test the middleware adds the events to the Server-Timing header
+        """
+        response = ServerTimingMiddleware(self.render)(self.request)
+        header = response['Server-Timing']
+        self.assertIn('intercom-custom_data;dur=', header)
+        self.assertIn('desc="%s q=2 b=' % PROVIDER, header)
+        self.assertIn('intercom-render;dur=', header)
+
+    def test_assert_provider_max_queries(self):
+        """
+        Test the query count assertion helper
+        """
+        event = self.assertProviderMaxQueries(2, PROVIDER, self.request.user)
+        self.assertEqual(event.queries, 2)
+        with self.assertRaises(AssertionError):
+            self.assertProviderMaxQueries(1, PROVIDER, self.request.user)
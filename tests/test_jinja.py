@@ -0,0 +1,100 @@
+import datetime
+import json
+import unittest
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase
+
+from django_intercom.loading import loader
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+@unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+class TestJinjaExtension(TestCase):
+    base_context = {
+        'INTERCOM_IS_VALID': True,
+        'anonymous': False,
+        'intercom_appid': '1234abCD',
+        'email_address': 'test@example.com',
+        'user_id': 1,
+        'user_created': datetime.datetime(2019, 7, 9, 12, 30),
+        'name': 'test_user',
+        'enable_inbox': True,
+        'use_counter': 'true',
+        'css_selector': '#Intercom',
+        'custom_data': json.dumps({'plan': 'pro'}),
+        'company_data': json.dumps({'id': 1, 'name': 'company',
+                                    'created_at': 0}),
+        'user_hash': 'abcdef0123456789',
+        'widget_loader': loader('idle', 2000),
+    }
+
+    def setUp(self):
+        from django_intercom.jinja import IntercomExtension
+
+        self.environment = jinja2.Environment(extensions=[IntercomExtension],
+                                              autoescape=True,
+                                              trim_blocks=True)
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+
+    def assertRendersLikeTemplate(self, **context):
+        from django_intercom.jinja import render_snippet
+
+        context = dict(self.base_context, **context)
+        expected = render_to_string('intercom/intercom_tag.html', context)
+        self.assertEqual(render_snippet(context), expected)
+
+    def test_authenticated(self):
+        self.assertRendersLikeTemplate()
+
+    def test_escaped_values(self):
+        self.assertRendersLikeTemplate(name='O\'Brien <b>&"',
+                                       email_address='a&b@example.com',
+                                       user_id='<1>', user_hash=None)
+
+    def test_anonymous(self):
+        self.assertRendersLikeTemplate(anonymous=True, user_id='abc',
+                                       email_address='lead@example.com',
+                                       name='Unknown')
+
+    def test_anonymous_id(self):
+        self.assertRendersLikeTemplate(anonymous=True, user_id='abc',
+                                       anonymous_id='abc',
+                                       email_address='lead@example.com',
+                                       name='Unknown')
+
+    def test_invalid(self):
+        self.assertRendersLikeTemplate(INTERCOM_IS_VALID=False)
+
+    def test_global_matches_template_tag(self):
+        """
+        Test {{ intercom_tag() }} gives the same output as {% intercom_tag %}
+        """
+        self.request.user = User.objects.create_user('test_user')
+        template = Template('{% load intercom %}{% intercom_tag %}')
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch('django.utils.timezone.now',
+                      return_value=datetime.datetime(2019, 7, 9)):
+            expected = template.render(Context({'request': self.request}))
+            output = self.environment.from_string(
+                '{{ intercom_tag() }}').render(request=self.request)
+        self.assertIn("'name': 'test_user'", output)
+        self.assertEqual(output, expected)
+
+    def test_without_request(self):
+        """
+        Test the snippet is skipped without a request in the context
+        """
+        output = self.environment.from_string('{{ intercom_tag() }}').render()
+        self.assertIn('Skipping intercom', output)
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import RequestFactory, TestCase
+
+from django_intercom.loading import BOOTSTRAP_ONLOAD, ONLOAD, loader
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+LOADING_PATCH = 'django_intercom.loading.{}'
+
+
+class TestLoader(TestCase):
+    def test_onload(self):
+        self.assertEqual(loader('onload'), (
+            "if(w.attachEvent){w.attachEvent('onload',l);}"
+            "else{w.addEventListener('load',l,false);}"))
+        self.assertEqual(loader('onload', bootstrap=True), (
+            "if(d.readyState==='complete'){l();}"
+            "else{w.addEventListener('load',l,false);}"))
+
+    def test_idle(self):
+        self.assertEqual(loader('idle', 2000), (
+            "var r=function(){if(w.requestIdleCallback){"
+            "w.requestIdleCallback(l,{timeout:2000});}"
+            "else{w.setTimeout(l,1);}};"
+            "if(d.readyState==='complete'){r();}"
+            "else{w.addEventListener('load',r,false);}"))
+
+    def test_delay(self):
+        self.assertEqual(loader('delay', 500), (
+            "var r=function(){w.setTimeout(l,500);};"
+            "if(d.readyState==='complete'){r();}"
+            "else{w.addEventListener('load',r,false);}"))
+
+    def test_interaction(self):
+        self.assertEqual(loader('interaction'), (
+            "var e=['scroll','mousemove','touchstart','keydown','click'];"
+            "var r=function(){e.forEach(function(n){"
+            "w.removeEventListener(n,r,true);});l();};"
+            "e.forEach(function(n){"
+            "w.addEventListener(n,r,{capture:true,passive:true});});"))
+
+    def test_click(self):
+        """
+        Test the click loader uses the escaped INTERCOM_INBOX_CSS_SELECTOR
+        """
+        with patch(LOADING_PATCH.format('INTERCOM_INBOX_CSS_SELECTOR'),
+                   '#Intercom, a[href="#help"]</script>'):
+            self.assertEqual(loader('click'), (
+                "var r=function(e){var t=e.target;"
+                "if(t.closest&&t.closest(\"#Intercom, a[href=\\\"#help\\\"]"
+                "\\u003C/script\\u003E\")){"
+                "d.removeEventListener('click',r,true);l();"
+                "w.Intercom('show');}};"
+                "d.addEventListener('click',r,true);"))
+
+    def test_defaults_from_settings(self):
+        with patch(LOADING_PATCH.format('INTERCOM_LOADING'), 'delay'), \
+                patch(LOADING_PATCH.format('INTERCOM_LOADING_DELAY'), 100):
+            self.assertIn('w.setTimeout(l,100)', loader())
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            loader('eventually')
+
+
+class TestLoadingTag(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = AnonymousUser()
+        patcher = patch(MODULE_PATCH.format('INTERCOM_APPID'), 'abc123')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render(self, arguments=''):
+        template = Template('{%% load intercom %%}{%% intercom_tag %s %%}'
+                            % arguments)
+        return template.render(Context({'request': self.request}))
+
+    def test_default_is_onload(self):
+        self.assertIn(ONLOAD + '}})();', self.render())
+
+    def test_tag_argument(self):
+        output = self.render('loading="delay" delay=1500')
+        self.assertIn(loader('delay', 1500) + '}})();', output)
+        self.assertNotIn(ONLOAD, output)
+
+    def test_bootstrap_mode(self):
+        self.assertIn(BOOTSTRAP_ONLOAD + '}};x.send();',
+                      self.render('mode="bootstrap"'))
+        self.assertIn(loader('interaction') + '}};x.send();',
+                      self.render('mode="bootstrap" loading="interaction"'))
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(TemplateSyntaxError):
+            self.render('loading="eventually"')
+
+    def test_invalid_delay(self):
+        with self.assertRaises(TemplateSyntaxError):
+            self.render('loading="delay" delay="3s"')
@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+
+from django_intercom.middleware import IntercomSnippetMiddleware
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+PAGE = '<html><body><p>Hello</p></body></html>'
+
+
+class TestIntercomSnippetMiddleware(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = User.objects.create_user('test_user')
+        patcher = patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def process(self, response):
+        return IntercomSnippetMiddleware(lambda request: response)(
+            self.request)
+
+    def test_inserts_snippet_before_body(self):
+        """
+        Test the snippet is inserted before </body> and Content-Length fixed
+        """
+        response = HttpResponse(PAGE)
+        response['Content-Length'] = len(PAGE)
+        response = self.process(response)
+        content = response.content.decode('utf8')
+        self.assertTrue(content.startswith('<html><body><p>Hello</p>\n'))
+        self.assertTrue(content.endswith('</script>\n\n</body></html>'))
+        self.assertIn("'name': 'test_user'", content)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+
+    def test_body_outside_scanned_tail(self):
+        """
+        Test only the end of the content is searched
+        """
+        page = PAGE.replace('</body>', '</body>' + ' ' * 4096)
+        response = self.process(HttpResponse(page))
+        self.assertEqual(response.content.decode('utf8'), page)
+
+    def test_skips_non_html(self):
+        response = self.process(HttpResponse(PAGE,
+                                             content_type='text/plain'))
+        self.assertEqual(response.content.decode('utf8'), PAGE)
+
+    def test_skips_streaming(self):
+        response = self.process(StreamingHttpResponse([PAGE]))
+        self.assertEqual(b''.join(response).decode('utf8'), PAGE)
+
+    def test_skips_already_tagged(self):
+        """
+        Test pages that rendered {% intercom_tag %} are left alone
+        """
+        page = Template('<body>{% load intercom %}{% intercom_tag %}</body>'
+                        ).render(Context({'request': self.request}))
+        response = self.process(HttpResponse(page))
+        self.assertEqual(response.content.decode('utf8'), page)
+
+    def test_skips_cached_snippet(self):
+        """
+        Test pages with a snippet rendered for an earlier request, in a
+        cache, are left alone
+        """
+        for mode in ('inline', 'bootstrap'):
+            template = Template('<body>{% load intercom %}'
+                                '{% intercom_tag mode="' + mode + '" %}'
+                                '</body>')
+            page = template.render(Context({'request': self.request}))
+            self.request._intercom_rendered = False
+            response = self.process(HttpResponse(page))
+            self.assertEqual(response.content.decode('utf8'), page)
@@ -0,0 +1,211 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, TestCase, override_settings
+
+from django_intercom.providers import (ProviderRegistry, call_providers,
+                                       registry, related_lookups,
+                                       with_related)
+from django_intercom.templatetags.intercom import intercom_tag
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class CustomDataDummy:
+    def custom_data(self, user):
+        return {'test': 'This Is Dummy Data'}
+
+
+class NoMethodDummy:
+    pass
+
+
+class DataDummy:
+    def __init__(self, data, delay=0):
+        self.data = data
+        self.delay = delay
+
+    def custom_data(self, user):
+        time.sleep(self.delay)
+        return self.data
+
+
+class ErrorDummy:
+    def custom_data(self, user):
+        raise ValueError('provider error')
+
+
+class TestProviderRegistry(TestCase):
+    def test_get_reuses_provider_instance(self):
+        """
+        Test the provider class is only instantiated once
+        """
+        registry = ProviderRegistry()
+        path = 'tests.test_providers.CustomDataDummy'
+        provider = registry.get(path, 'custom_data')
+        self.assertIsInstance(provider, CustomDataDummy)
+        self.assertIs(registry.get(path, 'custom_data'), provider)
+
+    def test_get_bad_path_warns_once(self):
+        """
+        Test a provider that can't be imported is logged once and skipped
+        """
+        registry = ProviderRegistry()
+        with patch('django_intercom.providers.log') as log:
+            self.assertIsNone(registry.get('tests.missing.Dummy',
+                                           'custom_data'))
+            self.assertIsNone(registry.get('tests.missing.Dummy',
+                                           'custom_data'))
+            self.assertEqual(log.warning.call_count, 1)
+
+    def test_get_without_method(self):
+        """
+        Test a provider without the expected method is skipped
+        """
+        registry = ProviderRegistry()
+        with patch('django_intercom.providers.log') as log:
+            self.assertIsNone(registry.get(
+                'tests.test_providers.NoMethodDummy', 'custom_data'))
+            self.assertTrue(log.warning.called)
+
+    def test_load_strict(self):
+        """
+        Test a bad provider raises ImproperlyConfigured in strict mode
+        """
+        with patch('django_intercom.providers.log'), \
+                override_settings(INTERCOM_CUSTOM_DATA_CLASSES=[
+                    'tests.test_providers.NoMethodDummy']), \
+                self.assertRaises(ImproperlyConfigured):
+            ProviderRegistry().load(strict=True)
+
+    def test_load_not_strict(self):
+        """
+        Test a bad provider is skipped when not in strict mode
+        """
+        registry = ProviderRegistry()
+        with patch('django_intercom.providers.log'), \
+                override_settings(INTERCOM_CUSTOM_DATA_CLASSES=[
+                    'tests.test_providers.NoMethodDummy']):
+            registry.load(strict=False)
+            self.assertIsNone(registry.get(
+                'tests.test_providers.NoMethodDummy', 'custom_data'))
+
+    def test_setting_changed_rebuilds_registry(self):
+        """
+        Test the registry is rebuilt when the provider settings change
+        """
+        path = 'tests.test_providers.CustomDataDummy'
+        with override_settings(INTERCOM_CUSTOM_DATA_CLASSES=[path]):
+            self.assertIn((path, 'custom_data'), registry._providers)
+        self.assertNotIn((path, 'custom_data'), registry._providers)
+
+
+class TestCallProviders(TestCase):
+    def test_serial_runs_every_provider(self):
+        """
+        Test every provider runs and the results keep the configured order
+        """
+        providers = [('a', DataDummy({'a': 1})), ('b', DataDummy({'b': 2}))]
+        results, complete = call_providers(providers, 'custom_data', None)
+        self.assertEqual(results, [{'a': 1}, {'b': 2}])
+        self.assertTrue(complete)
+
+    def test_concurrent_keeps_order(self):
+        """
+        Test concurrent providers are returned in the configured order
+        """
+        providers = [('a', DataDummy({'a': 1}, delay=0.05)),
+                     ('b', DataDummy({'b': 2}))]
+        results, complete = call_providers(providers, 'custom_data', None,
+                                           concurrent=True)
+        self.assertEqual(results, [{'a': 1}, {'b': 2}])
+        self.assertTrue(complete)
+
+    def test_concurrent_drops_slow_provider(self):
+        """
+        Test a provider that misses the deadline is dropped
+        """
+        providers = [('slow', DataDummy({'slow': 1}, delay=0.5)),
+                     ('fast', DataDummy({'fast': 2}))]
+        with patch('django_intercom.providers.log') as log:
+            results, complete = call_providers(providers, 'custom_data',
+                                               None, concurrent=True,
+                                               timeout=0.1)
+        self.assertEqual(results, [{'fast': 2}])
+        self.assertFalse(complete)
+        self.assertTrue(log.warning.called)
+
+    def test_provider_error_is_skipped(self):
+        """
+        Test a provider that raises is logged and skipped
+        """
+        providers = [('error', ErrorDummy()), ('b', DataDummy({'b': 2}))]
+        for concurrent in (False, True):
+            with patch('django_intercom.providers.log'):
+                results, complete = call_providers(
+                    providers, 'custom_data', None, concurrent=concurrent)
+            self.assertEqual(results, [{'b': 2}])
+            self.assertFalse(complete)
+
+
+class GroupsCustomData:
+    prefetch_related = ('groups',)
+
+    def __init__(self):
+        self.key = type(self).__name__
+
+    def custom_data(self, user):
+        return {self.key: [group.name for group in user.groups.all()]}
+
+
+class OtherGroupsCustomData(GroupsCustomData):
+    pass
+
+
+class ThirdGroupsCustomData(GroupsCustomData):
+    pass
+
+
+class TestRelatedUser(TestCase):
+    paths = ['tests.test_providers.GroupsCustomData',
+             'tests.test_providers.OtherGroupsCustomData',
+             'tests.test_providers.ThirdGroupsCustomData']
+
+    def setUp(self):
+        self.user = User.objects.create_user('test_user')
+        self.user.groups.add(Group.objects.create(name='staff'))
+        self.request = RequestFactory().get('/')
+        SessionMiddleware().process_request(self.request)
+        self.request.user = User.objects.get(pk=self.user.pk)
+
+    def test_related_lookups_are_merged(self):
+        providers = [GroupsCustomData(), OtherGroupsCustomData()]
+        self.assertEqual(related_lookups(providers), ([], ['groups']))
+
+    def test_with_related_is_lazy(self):
+        """
+        Test the user is only reloaded when a provider uses it
+        """
+        user = with_related(self.user, [GroupsCustomData()])
+        with self.assertNumQueries(0):
+            self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(user.username, 'test_user')
+            self.assertEqual(len(user.groups.all()), 1)
+
+    def test_intercom_tag_loads_relations_once(self):
+        """
+        Test every custom data class shares the prefetched relations
+        """
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                      self.paths), \
+                self.assertNumQueries(2):
+            tag_dict = intercom_tag({'request': self.request})
+        self.assertJSONEqual(tag_dict['custom_data'],
+                             {'GroupsCustomData': ['staff'],
+                              'OtherGroupsCustomData': ['staff'],
+                              'ThirdGroupsCustomData': ['staff']})
@@ -0,0 +1,180 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from django_intercom.client import IntercomAPIError, IntercomClient
+from django_intercom.ratelimit import RateLimiter, endpoint
+
+from tests.stub_server import StubIntercomServer
+
+RATELIMIT_PATCH = 'django_intercom.ratelimit.{}'
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        patcher = patch(RATELIMIT_PATCH.format('time'), self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_endpoint(self):
+        self.assertEqual(endpoint('/users'), 'users')
+        self.assertEqual(endpoint('/bulk/events'), 'bulk')
+        self.assertEqual(endpoint('/contacts?page=2'), 'contacts')
+
+    def test_waits_for_budget(self):
+        """
+        Test a request over the budget waits until the requests of the last
+        period leave room for it
+        """
+        limiter = RateLimiter(2, period=10)
+        for i in range(3):
+            self.assertTrue(limiter.acquire('/users'))
+        self.assertEqual(len(self.clock.sleeps), 1)
+        # half of the first period has to slide out
+        self.assertGreaterEqual(self.clock.now, 1015)
+        stats = limiter.stats()['users']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['waited'], 1)
+        self.assertGreaterEqual(stats['max_wait'], 15)
+
+    def test_budget_is_shared(self):
+        """
+        Test limiters using the same cache share the budget, like processes
+        """
+        RateLimiter(2).acquire('/users')
+        RateLimiter(2).acquire('/users')
+        limiter = RateLimiter(2)
+        limiter.acquire('/users')
+        self.assertEqual(limiter.stats()['users']['waited'], 1)
+
+    def test_endpoint_budget(self):
+        """
+        Test an endpoint budget doesn't hold the other endpoints back
+        """
+        limiter = RateLimiter(10, endpoint_limits={'users': 1})
+        limiter.acquire('/users')
+        limiter.acquire('/events')
+        self.assertEqual(self.clock.sleeps, [])
+        limiter.acquire('/users')
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_max_wait(self):
+        """
+        Test a request is rejected when it can't fit within max_wait
+        """
+        limiter = RateLimiter(1, period=10, max_wait=5)
+        self.assertTrue(limiter.acquire('/users'))
+        self.assertFalse(limiter.acquire('/users'))
+        self.assertEqual(limiter.stats()['users']['rejected'], 1)
+
+    def test_rejected_request_releases_endpoint_budget(self):
+        """
+        Test a request rejected by the app budget gives back the endpoint
+        budget it took
+        """
+        limiter = RateLimiter(1, period=10, endpoint_limits={'users': 2},
+                              max_wait=5)
+        self.assertTrue(limiter.acquire('/events'))
+        self.assertFalse(limiter.acquire('/users'))
+        self.assertFalse(limiter.acquire('/users'))
+        self.assertEqual(cache.get('intercom:ratelimit:users:100'), 0)
+
+    def test_period_boundary(self):
+        """
+        Test the start of a period doesn't let another full budget through
+        """
+        limiter = RateLimiter(2, period=10)
+        self.clock.now = 1009
+        limiter.acquire('/users')
+        limiter.acquire('/users')
+        self.clock.now = 1010
+        limiter.acquire('/users')
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertGreaterEqual(self.clock.sleeps[0], 5)
+
+    def test_steady_rate(self):
+        """
+        Test the requests over the budget go out one per limit/period
+        instead of in a burst
+        """
+        limiter = RateLimiter(10, period=10)
+        with patch(RATELIMIT_PATCH.format('random.uniform'),
+                   return_value=0):
+            for i in range(15):
+                limiter.acquire('/users')
+        self.assertEqual(len(self.clock.sleeps), 5)
+        self.assertAlmostEqual(self.clock.sleeps[0], 11)
+        for sleep in self.clock.sleeps[1:]:
+            self.assertAlmostEqual(sleep, 1)
+
+    def test_block(self):
+        """
+        Test block pauses every request until it runs out
+        """
+        limiter = RateLimiter(10)
+        limiter.block('/users', 30)
+        limiter.acquire('/events')
+        self.assertGreaterEqual(self.clock.now, 1030)
+        self.assertEqual(limiter.stats()['users']['throttled'], 1)
+
+
+class TestRateLimitedClient(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_retry_after_is_honored(self):
+        """
+        Test a 429 blocks the limiter for Retry-After and is sent again
+        """
+        limiter = RateLimiter(100)
+        with StubIntercomServer() as server:
+            server.responses = [(429, {'Retry-After': '0.1'}, {}),
+                                (200, {}, {'ok': True})]
+            client = IntercomClient(base_url=server.url, access_token='t',
+                                    rate_limiter=limiter)
+            with patch('django_intercom.client.log'):
+                self.assertEqual(client.post('/users', {}), {'ok': True})
+            self.assertEqual(len(server.requests), 2)
+        stats = limiter.stats()['users']
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(stats['waited'], 1)
+
+    def test_exhausted_remaining_blocks(self):
+        """
+        Test a response with no remaining budget pauses the next request
+        """
+        limiter = RateLimiter(100)
+        with StubIntercomServer() as server, \
+                patch('django_intercom.client.time') as client_time:
+            client_time.time.return_value = 0
+            server.responses = [(200, {'X-RateLimit-Remaining': '0',
+                                       'X-RateLimit-Reset': '60'}, {})]
+            client = IntercomClient(base_url=server.url, access_token='t',
+                                    rate_limiter=limiter)
+            with patch.object(limiter, 'block') as block:
+                client.post('/users', {})
+        block.assert_called_once_with('/users', 60.0)
+
+    def test_without_limiter_429_raises(self):
+        with StubIntercomServer() as server:
+            server.responses = [(429, {'Retry-After': '1'}, {})]
+            client = IntercomClient(base_url=server.url, access_token='t')
+            with self.assertRaises(IntercomAPIError) as error:
+                client.post('/users', {})
+        self.assertEqual(error.exception.status, 429)
@@ -0,0 +1,91 @@
+import datetime
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase
+
+from django_intercom import renderer
+from django_intercom.loading import loader
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class TestFastRenderer(TestCase):
+    base_context = {
+        'INTERCOM_IS_VALID': True,
+        'anonymous': False,
+        'intercom_appid': '1234abCD',
+        'email_address': 'test@example.com',
+        'user_id': 1,
+        'user_created': datetime.datetime(2019, 7, 9, 12, 30),
+        'name': 'test_user',
+        'enable_inbox': True,
+        'use_counter': 'true',
+        'css_selector': '#Intercom',
+        'custom_data': json.dumps({'plan': 'pro'}),
+        'company_data': json.dumps({'id': 1, 'name': 'company',
+                                    'created_at': 0}),
+        'user_hash': 'abcdef0123456789',
+        'widget_loader': loader('idle', 2000),
+    }
+
+    def assertRendersLikeTemplate(self, **context):
+        context = dict(self.base_context, **context)
+        expected = render_to_string('intercom/intercom_tag.html', context)
+        self.assertEqual(renderer.render(context), expected)
+
+    def test_authenticated(self):
+        self.assertRendersLikeTemplate()
+
+    def test_without_user_id_and_user_hash(self):
+        self.assertRendersLikeTemplate(user_id=None, user_hash=None)
+
+    def test_escaped_values(self):
+        self.assertRendersLikeTemplate(name='O\'Brien <b>&"',
+                                       email_address='a&b@example.com',
+                                       user_id='<1>')
+
+    def test_without_user_created(self):
+        self.assertRendersLikeTemplate(user_created=None)
+
+    def test_anonymous(self):
+        self.assertRendersLikeTemplate(anonymous=True, user_id='abc',
+                                       email_address='lead@example.com',
+                                       name='Unknown')
+
+    def test_anonymous_id(self):
+        self.assertRendersLikeTemplate(anonymous=True, user_id='abc',
+                                       anonymous_id='abc',
+                                       email_address='lead@example.com',
+                                       name='Unknown')
+        context = dict(self.base_context, anonymous=True, anonymous_id='abc')
+        self.assertEqual(renderer.intercom_settings(context),
+                         {'app_id': '1234abCD', 'anonymous_id': 'abc'})
+
+    def test_invalid(self):
+        self.assertRendersLikeTemplate(INTERCOM_IS_VALID=False)
+        context = {'INTERCOM_IS_VALID': False}
+        self.assertEqual(renderer.render(context),
+                         render_to_string('intercom/intercom_tag.html',
+                                          context))
+
+    def test_template_tag_uses_fast_renderer(self):
+        """
+        Test {% intercom_tag %} gives the same output with both renderers
+        """
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        request.user = User.objects.create_user('test_user')
+        template = Template('{% load intercom %}{% intercom_tag %}')
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'), \
+                patch('django.utils.timezone.now',
+                      return_value=datetime.datetime(2019, 7, 9)):
+            expected = template.render(Context({'request': request}))
+            with patch(MODULE_PATCH.format('INTERCOM_FAST_RENDERER'), True):
+                output = template.render(Context({'request': request}))
+        self.assertIn("'name': 'test_user'", output)
+        self.assertEqual(output, expected)
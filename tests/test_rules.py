@@ -0,0 +1,79 @@
+import re
+from unittest.mock import PropertyMock, patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
+
+from django_intercom.rules import BOT_USER_AGENTS, RequestMatcher
+from django_intercom.templatetags.intercom import (intercom_tag,
+                                                   render_intercom_tag)
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class TestRequestMatcher(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_exclude_path_prefixes_and_regexes(self):
+        matcher = RequestMatcher(exclude_paths=[
+            '/admin/', re.compile(r'^/embed/\d+$'),
+            re.compile(r'^/HEALTH', re.IGNORECASE)])
+        self.assertFalse(matcher.included(self.factory.get('/admin/users/')))
+        self.assertFalse(matcher.included(self.factory.get('/embed/12')))
+        self.assertFalse(matcher.included(self.factory.get('/health')))
+        self.assertTrue(matcher.included(self.factory.get('/embed/12/x')))
+        self.assertTrue(matcher.included(self.factory.get('/')))
+
+    def test_include_paths(self):
+        matcher = RequestMatcher(include_paths=['/app/'],
+                                 exclude_paths=['/app/internal/'])
+        self.assertTrue(matcher.included(self.factory.get('/app/inbox')))
+        self.assertFalse(matcher.included(self.factory.get('/pricing')))
+        self.assertFalse(matcher.included(
+            self.factory.get('/app/internal/stats')))
+
+    def test_exclude_url_names(self):
+        matcher = RequestMatcher(exclude_url_names=['intercom_settings'])
+        request = self.factory.get('/intercom/settings.json')
+        request.resolver_match = type(str('Match'), (), {
+            'view_name': 'intercom_settings',
+            'url_name': 'intercom_settings'})()
+        self.assertFalse(matcher.included(request))
+
+    def test_exclude_user_agents(self):
+        matcher = RequestMatcher(exclude_user_agents=BOT_USER_AGENTS)
+        self.assertFalse(matcher.included(self.factory.get(
+            '/', HTTP_USER_AGENT='Mozilla/5.0 (compatible; Googlebot/2.1)')))
+        self.assertTrue(matcher.included(self.factory.get(
+            '/', HTTP_USER_AGENT='Mozilla/5.0 (X11; Linux x86_64) Firefox')))
+
+    def test_sample_rate_is_stable_per_visitor(self):
+        """
+        Test the same session is always in or out of the sample
+        """
+        matcher = RequestMatcher(sample_rate=50)
+        results = set()
+        for i in range(5):
+            request = self.factory.get('/')
+            request.COOKIES['sessionid'] = 'abc123'
+            results.add(matcher.included(request))
+        self.assertEqual(len(results), 1)
+        self.assertFalse(RequestMatcher(sample_rate=0).included(request))
+
+
+@override_settings(INTERCOM_EXCLUDE_PATHS=['/admin/'])
+class TestExcludedTag(TestCase):
+    def test_excluded_request_skips_user(self):
+        """
+        Test an excluded request doesn't touch request.user
+        """
+        request = RequestFactory().get('/admin/')
+        user = PropertyMock(return_value=AnonymousUser())
+        with patch(MODULE_PATCH.format('INTERCOM_APPID'), 'abc123'), \
+                patch.object(type(request), 'user', user, create=True):
+            self.assertEqual(intercom_tag({'request': request}),
+                             {'INTERCOM_IS_VALID': False})
+            snippet = render_intercom_tag({'request': request})
+        self.assertIn('Skipping intercom', snippet)
+        user.assert_not_called()
@@ -0,0 +1,100 @@
+import datetime
+import decimal
+import json
+import uuid
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+
+from django_intercom import serializers
+from django_intercom.templatetags.intercom import get_custom_data
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class TypedCustomData:
+    def custom_data(self, user):
+        return {'joined': datetime.datetime(2019, 7, 9, 12, 30),
+                'balance': decimal.Decimal('10.50'),
+                'token': uuid.UUID('12345678123456781234567812345678'),
+                'label': gettext_lazy('Support')}
+
+
+class ObjectCustomData:
+    def custom_data(self, user):
+        return {'object': object()}
+
+
+def dumps_upper(data):
+    return json.dumps(data).upper()
+
+
+class TestSerializers(TestCase):
+    data = {'joined': datetime.datetime(2019, 7, 9, 12, 30, 0, 123456),
+            'day': datetime.date(2019, 7, 9),
+            'balance': decimal.Decimal('10.50'),
+            'token': uuid.UUID('12345678123456781234567812345678'),
+            'label': gettext_lazy('Support'),
+            'html': '</script><!--',
+            'separator': '\u2028',
+            'accent': 'caf\xe9'}
+
+    def setUp(self):
+        serializers._serializer = None
+        self.addCleanup(setattr, serializers, '_serializer', None)
+
+    def test_django_types(self):
+        """
+        Test datetimes, Decimals, UUIDs and lazy strings are serialized
+        """
+        self.assertEqual(json.loads(serializers.dumps(self.data)), {
+            'joined': '2019-07-09T12:30:00.123',
+            'day': '2019-07-09',
+            'balance': '10.50',
+            'token': '12345678-1234-5678-1234-567812345678',
+            'label': 'Support',
+            'html': '</script><!--',
+            'separator': '\u2028',
+            'accent': 'caf\xe9'})
+
+    def test_escaped_for_script(self):
+        """
+        Test the output can't close the script tag
+        """
+        output = serializers.dumps(self.data)
+        for character in ('<', '>', '&', '\u2028'):
+            self.assertNotIn(character, output)
+
+    @skipIf(serializers.orjson is None, 'orjson is not installed')
+    def test_orjson_matches_django(self):
+        self.assertEqual(serializers.orjson_dumps(self.data),
+                         serializers.django_dumps(self.data))
+
+    def test_custom_serializer_setting(self):
+        with patch('django_intercom.serializers.INTERCOM_JSON_SERIALIZER',
+                   'tests.test_serializers.dumps_upper'):
+            self.assertEqual(serializers.dumps({'a': 'b'}), '{"A": "B"}')
+
+    def test_get_custom_data_with_django_types(self):
+        user = User.objects.create_user('test_user')
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_serializers.TypedCustomData']):
+            self.assertJSONEqual(get_custom_data(user), {
+                'joined': '2019-07-09T12:30:00',
+                'balance': '10.50',
+                'token': '12345678-1234-5678-1234-567812345678',
+                'label': 'Support'})
+
+    def test_get_custom_data_unserializable(self):
+        """
+        Test data that can't be serialized is logged instead of swallowed
+        """
+        user = User.objects.create_user('test_user')
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_serializers.ObjectCustomData']), \
+                patch(MODULE_PATCH.format('log')) as log:
+            self.assertEqual(get_custom_data(user), '{}')
+        self.assertTrue(log.exception.called)
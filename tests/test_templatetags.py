@@ -5,6 +5,7 @@ from django.contrib.auth.models import User, AnonymousUser
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.test import TestCase, RequestFactory
 
+from django_intercom.loading import ONLOAD
 from django_intercom.templatetags.intercom import (intercom_tag,
                                                    get_company_data,
                                                    get_custom_data)
@@ -19,6 +20,13 @@ class CustomDataDummy:
         return self.dummy_data
 
 
+class OtherCustomDataDummy:
+    dummy_data = {'other': 'This Is Other Dummy Data'}
+
+    def custom_data(self, user):
+        return self.dummy_data
+
+
 class CustomCompanyDataDummy:
     dummy_data = {'id': 0,
                   'name': 'intercom_test',
@@ -59,12 +67,14 @@ class TestIntercomTemplateTag(TestCase):
         """
         Test intercom templatetage with intercom enabled
         """
-        expected = {'INTERCOM_IS_VALID': True, 'intercom_appid': '1234abCD',
+        expected = {'INTERCOM_IS_VALID': True, 'anonymous': False,
+                    'intercom_appid': '1234abCD',
                     'email_address': '', 'user_id': 1,
                     'name': 'test_user', 'enable_inbox': True,
                     'use_counter': 'true',
                     'css_selector': '#Intercom', 'custom_data': '{}',
-                    'company_data': '{}', 'user_hash': None}
+                    'company_data': '{}', 'user_hash': None,
+                    'widget_loader': ONLOAD}
         with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'):
             self.request.user = self.user
             self.context['request'] = self.request
@@ -77,13 +87,13 @@ class TestIntercomTemplateTag(TestCase):
         """
         Test intercom templatetage with intercom enabled
         """
-        expected = {'INTERCOM_IS_VALID': True,
-                    'intercom_appid': '1234abCD',
+        expected = {'INTERCOM_IS_VALID': True, 'anonymous': True,
+                    'anonymous_id': None, 'intercom_appid': '1234abCD',
                     'email_address': 'lead@example.com',
                     'name': 'Unknown', 'enable_inbox': True,
                     'use_counter': 'false', 'css_selector': '#Intercom',
                     'custom_data': '{}', 'company_data': '{}',
-                    'user_hash': None}
+                    'user_hash': None, 'widget_loader': ONLOAD}
         with patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD'):
             self.request.user = AnonymousUser()
             self.context['request'] = self.request
@@ -110,6 +120,20 @@ class TestIntercomTemplateTag(TestCase):
             returned_JSON = get_custom_data(self.user)
             self.assertJSONEqual(returned_JSON, CustomDataDummy.dummy_data)
 
+    def test_get_custom_data_with_several_classes(self):
+        """
+        Test getting custom data merges every INTERCOM_CUSTOM_DATA_CLASSES
+        """
+        expected = dict(CustomDataDummy.dummy_data,
+                        **OtherCustomDataDummy.dummy_data)
+        with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CLASSES'),
+                   ['tests.test_templatetags.CustomDataDummy',
+                    'tests.test_templatetags.OtherCustomDataDummy']):
+            self.assertJSONEqual(get_custom_data(self.user), expected)
+            with patch(MODULE_PATCH.format('INTERCOM_CUSTOM_DATA_CONCURRENT'),
+                       True):
+                self.assertJSONEqual(get_custom_data(self.user), expected)
+
     def test_get_company_data_default_is_empty_JSON(self):
         """
         Test getting custom company data with Empty INTERCOM_COMPANY_DATA_CLASS
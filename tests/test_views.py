@@ -0,0 +1,100 @@
+import datetime
+import hashlib
+import hmac
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+MODULE_PATCH = 'django_intercom.templatetags.intercom.{}'
+
+
+class TestIntercomSettingsView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            'test_user', 'test@example.com',
+            date_joined=datetime.datetime(2019, 7, 9))
+        self.url = reverse('intercom_settings')
+        patcher = patch(MODULE_PATCH.format('INTERCOM_APPID'), '1234abCD')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_authenticated_settings(self):
+        """
+        Test the view returns the intercomSettings of the user
+        """
+        self.client.force_login(self.user)
+        with patch(MODULE_PATCH.format('INTERCOM_SECURE_KEY'), 'secret'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        user_hash = hmac.new(b'secret', str(self.user.pk).encode('utf8'),
+                             digestmod=hashlib.sha256).hexdigest()
+        self.assertJSONEqual(response.content.decode('utf8'), {
+            'app_id': '1234abCD',
+            'email': 'test@example.com',
+            'user_id': str(self.user.pk),
+            'name': 'test_user',
+            'user_hash': user_hash,
+            'custom_data': {},
+            'company': {},
+            'created_at': int(Template('{{ d|date:"U" }}').render(
+                Context({'d': self.user.date_joined}))),
+        })
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_anonymous_settings(self):
+        response = self.client.get(self.url)
+        self.assertJSONEqual(response.content.decode('utf8'),
+                             {'app_id': '1234abCD'})
+
+    def test_if_none_match(self):
+        """
+        Test a request with the current ETag gets a 304
+        """
+        self.client.force_login(self.user)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.user.email = 'changed@example.com'
+        self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(INTERCOM_INCLUDE_PATHS=['/app/'])
+    def test_bootstrap_mode_with_page_rules(self):
+        """
+        Test the page rules decide whether the bootstrap script is rendered,
+        and don't leave the settings out of the view's own url
+        """
+        template = Template('{% load intercom %}'
+                            '{% intercom_tag mode="bootstrap" %}')
+        factory = RequestFactory()
+        output = template.render(Context({'request': factory.get('/app/')}))
+        self.assertIn(self.url, output)
+        output = template.render(Context({'request': factory.get('/pricing')}))
+        self.assertNotIn(self.url, output)
+
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['user_id'], str(self.user.pk))
+
+    @override_settings(INTERCOM_EXCLUDE_USER_AGENTS=['bot'])
+    def test_visitor_rules(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_USER_AGENT='Googlebot')
+        self.assertJSONEqual(response.content.decode('utf8'), {})
+
+    def test_bootstrap_mode(self):
+        """
+        Test the bootstrap snippet doesn't contain any user data
+        """
+        self.client.force_login(self.user)
+        template = Template('{% load intercom %}'
+                            '{% intercom_tag mode="bootstrap" %}')
+        request = self.client.get(self.url).wsgi_request
+        output = template.render(Context({'request': request}))
+        self.assertIn("x.open('GET','%s')" % self.url, output)
+        self.assertNotIn('test_user', output)
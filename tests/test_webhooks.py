@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from django_intercom import webhooks
+from django_intercom.models import WebhookEvent
+from django_intercom.signals import webhook_received
+
+WEBHOOKS_PATCH = 'django_intercom.webhooks.{}'
+
+
+def notification(notification_id, topic='conversation.user.created'):
+    return {'type': 'notification_event', 'id': notification_id,
+            'topic': topic, 'data': {'item': {'id': notification_id}}}
+
+
+class TestWebhookView(TestCase):
+    def setUp(self):
+        self.url = reverse('intercom_webhook')
+        self.committer = webhooks.GroupCommit(webhooks.save_events)
+        patchers = [patch(WEBHOOKS_PATCH.format('_committer'),
+                          self.committer),
+                    patch(WEBHOOKS_PATCH.format('INTERCOM_WEBHOOK_SECRET'),
+                          'secret')]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, data, signature=None):
+        body = json.dumps(data).encode('utf8')
+        if signature is None:
+            signature = webhooks.signature(body)
+        return self.client.post(self.url, body,
+                                content_type='application/json',
+                                HTTP_X_HUB_SIGNATURE=signature)
+
+    def test_valid_notification_is_saved(self):
+        """
+        Test a signed notification is saved before it is answered
+        """
+        response = self.post(notification('notif_1'))
+        self.assertEqual(response.status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.notification_id, 'notif_1')
+        self.assertEqual(event.topic, 'conversation.user.created')
+
+    def test_invalid_signature(self):
+        """
+        Test a notification with the wrong signature is refused
+        """
+        with patch('django_intercom.views.log'):
+            response = self.post(notification('notif_1'), 'sha1=wrong')
+            missing = self.client.post(self.url, b'{}',
+                                       content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(missing.status_code, 403)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_invalid_body(self):
+        self.assertEqual(self.post({'topic': 'user.created'}).status_code,
+                         400)
+        self.assertEqual(self.post([1]).status_code, 400)
+
+    def test_ping_is_not_saved(self):
+        response = self.post(notification('notif_1', topic='ping'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_retried_delivery_is_saved_once(self):
+        for i in range(3):
+            self.assertEqual(self.post(notification('notif_1')).status_code,
+                             200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_failed_save_is_refused(self):
+        """
+        Test intercom is asked to deliver again when the save fails
+        """
+        with patch.object(self.committer, 'save_batch',
+                          side_effect=DatabaseError), \
+                patch(WEBHOOKS_PATCH.format('log')):
+            response = self.post(notification('notif_1'))
+        self.assertEqual(response.status_code, 503)
+
+
+class TestGroupCommit(TestCase):
+    def test_concurrent_deliveries_share_a_batch(self):
+        """
+        Test the deliveries that arrive during a save wait for the next
+        batch, and are only answered once it is saved
+        """
+        batches = []
+        saving = threading.Event()
+        release = threading.Event()
+
+        def save_batch(items):
+            batches.append(list(items))
+            saving.set()
+            release.wait(5)
+
+        committer = webhooks.GroupCommit(save_batch)
+        results = []
+
+        def deliver(item):
+            results.append((item, committer.save(item)))
+
+        leader = threading.Thread(target=deliver, args=(0,))
+        leader.start()
+        saving.wait(5)
+        followers = [threading.Thread(target=deliver, args=(i,))
+                     for i in range(1, 4)]
+        for thread in followers:
+            thread.start()
+        while len(committer) < 3:
+            time.sleep(0.001)
+        self.assertEqual(results, [])
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(batches, [[0], [1, 2, 3]])
+        self.assertEqual(sorted(results), [(i, True) for i in range(4)])
+
+    def test_leader_hands_over(self):
+        """
+        Test a delivery stops saving once its own batch is saved, the next
+        waiting delivery saves the rest
+        """
+        savers = []
+        saving = threading.Event()
+        release = threading.Event()
+
+        def save_batch(items):
+            savers.append((items, threading.current_thread().name))
+            saving.set()
+            release.wait(5)
+
+        committer = webhooks.GroupCommit(save_batch, batch_size=1)
+        results = []
+
+        def deliver(item):
+            results.append((item, committer.save(item)))
+
+        threads = [threading.Thread(target=deliver, args=(i,),
+                                    name='delivery-%s' % i)
+                   for i in range(4)]
+        threads[0].start()
+        saving.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while len(committer) < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(savers, [([i], 'delivery-%s' % i)
+                                  for i in range(4)])
+        self.assertEqual(results, [(i, True) for i in range(4)])
+
+    def test_full_is_refused(self):
+        committer = webhooks.GroupCommit(lambda items: None, max_pending=0)
+        with patch(WEBHOOKS_PATCH.format('log')):
+            self.assertFalse(committer.save(1))
+
+    def test_failed_batch(self):
+        def save_batch(items):
+            raise DatabaseError()
+
+        committer = webhooks.GroupCommit(save_batch)
+        with patch(WEBHOOKS_PATCH.format('log')):
+            self.assertFalse(committer.save(1))
+        # the next delivery saves again
+        committer.save_batch = lambda items: None
+        self.assertTrue(committer.save(2))
+
+
+class TestDrainWebhooks(TestCase):
+    def setUp(self):
+        webhooks.save_events([(timezone.now(), notification('notif_%s' % i))
+                              for i in range(5)])
+
+    def drain(self, **options):
+        call_command('intercom_drain_webhooks', batch_size=2,
+                     stdout=StringIO(), **options)
+
+    def test_drain_sends_signal_in_order(self):
+        """
+        Test every notification is processed once, in order
+        """
+        received = []
+
+        def receiver(topic, data, **kwargs):
+            received.append(data['item']['id'])
+
+        webhook_received.connect(receiver)
+        self.addCleanup(webhook_received.disconnect, receiver)
+        self.drain()
+        self.drain()
+        self.assertEqual(received, ['notif_%s' % i for i in range(5)])
+        self.assertFalse(WebhookEvent.objects.filter(
+            processed_at__isnull=True).exists())
+
+    def test_drain_delete(self):
+        self.drain(delete=True)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failing_notification_doesnt_block_the_others(self):
+        """
+        Test a notification whose receiver raises is recorded and skipped,
+        and retried by later runs until max_attempts
+        """
+        received = []
+
+        def receiver(topic, data, **kwargs):
+            if data['item']['id'] == 'notif_1':
+                raise ValueError('bad notification')
+            received.append(data['item']['id'])
+
+        webhook_received.connect(receiver)
+        self.addCleanup(webhook_received.disconnect, receiver)
+        with patch(WEBHOOKS_PATCH.format('log')):
+            self.drain(max_attempts=2)
+            self.assertEqual(received, ['notif_0', 'notif_2', 'notif_3',
+                                        'notif_4'])
+            failed = WebhookEvent.objects.get(notification_id='notif_1')
+            self.assertEqual(failed.attempts, 1)
+            self.assertIn('bad notification', failed.error)
+            self.assertIsNone(failed.processed_at)
+            self.drain(max_attempts=2)
+            self.drain(max_attempts=2)
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)